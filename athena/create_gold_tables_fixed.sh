@@ -171,6 +171,66 @@ EOF
 )
 execute_athena_query "$GOLD_WEEKLY_FEATURES_CTAS" "Creating gold_weekly_features table"
 
+# Step 4: Create gold_daily_anomalies table
+# Every metric of every day is scored against the 28 days before it; only rows
+# with |z| >= 2.5 are kept, so anomaly questions are a small partition-pruned lookup.
+echo "Step 4: Creating gold_daily_anomalies table..."
+GOLD_DAILY_ANOMALIES_CTAS=$(cat <<'EOF'
+CREATE TABLE IF NOT EXISTS health_data_lake.gold_daily_anomalies
+WITH (
+    format = 'PARQUET',
+    parquet_compression = 'SNAPPY',
+    partitioned_by = ARRAY['tenant_id', 'dt']
+) AS
+WITH metric_values AS (
+    SELECT
+        f.day,
+        m.metric,
+        m.value,
+        f.tenant_id,
+        f.dt
+    FROM health_data_lake.gold_daily_features f
+    CROSS JOIN UNNEST(
+        ARRAY['steps_total', 'distance_km_total', 'active_kcal_total', 'basal_kcal_total',
+              'flights_total', 'hr_avg', 'hr_max', 'hr_min'],
+        ARRAY[CAST(f.steps_total AS DOUBLE), CAST(f.distance_km_total AS DOUBLE),
+              CAST(f.active_kcal_total AS DOUBLE), CAST(f.basal_kcal_total AS DOUBLE),
+              CAST(f.flights_total AS DOUBLE), CAST(f.hr_avg AS DOUBLE),
+              CAST(f.hr_max AS DOUBLE), CAST(f.hr_min AS DOUBLE)]
+    ) AS m(metric, value)
+    -- Heart rate is 0 on days without readings; those are gaps, not anomalies
+    WHERE NOT (m.metric LIKE 'hr_%' AND m.value = 0)
+),
+scored AS (
+    SELECT
+        day,
+        metric,
+        value,
+        AVG(value) OVER (PARTITION BY tenant_id, metric ORDER BY day ROWS BETWEEN 28 PRECEDING AND 1 PRECEDING) as baseline_mean,
+        STDDEV_SAMP(value) OVER (PARTITION BY tenant_id, metric ORDER BY day ROWS BETWEEN 28 PRECEDING AND 1 PRECEDING) as baseline_std,
+        COUNT(value) OVER (PARTITION BY tenant_id, metric ORDER BY day ROWS BETWEEN 28 PRECEDING AND 1 PRECEDING) as baseline_days,
+        tenant_id,
+        dt
+    FROM metric_values
+)
+SELECT
+    day,
+    metric,
+    value,
+    baseline_mean,
+    baseline_std,
+    (value - baseline_mean) / baseline_std as z_score,
+    baseline_days,
+    tenant_id,
+    dt
+FROM scored
+WHERE baseline_days >= 14
+    AND baseline_std > 0
+    AND ABS((value - baseline_mean) / baseline_std) >= 2.5
+EOF
+)
+execute_athena_query "$GOLD_DAILY_ANOMALIES_CTAS" "Creating gold_daily_anomalies table"
+
 echo ""
 echo "=========================================="
 echo "✅ Gold tables created successfully!"
@@ -180,6 +240,7 @@ echo "Tables created:"
 echo "  - health_data_lake.gold_daily_by_type"
 echo "  - health_data_lake.gold_daily_features"
 echo "  - health_data_lake.gold_weekly_features"
+echo "  - health_data_lake.gold_daily_anomalies"
 echo ""
 echo "You can now try your questions again in the frontend!"
 echo ""
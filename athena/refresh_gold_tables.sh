@@ -117,6 +117,66 @@ GROUP BY dt, tenant_id
 EOF
 )
 
+# Refresh gold_daily_anomalies (after gold_daily_features)
+# Reads 120 days of features so new days have their 28-day window, and only inserts
+# complete days after the newest anomaly already stored for the tenant.
+GOLD_DAILY_ANOMALIES_INSERT=$(cat <<'EOF'
+INSERT INTO health_data_lake.gold_daily_anomalies
+WITH metric_values AS (
+    SELECT
+        f.day,
+        m.metric,
+        m.value,
+        f.tenant_id,
+        f.dt
+    FROM health_data_lake.gold_daily_features f
+    CROSS JOIN UNNEST(
+        ARRAY['steps_total', 'distance_km_total', 'active_kcal_total', 'basal_kcal_total',
+              'flights_total', 'hr_avg', 'hr_max', 'hr_min'],
+        ARRAY[CAST(f.steps_total AS DOUBLE), CAST(f.distance_km_total AS DOUBLE),
+              CAST(f.active_kcal_total AS DOUBLE), CAST(f.basal_kcal_total AS DOUBLE),
+              CAST(f.flights_total AS DOUBLE), CAST(f.hr_avg AS DOUBLE),
+              CAST(f.hr_max AS DOUBLE), CAST(f.hr_min AS DOUBLE)]
+    ) AS m(metric, value)
+    -- Heart rate is 0 on days without readings; those are gaps, not anomalies
+    WHERE NOT (m.metric LIKE 'hr_%' AND m.value = 0)
+        AND f.tenant_id = '${tenant_id}'
+        AND f.dt >= DATE_FORMAT(DATE_ADD('day', -120, CURRENT_DATE), '%Y-%m-%d')
+),
+scored AS (
+    SELECT
+        day,
+        metric,
+        value,
+        AVG(value) OVER (PARTITION BY tenant_id, metric ORDER BY day ROWS BETWEEN 28 PRECEDING AND 1 PRECEDING) as baseline_mean,
+        STDDEV_SAMP(value) OVER (PARTITION BY tenant_id, metric ORDER BY day ROWS BETWEEN 28 PRECEDING AND 1 PRECEDING) as baseline_std,
+        COUNT(value) OVER (PARTITION BY tenant_id, metric ORDER BY day ROWS BETWEEN 28 PRECEDING AND 1 PRECEDING) as baseline_days,
+        tenant_id,
+        dt
+    FROM metric_values
+)
+SELECT
+    day,
+    metric,
+    value,
+    baseline_mean,
+    baseline_std,
+    (value - baseline_mean) / baseline_std as z_score,
+    baseline_days,
+    tenant_id,
+    dt
+FROM scored
+WHERE baseline_days >= 14
+    AND baseline_std > 0
+    AND ABS((value - baseline_mean) / baseline_std) >= 2.5
+    AND dt < DATE_FORMAT(CURRENT_DATE, '%Y-%m-%d')
+    AND dt > (
+        SELECT COALESCE(MAX(dt), '0000-00-00') FROM health_data_lake.gold_daily_anomalies
+        WHERE tenant_id = '${tenant_id}'
+    )
+EOF
+)
+
 echo "For incremental refresh, use INSERT statements above."
 echo "For full refresh, drop and recreate tables using setup_tables.sh"
 
@@ -1,17 +1,49 @@
 """Agent modules."""
-from .router_agent import classify_intent, INTENT_TYPES
-from .data_agent import generate_sql, execute_query
-from .dashboard_agent import generate_chart_spec
-from .coach_agent import generate_coach_response
-from .anomaly_agent import detect_anomalies, explain_anomalies
+from .router_agent import classify_intent, aclassify_intent, needs_data, INTENT_TYPES
+from .data_agent import (
+    generate_sql,
+    agenerate_sql,
+    agenerate_sql_plan,
+    execute_query,
+    aexecute_query,
+    aexecute_plan
+)
+from .dashboard_agent import generate_chart_spec, agenerate_chart_spec
+from .coach_agent import (
+    generate_coach_response,
+    agenerate_coach_response,
+    astream_coach_response
+)
+from .followup_agent import plan_followup, apply_followup
+from .anomaly_agent import (
+    detect_anomalies,
+    explain_anomalies,
+    aexplain_anomalies,
+    afetch_precomputed_anomalies,
+    precomputed_covers
+)
 
 __all__ = [
     'classify_intent',
+    'aclassify_intent',
+    'needs_data',
     'INTENT_TYPES',
     'generate_sql',
+    'agenerate_sql',
+    'agenerate_sql_plan',
     'execute_query',
+    'aexecute_query',
+    'aexecute_plan',
     'generate_chart_spec',
+    'agenerate_chart_spec',
     'generate_coach_response',
+    'agenerate_coach_response',
+    'astream_coach_response',
     'detect_anomalies',
-    'explain_anomalies'
+    'explain_anomalies',
+    'aexplain_anomalies',
+    'afetch_precomputed_anomalies',
+    'precomputed_covers',
+    'plan_followup',
+    'apply_followup'
 ]
@@ -1,15 +1,108 @@
 """Anomaly detection agent."""
-from typing import Dict, List, Any, Tuple
-from langchain.schema import HumanMessage, SystemMessage
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+import numpy as np
+from langchain_core.messages import BaseMessage
 from llm_client import llm_client
-import statistics
+from prompt_budget import build_messages
+from result_profiler import find_date_column, parse_dates, to_numeric_matrix
+from baseline_store import MetricBaseline, baseline_scores
+from .data_agent import aexecute_query
+from config import settings
 
 
-def detect_anomalies(query_results: Dict[str, Any], metric_column: str = None) -> List[Dict[str, Any]]:
+# Minimum history before a point can be scored
+MIN_PERIODS = 3
+
+
+def _robust_scale(deviations: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Per-column MAD scaled to a standard deviation, falling back to the std when MAD is 0."""
+    with np.errstate(invalid='ignore'):
+        mad = np.nanmedian(np.abs(deviations), axis=0) * 1.4826
+        std = np.nanstd(values, axis=0)
+    scale = np.where(mad > 0, mad, std)
+    return np.where(scale > 0, scale, np.nan)
+
+
+def robust_scores(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Median/MAD score of every value against its whole column."""
+    with np.errstate(invalid='ignore'):
+        median = np.nanmedian(matrix, axis=0)
+    deviations = matrix - median
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scores = deviations / _robust_scale(deviations, matrix)
+    return scores, np.tile(median, (matrix.shape[0], 1))
+
+
+def rolling_scores(matrix: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Z-score of every value against the trailing `window` values before it.
+    
+    Uses cumulative sums, so the cost is O(rows x columns) regardless of window.
+    """
+    valid = ~np.isnan(matrix)
+    # Center first so the sum-of-squares difference does not lose precision
+    centered = np.where(valid, matrix - np.nanmean(matrix, axis=0), 0.0)
+    zeros = np.zeros((1, matrix.shape[1]))
+    sums = np.concatenate([zeros, np.cumsum(centered, axis=0)])
+    squares = np.concatenate([zeros, np.cumsum(centered * centered, axis=0)])
+    counts = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+    
+    end = np.arange(matrix.shape[0])
+    start = np.maximum(0, end - window)
+    n = counts[end] - counts[start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (sums[end] - sums[start]) / n
+        var = ((squares[end] - squares[start]) - n * mean * mean) / (n - 1)
+        std = np.sqrt(np.maximum(var, 0))
+        scores = (centered - mean) / np.where(std > 1e-9, std, np.nan)
+    scores[(n < MIN_PERIODS) | ~valid] = np.nan
+    return scores, mean + np.nanmean(matrix, axis=0)
+
+
+def seasonal_scores(matrix: np.ndarray, dates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Median/MAD score of every value against the same day of week."""
+    weekday = (dates.astype('datetime64[D]').astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    scores = np.full(matrix.shape, np.nan)
+    expected = np.full(matrix.shape, np.nan)
+    for day in range(7):
+        mask = weekday == day
+        if mask.sum() < MIN_PERIODS:
+            continue
+        day_scores, day_expected = robust_scores(matrix[mask])
+        scores[mask] = day_scores
+        expected[mask] = day_expected
+    return scores, expected
+
+
+def _choose_method(dates: Optional[np.ndarray], row_count: int, window: int) -> str:
+    """Seasonal for daily series with a few weeks of data, rolling for long series, robust otherwise."""
+    if dates is not None and len(np.unique(dates)) == row_count and row_count >= 7 * MIN_PERIODS:
+        return 'seasonal'
+    if row_count >= 2 * window:
+        return 'rolling'
+    return 'robust'
+
+
+def detect_anomalies(
+    query_results: Dict[str, Any],
+    metric_column: str = None,
+    method: str = None,
+    threshold: float = None,
+    baselines: Optional[Dict[str, MetricBaseline]] = None
+) -> List[Dict[str, Any]]:
     """
     Detect anomalies in query results.
     
-    Returns list of anomalies with descriptions.
+    Scores every numeric column at once (or only `metric_column`) with one of:
+    "rolling" (z-score against a trailing window), "robust" (median/MAD over
+    the whole result), "seasonal" (median/MAD per day of week), "baseline"
+    (against the tenant's stored long-horizon baselines) or "auto", which
+    uses the baseline for every metric that has a mature one and picks one
+    of the others for the rest.
+    
+    Returns anomalies ranked by score, strongest first.
     """
     rows = query_results.get('rows', [])
     columns = query_results.get('columns', [])
@@ -17,68 +110,229 @@ def detect_anomalies(query_results: Dict[str, Any], metric_column: str = None) -
     if not rows:
         return []
     
-    # Find metric column
-    if not metric_column:
-        # Look for common metric columns
-        for col in ['value', 'steps_total', 'hr_avg', 'distance_km_total', 'active_kcal_total']:
-            if col in columns:
-                metric_column = col
-                break
-        
-        if not metric_column:
-            # Use first numeric column
-            for col in columns:
-                if col not in ['tenant_id', 'dt', 'day', 'week_start']:
-                    metric_column = col
-                    break
-    
-    if not metric_column:
+    if metric_column:
+        columns = [metric_column]
+    metric_columns, matrix = to_numeric_matrix(rows, columns)
+    if not metric_columns:
         return []
     
-    # Extract values
-    values = []
-    for row in rows:
-        if metric_column in row:
-            try:
-                val = float(row[metric_column])
-                values.append(val)
-            except (ValueError, TypeError):
-                continue
-    
-    if len(values) < 3:
-        return []
+    # Score in time order when the result has dates
+    date_column = find_date_column(query_results.get('columns', []))
+    dates = parse_dates(rows, date_column) if date_column else None
+    order = np.argsort(dates, kind='stable') if dates is not None else np.arange(len(rows))
+    matrix = matrix[order]
     
-    # Statistical anomaly detection (Z-score method)
-    mean = statistics.mean(values)
-    stdev = statistics.stdev(values) if len(values) > 1 else 0
+    window = settings.anomaly_window
+    method = method or settings.anomaly_method
+    use_baselines = bool(baselines) and method in ('auto', 'baseline')
+    if method == 'auto':
+        method = _choose_method(dates, len(rows), window)
     
-    if stdev == 0:
-        return []
+    if method == 'baseline':
+        scores = np.full(matrix.shape, np.nan)
+        expected = np.full(matrix.shape, np.nan)
+    elif method == 'rolling':
+        scores, expected = rolling_scores(matrix, window)
+    elif method == 'seasonal' and dates is not None:
+        scores, expected = seasonal_scores(matrix, dates[order])
+    elif method in ('robust', 'seasonal'):
+        method = 'robust'
+        scores, expected = robust_scores(matrix)
+    else:
+        raise ValueError(f"Unknown anomaly method: {method}")
+    methods = [method] * len(metric_columns)
+    
+    if use_baselines:
+        stored_scores, stored_expected = baseline_scores(baselines, metric_columns, matrix)
+        for col in np.flatnonzero(~np.isnan(stored_expected[0])):
+            scores[:, col] = stored_scores[:, col]
+            expected[:, col] = stored_expected[:, col]
+            methods[col] = 'baseline'
+    
+    threshold = threshold or settings.anomaly_threshold
+    magnitude = np.abs(scores)
+    with np.errstate(invalid='ignore'):
+        hits = np.argwhere(magnitude > threshold)
+    ranked = hits[np.argsort(-magnitude[hits[:, 0], hits[:, 1]], kind='stable')][:settings.anomaly_max_results]
     
     anomalies = []
-    threshold = 2.5  # Z-score threshold
-    
-    for i, row in enumerate(rows):
-        if metric_column in row:
-            try:
-                val = float(row[metric_column])
-                z_score = abs((val - mean) / stdev)
-                
-                if z_score > threshold:
-                    anomalies.append({
-                        'row_index': i,
-                        'row_data': row,
-                        'metric': metric_column,
-                        'value': val,
-                        'z_score': z_score,
-                        'type': 'high' if val > mean else 'low'
-                    })
-            except (ValueError, TypeError):
-                continue
+    for position, col in ranked:
+        row_index = int(order[position])
+        value = float(matrix[position, col])
+        anomalies.append({
+            'row_index': row_index,
+            'row_data': rows[row_index],
+            'metric': metric_columns[col],
+            'value': value,
+            'expected': round(float(expected[position, col]), 2),
+            'z_score': float(magnitude[position, col]),
+            'method': methods[col],
+            'type': 'high' if scores[position, col] > 0 else 'low'
+        })
+    
+    return anomalies
+
+
+# Keywords that narrow a precomputed anomaly lookup to related metrics
+# (regexes matched at the start of a word: 'step' covers "steps", 'hr\b' skips "hrs")
+METRIC_KEYWORDS = {
+    'step': ['steps_total'],
+    'walk': ['steps_total', 'distance_km_total'],
+    'distance': ['distance_km_total'],
+    'calor': ['active_kcal_total', 'basal_kcal_total'],
+    'kcal': ['active_kcal_total', 'basal_kcal_total'],
+    'energy': ['active_kcal_total', 'basal_kcal_total'],
+    'flight': ['flights_total'],
+    'stair': ['flights_total'],
+    'heart': ['hr_avg', 'hr_max', 'hr_min'],
+    'hr\\b': ['hr_avg', 'hr_max', 'hr_min'],
+    'pulse': ['hr_avg', 'hr_max', 'hr_min']
+}
+
+# Lookback implied by common period words
+PERIOD_DAYS = {'today': 1, 'yesterday': 2, 'week': 7, 'month': 30, 'quarter': 90, 'year': 365}
+
+# Smallest |z_score| kept in gold_daily_anomalies: the cutoff hardcoded in the table's CTAS and
+# INSERT (athena/create_gold_tables_fixed.sh). Change both together; with anomaly_threshold below
+# it the table would silently miss anomalies, so the fast path is not used.
+PRECOMPUTED_MIN_Z = 2.5
+
+_MONTHS = {
+    name: number
+    for number, names in enumerate([
+        ('jan', 'january'), ('feb', 'february'), ('mar', 'march'), ('apr', 'april'), ('may',),
+        ('jun', 'june'), ('jul', 'july'), ('aug', 'august'), ('sep', 'sept', 'september'),
+        ('oct', 'october'), ('nov', 'november'), ('dec', 'december')
+    ], start=1)
+    for name in names
+}
+_MONTH = '|'.join(sorted(_MONTHS, key=len, reverse=True))
+# "2024-03-05", "March 5(th)( 2024)", "5(th) March( 2024)", "in/during/since March( 2024)"
+_ISO_DATE = re.compile(r'\b(\d{4})-(\d{2})-(\d{2})\b')
+_MONTH_DAY = re.compile(rf'\b({_MONTH})\.? (\d{{1,2}})(?:st|nd|rd|th)?\b(?:,? (\d{{4}}))?')
+_DAY_MONTH = re.compile(rf'\b(\d{{1,2}})(?:st|nd|rd|th)? (?:of )?({_MONTH})\b(?:,? (\d{{4}}))?')
+_IN_MONTH = re.compile(rf'\b(?:in|during|since|of) ({_MONTH})\b(?: (\d{{4}}))?')
+
+
+def lookback_days(user_question: str) -> int:
+    """Days to look back for an anomaly question ("last 10 days", "this month", ...)."""
+    question = user_question.lower()
+    match = re.search(r'(\d+)\s*(day|week|month|year)s?', question)
+    if match:
+        unit = match.group(2)
+        return int(match.group(1)) * (1 if unit == 'day' else PERIOD_DAYS[unit])
+    for word, days in PERIOD_DAYS.items():
+        if word in question:
+            return days
+    return settings.anomaly_fast_path_days
+
+
+def _date(year: Optional[str], month: int, day: int, today: date) -> Optional[date]:
+    """A named date; without a year, its latest occurrence up to today."""
+    try:
+        if year:
+            return date(int(year), month, day)
+        named = date(today.year, month, day)
+        return named if named <= today else date(today.year - 1, month, day)
+    except ValueError:
+        return None
+
+
+def named_dates(user_question: str, today: date = None) -> List[date]:
+    """Calendar dates a question names ("on March 3", "2024-03-03", "in January" = its 1st)."""
+    question = user_question.lower()
+    today = today or datetime.utcnow().date()
+    found = [_date(y, int(m), int(d), today) for y, m, d in _ISO_DATE.findall(question)]
+    found += [_date(y, _MONTHS[m], int(d), today) for m, d, y in _MONTH_DAY.findall(question)]
+    found += [_date(y, _MONTHS[m], int(d), today) for d, m, y in _DAY_MONTH.findall(question)]
+    found += [_date(y, _MONTHS[m], 1, today) for m, y in _IN_MONTH.findall(question)]
+    return [d for d in found if d is not None]
+
+
+def precomputed_covers(user_question: str) -> bool:
+    """
+    Whether gold_daily_anomalies can answer a question: the threshold is not
+    below the table's cutoff and every date the question names is within the
+    lookback the fast path reads.
+    """
+    if settings.anomaly_threshold < PRECOMPUTED_MIN_Z:
+        return False
+    earliest = datetime.utcnow().date() - timedelta(days=lookback_days(user_question))
+    return all(d >= earliest for d in named_dates(user_question))
+
+
+def build_precomputed_anomaly_sql(user_question: str) -> str:
+    """Partition-pruned lookup of gold_daily_anomalies for a question (tenant as ${tenant_id})."""
+    question = user_question.lower()
+    metrics = sorted({m for word, names in METRIC_KEYWORDS.items() if re.search(rf'\b{word}', question) for m in names})
+    quoted = ", ".join(f"'{m}'" for m in metrics)
+    metric_filter = f"\n  AND metric IN ({quoted})" if metrics else ""
+    return f"""SELECT day, metric, value, baseline_mean, baseline_std, z_score
+FROM health_data_lake.gold_daily_anomalies
+WHERE tenant_id = '${{tenant_id}}'
+  AND dt >= DATE_FORMAT(DATE_ADD('day', -{lookback_days(user_question)}, CURRENT_DATE), '%Y-%m-%d')
+  AND ABS(z_score) >= {settings.anomaly_threshold}{metric_filter}
+ORDER BY ABS(z_score) DESC
+LIMIT {settings.anomaly_max_results}"""
+
+
+async def afetch_precomputed_anomalies(user_question: str, tenant_id: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Read anomalies for a question from gold_daily_anomalies.
     
+    Returns (query_results, anomalies) in the same shapes as the LLM-written
+    query path and detect_anomalies. Raises if the table cannot be queried.
+    """
+    sql = build_precomputed_anomaly_sql(user_question)
+    query_results = await aexecute_query(sql.replace("${tenant_id}", tenant_id), tenant_id)
+    return query_results, _precomputed_to_anomalies(query_results)
+
+
+def _precomputed_to_anomalies(query_results: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """gold_daily_anomalies rows -> detect_anomalies output format."""
+    anomalies = []
+    for i, row in enumerate(query_results.get('rows', [])):
+        z_score = float(row['z_score'])
+        anomalies.append({
+            'row_index': i,
+            'row_data': row,
+            'metric': row['metric'],
+            'value': float(row['value']),
+            'expected': round(float(row['baseline_mean']), 2),
+            'z_score': abs(z_score),
+            'method': 'precomputed',
+            'type': 'high' if z_score > 0 else 'low'
+        })
     return anomalies
 
 
+def build_anomaly_messages(anomalies: List[Dict[str, Any]], user_question: str) -> List[BaseMessage]:
+    """Build anomaly explanation messages for the strongest anomalies."""
+    system_prompt = """You are a data analyst explaining anomalies in health data.
+Explain detected anomalies in clear, understandable language.
+Focus on what the anomalies mean for the user's health and activity patterns."""
+    
+    anomaly_lines = [f"Found {len(anomalies)} anomalies:"]
+    for i, anomaly in enumerate(anomalies[:5]):  # Limit to 5
+        anomaly_lines.append(
+            f"\n{i+1}. {anomaly['metric']}: {anomaly['value']} (expected ~{anomaly['expected']}, score: {anomaly['z_score']:.2f}, Type: {anomaly['type']})\n"
+            f"   Context: {anomaly['row_data']}"
+        )
+    
+    return build_messages(
+        system_prompt,
+        user_question,
+        template="""User question: {question}
+
+{data}
+
+Explain these anomalies and what they might mean for the user's health data.""",
+        data_lines=anomaly_lines,
+        data_noun="anomalies",
+        agent="anomaly"
+    )
+
+
 def explain_anomalies(
     anomalies: List[Dict[str, Any]],
     user_question: str,
@@ -88,29 +342,20 @@ def explain_anomalies(
     if not anomalies:
         return "No significant anomalies detected in the data."
     
-    system_prompt = """You are a data analyst explaining anomalies in health data.
-Explain detected anomalies in clear, understandable language.
-Focus on what the anomalies mean for the user's health and activity patterns."""
-
-    anomaly_summary = f"Found {len(anomalies)} anomalies:\n"
-    for i, anomaly in enumerate(anomalies[:5]):  # Limit to 5
-        anomaly_summary += f"\n{i+1}. {anomaly['metric']}: {anomaly['value']} (Z-score: {anomaly['z_score']:.2f}, Type: {anomaly['type']})\n"
-        anomaly_summary += f"   Context: {anomaly['row_data']}\n"
-    
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=f"""User question: {user_question}
+    messages = build_anomaly_messages(anomalies, user_question)
+    response = llm_client.invoke(messages, agent="anomaly")
+    return response.strip()
 
-{anomaly_summary}
 
-Explain these anomalies and what they might mean for the user's health data.""")
-    ]
+async def aexplain_anomalies(
+    anomalies: List[Dict[str, Any]],
+    user_question: str,
+    query_results: Dict[str, Any]
+) -> str:
+    """Async explain_anomalies."""
+    if not anomalies:
+        return "No significant anomalies detected in the data."
     
-    response = llm_client.invoke(messages)
+    messages = build_anomaly_messages(anomalies, user_question)
+    response = await llm_client.ainvoke(messages, agent="anomaly")
     return response.strip()
-
-
-
-
-
-
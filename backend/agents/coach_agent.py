@@ -1,20 +1,38 @@
 """Coach agent for explaining trends and providing health insights."""
-from typing import Dict, List, Any
-from langchain.schema import HumanMessage, SystemMessage
+from typing import Dict, List, Any, AsyncIterator
+from langchain_core.messages import BaseMessage
 from llm_client import llm_client
+from prompt_budget import build_messages
+from result_profiler import profile_results, format_digest
+from config import settings
 
 
-def generate_coach_response(
+def _result_lines(query_results: Dict[str, Any]) -> List[str]:
+    """Prompt lines for one result: its shape, then its rows or a digest of all of them."""
+    columns = query_results.get('columns', [])
+    rows = query_results.get('rows', [])
+    lines = [
+        f"Data columns: {', '.join(columns)}",
+        f"Number of records: {len(rows)}"
+    ]
+    if len(rows) > settings.coach_raw_rows_max:
+        # Summarize the whole result instead of showing the first few rows
+        lines.append("\nSummary of all records:")
+        lines.extend(format_digest(profile_results(query_results)))
+    elif rows:
+        lines.append("\nData:")
+        for i, row in enumerate(rows):
+            lines.append(f"  {i+1}. {row}")
+    return lines
+
+
+def build_coach_messages(
     user_question: str,
     query_results: Dict[str, Any],
     chart_spec: Dict[str, Any] = None,
     conversation_history: list = None
-) -> str:
-    """
-    Generate coach response explaining data and providing insights.
-    
-    Can optionally use web search for additional context.
-    """
+) -> List[BaseMessage]:
+    """Build the coach prompt messages for a question and its query results."""
     system_prompt = """You are a health and fitness coach AI assistant.
 Your role is to:
 1. Explain health data trends and patterns in simple, understandable language
@@ -33,41 +51,75 @@ Guidelines:
 If asked about general health topics, you can provide educational information."""
 
     # Format data summary
-    columns = query_results.get('columns', [])
-    rows = query_results.get('rows', [])
+    if query_results is None:
+        # General question answered without looking up the user's data
+        data_lines = ["No personal data was looked up for this question; answer from general health knowledge."]
+    else:
+        data_lines = _result_lines(query_results)
+        # Planned queries whose rows could not be joined with the main result (e.g. weekly next to daily)
+        for extra in query_results.get('additional_results', []):
+            data_lines.append("\nAdditional data:")
+            data_lines.extend(_result_lines(extra))
     
-    data_summary = f"Data columns: {', '.join(columns)}\n"
-    data_summary += f"Number of records: {len(rows)}\n"
-    
-    if rows:
-        # Show summary statistics
-        data_summary += "\nSample data:\n"
-        for i, row in enumerate(rows[:5]):
-            data_summary += f"  {i+1}. {row}\n"
+    history_lines = [
+        f"User: {h.get('user', '')}\nAssistant: {h.get('assistant', '')[:100]}..."
+        for h in (conversation_history or [])[-3:]
+    ]
     
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=f"""User question: {user_question}
+    messages = build_messages(
+        system_prompt,
+        user_question,
+        template=f"""User question: {{question}}
 
-{data_summary}
+{{data}}
 
 {('Chart visualization is available' if chart_spec else 'No chart available')}
 
-Provide a helpful, encouraging response that explains the data and answers the user's question.""")
-    ]
-    
-    if conversation_history:
-        context = "\n".join([
-            f"User: {h.get('user', '')}\nAssistant: {h.get('assistant', '')[:100]}..."
-            for h in conversation_history[-3:]
-        ])
-        messages.insert(1, HumanMessage(content=f"Recent conversation:\n{context}"))
+Provide a helpful, encouraging response that explains the data and answers the user's question.""",
+        data_lines=data_lines,
+        history_lines=history_lines,
+        agent="coach"
+    )
     
-    response = llm_client.invoke(messages)
-    return response.strip()
+    return messages
 
 
+def generate_coach_response(
+    user_question: str,
+    query_results: Dict[str, Any],
+    chart_spec: Dict[str, Any] = None,
+    conversation_history: list = None
+) -> str:
+    """
+    Generate coach response explaining data and providing insights.
+    
+    Can optionally use web search for additional context.
+    """
+    messages = build_coach_messages(user_question, query_results, chart_spec, conversation_history)
+    response = llm_client.invoke(messages, agent="coach")
+    return response.strip()
 
 
+async def agenerate_coach_response(
+    user_question: str,
+    query_results: Dict[str, Any],
+    chart_spec: Dict[str, Any] = None,
+    conversation_history: list = None
+) -> str:
+    """Async generate_coach_response."""
+    messages = build_coach_messages(user_question, query_results, chart_spec, conversation_history)
+    response = await llm_client.ainvoke(messages, agent="coach")
+    return response.strip()
 
 
+async def astream_coach_response(
+    user_question: str,
+    query_results: Dict[str, Any],
+    chart_spec: Dict[str, Any] = None,
+    conversation_history: list = None
+) -> AsyncIterator[str]:
+    """Stream the coach response text as it is generated."""
+    messages = build_coach_messages(user_question, query_results, chart_spec, conversation_history)
+    async for text in llm_client.astream(messages, agent="coach"):
+        if text:
+            yield text
@@ -1,20 +1,148 @@
 """Dashboard agent for generating Vega-Lite chart specifications."""
-from typing import Dict, List, Any
-from langchain.schema import HumanMessage, SystemMessage
+from typing import Dict, List, Any, Optional
+from langchain_core.messages import BaseMessage
 from llm_client import llm_client
+from prompt_budget import build_messages
+from cache import cache
+from config import settings
+import copy
+import hashlib
 import json
+import re
+
+
+def _column_type(rows: List[Dict], column: str) -> str:
+    """Infer a Vega-Lite field type from the first non-empty value of a column."""
+    for row in rows:
+        value = row.get(column)
+        if value is None or value == '':
+            continue
+        if isinstance(value, bool):
+            return 'nominal'
+        if isinstance(value, (int, float)):
+            return 'quantitative'
+        if re.match(r'^\d{4}-\d{2}-\d{2}', str(value)):
+            return 'temporal'
+        return 'nominal'
+    return 'unknown'
+
+
+def _normalize_question(question: str) -> str:
+    """Normalize question so wording that yields the same chart maps to one key."""
+    question = question.lower()
+    question = re.sub(r'\d+(\.\d+)?', '#', question)  # "last 7 days" == "last 30 days"
+    question = re.sub(r'[^a-z#\s]', ' ', question)
+    return ' '.join(question.split())
+
+
+def get_chart_signature(
+    columns: List[str],
+    rows: List[Dict],
+    intent: Optional[str],
+    user_question: str,
+    chart_type: str = "auto"
+) -> str:
+    """Build cache key from result shape (column names and types), intent and question."""
+    shape = [f"{col}:{_column_type(rows, col)}" for col in columns]
+    signature = json.dumps({
+        'shape': shape,
+        'intent': intent or '',
+        'chart_type': chart_type,
+        'question': _normalize_question(user_question)
+    }, sort_keys=True)
+    return f"chart_spec:{hashlib.sha256(signature.encode()).hexdigest()}"
+
+
+def _bind_data(template: Dict[str, Any], rows: List[Dict], user_question: str) -> Dict[str, Any]:
+    """Bind query rows (and, if the spec had one, a title) to a cached chart spec."""
+    chart_spec = copy.deepcopy(template)
+    if chart_spec.pop('titled', False):
+        chart_spec['spec']['title'] = user_question[:50]
+    chart_spec['spec']['data'] = {'values': rows}
+    return chart_spec
+
+
+def _drop_inline_data(node: Any) -> None:
+    """Remove every `data` and `datasets` entry, at any depth (layer, concat, transform ...)."""
+    if isinstance(node, dict):
+        node.pop('data', None)
+        node.pop('datasets', None)
+        for value in node.values():
+            _drop_inline_data(value)
+    elif isinstance(node, list):
+        for item in node:
+            _drop_inline_data(item)
+
+
+def _strip_data(chart_spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return a copy of the chart spec without inline data or title, suitable for caching.
+    
+    The cache key has no tenant, so no data may survive anywhere in the
+    spec; on a hit the rows are bound at the top level and layers inherit
+    them. The title is left out because it often names the period ("Last 7
+    days"), which the normalized question in the cache key does not
+    distinguish.
+    """
+    template = copy.deepcopy(chart_spec)
+    _drop_inline_data(template['spec'])
+    if template['spec'].pop('title', None):
+        template['titled'] = True
+    return template
 
 
 def generate_chart_spec(
     query_results: Dict[str, Any],
     user_question: str,
-    chart_type: str = "auto"
+    chart_type: str = "auto",
+    intent: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Generate Vega-Lite chart specification from query results.
     
+    Specs are cached without their data or title, keyed by the result shape,
+    intent and normalized question; on a cache hit the LLM call is skipped and
+    the cached spec is bound to the new rows and titled with the question.
+    
     Returns dict with 'spec_type' and 'spec' (Vega-Lite JSON).
     """
+    # Format query results for LLM
+    columns = query_results.get('columns', [])
+    rows = query_results.get('rows', [])
+    
+    # Reuse a cached spec for the same result shape and question type
+    signature = get_chart_signature(columns, rows, intent, user_question, chart_type)
+    template = cache.get(signature)
+    if template:
+        return _bind_data(template, rows, user_question)
+    
+    messages = build_chart_messages(query_results, user_question, chart_type)
+    response = llm_client.invoke(messages, agent="dashboard").strip()
+    return _parse_chart_response(response, signature, columns, rows, user_question)
+
+
+async def agenerate_chart_spec(
+    query_results: Dict[str, Any],
+    user_question: str,
+    chart_type: str = "auto",
+    intent: Optional[str] = None
+) -> Dict[str, Any]:
+    """Async generate_chart_spec."""
+    columns = query_results.get('columns', [])
+    rows = query_results.get('rows', [])
+    
+    signature = get_chart_signature(columns, rows, intent, user_question, chart_type)
+    template = cache.get(signature)
+    if template:
+        return _bind_data(template, rows, user_question)
+    
+    messages = build_chart_messages(query_results, user_question, chart_type)
+    response = (await llm_client.ainvoke(messages, agent="dashboard")).strip()
+    return _parse_chart_response(response, signature, columns, rows, user_question)
+
+
+def build_chart_messages(query_results: Dict[str, Any], user_question: str, chart_type: str = "auto") -> List[BaseMessage]:
+    """Build chart generation messages from a sample of the query results."""
     system_prompt = """You are a chart generator for health data visualizations.
 Generate Vega-Lite JSON specifications for data visualizations.
 
@@ -32,8 +160,7 @@ Vega-Lite Requirements:
 - Make charts responsive (width: "container")
 
 Return ONLY valid JSON, no markdown, no explanations."""
-
-    # Format query results for LLM
+    
     columns = query_results.get('columns', [])
     rows = query_results.get('rows', [])
     
@@ -46,22 +173,33 @@ Return ONLY valid JSON, no markdown, no explanations."""
         "sample_rows": sample_rows[:10]  # Show first 10 as example
     }
     
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=f"""User question: {user_question}
+    return build_messages(
+        system_prompt,
+        user_question,
+        template=f"""User question: {{question}}
 Chart type preference: {chart_type}
 
 Query results:
 Columns: {columns}
 Total rows: {len(rows)}
-Sample data: {json.dumps(sample_rows[:10], default=str)}
+Sample data (one JSON row per line):
+{{data}}
 
 Generate a Vega-Lite specification that visualizes this data appropriately.
-Return ONLY the JSON specification, wrapped in a JSON object with 'spec_type' and 'spec' keys.""")
-    ]
-    
-    response = llm_client.invoke(messages).strip()
-    
+Return ONLY the JSON specification, wrapped in a JSON object with 'spec_type' and 'spec' keys.""",
+        data_lines=[json.dumps(row, default=str) for row in sample_rows[:10]],
+        agent="dashboard"
+    )
+
+
+def _parse_chart_response(
+    response: str,
+    signature: str,
+    columns: List[str],
+    rows: List[Dict],
+    user_question: str
+) -> Dict[str, Any]:
+    """Parse the model's chart spec, cache its structure and bind the rows."""
     # Parse JSON response
     try:
         # Remove markdown code blocks if present
@@ -86,10 +224,11 @@ Return ONLY the JSON specification, wrapped in a JSON object with 'spec_type' an
                 'spec': chart_spec
             }
         
-        # Add data to spec
-        if 'data' not in chart_spec['spec']:
-            chart_spec['spec']['data'] = {'values': rows}
+        # Cache the spec structure only; data is re-bound on every hit
+        cache.set(signature, _strip_data(chart_spec), ttl=settings.chart_spec_cache_ttl)
         
+        # Bind the result rows, replacing any sample values the model inlined
+        chart_spec['spec']['data'] = {'values': rows}
         return chart_spec
         
     except json.JSONDecodeError:
@@ -155,9 +294,3 @@ def create_fallback_chart(columns: List[str], rows: List[Dict], question: str) -
                 }
             }
         }
-
-
-
-
-
-
@@ -1,19 +1,31 @@
 """Data agent for generating and executing SQL queries."""
-from typing import Dict, List, Any
-from langchain.schema import HumanMessage, SystemMessage
+import asyncio
+import logging
+import re
+from typing import Dict, List, Any, Tuple
+from langchain_core.messages import BaseMessage
 from athena_client import athena_client
 from cache import cache
 from llm_client import llm_client
+from metrics import metrics
+from prompt_budget import build_messages
 from config import settings
+from query_scheduler import current_priority, PRIORITIES
+from result_profiler import find_date_column, NON_METRIC_COLUMNS
 
+logger = logging.getLogger(__name__)
 
-def generate_sql(user_question: str, intent: str, tenant_id: str, conversation_history: list = None) -> str:
-    """
-    Generate SQL query from user question.
-    
-    Always includes tenant_id filter for security.
-    """
-    system_prompt = f"""You are a SQL query generator for health data analytics.
+# Athena executions in progress, by (query cache key, priority) (single-flight)
+_inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+
+# A plan statement must be a query: SELECT or WITH as a whole word
+_QUERY_START = re.compile(r'\s*(select|with)\b', re.IGNORECASE)
+
+
+# Static, tenant-agnostic system prompt. Everything request-specific (tenant,
+# lookback, history, question) goes in the messages after it, so the prefix is
+# identical across tenants and can be served from provider prompt/KV caches.
+SQL_SYSTEM_PROMPT = """You are a SQL query generator for health data analytics.
 Generate SQL queries for AWS Athena (Presto SQL dialect).
 
 Available tables:
@@ -34,9 +46,15 @@ Available tables:
 4. silver_health: Raw data view
    - Columns: tenant_id, day, date_parsed, week_start, data_type, value, timestamp_unix, etc.
 
+5. gold_daily_anomalies: Precomputed daily anomalies (metric value vs. its previous 28 days)
+   - Columns: day, metric, value, baseline_mean, baseline_std, z_score, baseline_days, tenant_id, dt
+   - Partitioned by: tenant_id, dt
+
 CRITICAL SECURITY RULES:
-- ALWAYS include WHERE tenant_id = '{tenant_id}' in every query
-- Use partition pruning: dt >= DATE_FORMAT(DATE_ADD('day', -{settings.default_lookback_days}, CURRENT_DATE), '%Y-%m-%d')
+- ALWAYS include WHERE tenant_id = '${tenant_id}' in every query, written exactly like that;
+  the ${tenant_id} placeholder is substituted with the caller's tenant after generation
+- Use partition pruning: dt >= DATE_FORMAT(DATE_ADD('day', -N, CURRENT_DATE), '%Y-%m-%d'),
+  where N is the default lookback given with the request unless the question asks for another period
 - Never query across tenants
 - Use gold tables for aggregations (faster, cheaper)
 
@@ -48,6 +66,14 @@ SQL Requirements:
 - For date comparisons, use: dt >= '2024-01-01' (string format)
 - For date arithmetic, use: DATE_ADD('day', -7, CURRENT_DATE)
 
+MULTIPLE QUERIES:
+- When a question needs unrelated data (e.g. a dashboard of steps, heart rate and calories,
+  or metrics from different tables), you may return several independent queries instead of
+  one large UNION or CTE query, up to the maximum given with the request
+- End every query with a semicolon on its own line; queries run in parallel and are
+  joined on their date column, so use the same date column (e.g. day) in each
+- Prefer a single query whenever one query answers the question
+
 CRITICAL: Return ONLY the COMPLETE SQL query. Do NOT include:
 - Explanatory text before the query (e.g., "Here is the SQL:")
 - Explanatory text after the query
@@ -65,7 +91,7 @@ Start your response directly with SELECT, WITH, or another SQL keyword.
 Example valid SQL for simple query:
 SELECT day, steps_total, hr_avg 
 FROM health_data_lake.gold_daily_features 
-WHERE tenant_id = '{tenant_id}' 
+WHERE tenant_id = '${tenant_id}' 
   AND dt >= DATE_FORMAT(DATE_ADD('day', -30, CURRENT_DATE), '%Y-%m-%d')
 ORDER BY day DESC
 
@@ -76,7 +102,7 @@ WITH last_7_days AS (
     AVG(hr_avg) as avg_hr,
     SUM(active_kcal_total) as calories
   FROM health_data_lake.gold_daily_features
-  WHERE tenant_id = '{tenant_id}'
+  WHERE tenant_id = '${tenant_id}'
     AND dt >= DATE_FORMAT(DATE_ADD('day', -7, CURRENT_DATE), '%Y-%m-%d')
     AND dt < DATE_FORMAT(CURRENT_DATE, '%Y-%m-%d')
 ),
@@ -86,7 +112,7 @@ prev_7_days AS (
     AVG(hr_avg) as avg_hr,
     SUM(active_kcal_total) as calories
   FROM health_data_lake.gold_daily_features
-  WHERE tenant_id = '{tenant_id}'
+  WHERE tenant_id = '${tenant_id}'
     AND dt >= DATE_FORMAT(DATE_ADD('day', -14, CURRENT_DATE), '%Y-%m-%d')
     AND dt < DATE_FORMAT(DATE_ADD('day', -7, CURRENT_DATE), '%Y-%m-%d')
 )
@@ -104,17 +130,75 @@ SELECT
   p.calories
 FROM prev_7_days p"""
 
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=f"Generate SQL for: {user_question}\nIntent: {intent}")
+
+def build_sql_messages(user_question: str, intent: str, conversation_history: list = None) -> List[BaseMessage]:
+    """Build SQL generation messages: static system prefix, then per-request suffix."""
+    history_lines = [
+        f"User: {h.get('user', '')}\nSQL: {h.get('sql', 'N/A')}"
+        for h in (conversation_history or [])[-2:]
     ]
+    return build_messages(
+        SQL_SYSTEM_PROMPT,
+        user_question,
+        template=(
+            f"Default lookback: {settings.default_lookback_days} days\n"
+            f"Maximum queries: {settings.sql_plan_max_queries}\n"
+            f"Generate SQL for: {{question}}\nIntent: {intent}"
+        ),
+        history_lines=history_lines,
+        history_header="Previous queries:",
+        agent="sql"
+    )
+
+
+def generate_sql(user_question: str, intent: str, tenant_id: str, conversation_history: list = None) -> str:
+    """
+    Generate SQL query from user question.
     
-    if conversation_history:
-        context = "\n".join([f"User: {h.get('user', '')}\nSQL: {h.get('sql', 'N/A')}" for h in conversation_history[-2:]])
-        messages.insert(1, HumanMessage(content=f"Previous queries:\n{context}"))
+    Always includes tenant_id filter for security. The prompt never contains
+    the tenant; the model writes a ${tenant_id} placeholder that is substituted here.
+    """
+    messages = build_sql_messages(user_question, intent, conversation_history)
     
-    sql = llm_client.invoke(messages).strip()
+    sql = llm_client.invoke(messages, agent="sql").strip()
+    return clean_sql(sql, tenant_id)
+
+
+async def agenerate_sql(user_question: str, intent: str, tenant_id: str, conversation_history: list = None) -> str:
+    """Async generate_sql."""
+    messages = build_sql_messages(user_question, intent, conversation_history)
     
+    sql = (await llm_client.ainvoke(messages, agent="sql")).strip()
+    return clean_sql(sql, tenant_id)
+
+
+def split_sql_plan(response: str, tenant_id: str) -> List[str]:
+    """
+    Split a raw LLM response into its independent queries.
+    
+    Statements are separated by a semicolon at the end of a line; each one
+    is cleaned like a single query. Statements that do not start with
+    SELECT or WITH (prose after the last query) are dropped before they
+    reach Athena. At most sql_plan_max_queries are kept.
+    """
+    response = re.sub(r'```(?:sql)?', '', response)
+    statements = [clean_sql(part.strip(), tenant_id) for part in re.split(r';[ \t]*(?:\n|$)', response)]
+    plan = [sql for sql in statements if _QUERY_START.match(sql)] or statements[:1]
+    if len(plan) < len([sql for sql in statements if sql]):
+        logger.warning("Dropped text after the SQL that is not a query")
+    if len(plan) > settings.sql_plan_max_queries:
+        logger.warning(f"SQL plan has {len(plan)} queries; keeping the first {settings.sql_plan_max_queries}")
+    return plan[:settings.sql_plan_max_queries]
+
+
+async def agenerate_sql_plan(user_question: str, intent: str, tenant_id: str, conversation_history: list = None) -> List[str]:
+    """Generate one or more independent SQL queries answering the question."""
+    messages = build_sql_messages(user_question, intent, conversation_history)
+    return split_sql_plan((await llm_client.ainvoke(messages, agent="sql")).strip(), tenant_id)
+
+
+def clean_sql(sql: str, tenant_id: str) -> str:
+    """Extract the SQL statement from a raw LLM response and bind the tenant."""
     # Log raw response for debugging
     import logging
     logging.basicConfig(level=logging.DEBUG)
@@ -219,6 +303,9 @@ FROM prev_7_days p"""
     if sql.endswith(';'):
         sql = sql[:-1].strip()
     
+    # Bind the tenant placeholder
+    sql = sql.replace("${tenant_id}", tenant_id)
+    
     # Validate SQL completeness
     open_parens = sql.count('(')
     close_parens = sql.count(')')
@@ -251,12 +338,16 @@ FROM prev_7_days p"""
     return sql
 
 
+def _validate_sql(sql: str) -> None:
+    """Reject anything that does not look like a SQL statement."""
+    if not re.match(r'\s*(SELECT|WITH|CREATE|INSERT|UPDATE|DELETE)\b', sql, re.IGNORECASE):
+        raise ValueError(f"Invalid SQL query. Must start with SELECT, WITH, CREATE, etc. Got: {sql[:100]}")
+
+
 def execute_query(sql: str, tenant_id: str, use_cache: bool = True) -> Dict[str, Any]:
     """Execute SQL query with caching."""
     # Validate SQL before executing
-    sql_upper = sql.upper().strip()
-    if not sql_upper.startswith(('SELECT', 'WITH', 'CREATE', 'INSERT', 'UPDATE', 'DELETE')):
-        raise ValueError(f"Invalid SQL query. Must start with SELECT, WITH, CREATE, etc. Got: {sql[:100]}")
+    _validate_sql(sql)
     
     # Check cache
     cache_key = athena_client.get_query_cache_key(sql, tenant_id)
@@ -283,3 +374,144 @@ def execute_query(sql: str, tenant_id: str, use_cache: bool = True) -> Dict[str,
     return result
 
 
+async def aexecute_query(sql: str, tenant_id: str, use_cache: bool = True) -> Dict[str, Any]:
+    """Async execute_query; waits on Athena without holding a thread."""
+    _validate_sql(sql)
+
+    cache_key = athena_client.get_query_cache_key(sql, tenant_id)
+    
+    if use_cache:
+        cached_result = cache.get(cache_key)
+        if cached_result:
+            cached_result['cached'] = True
+            return cached_result
+    
+    try:
+        if use_cache:
+            result = await _single_flight(cache_key, sql, tenant_id)
+        else:
+            result = await athena_client.aexecute_query(sql, tenant_id)
+    except Exception as e:
+        e.sql_used = sql
+        raise
+    
+    result['cached'] = False
+    return result
+
+
+async def _single_flight(cache_key: str, sql: str, tenant_id: str) -> Dict[str, Any]:
+    """
+    Run a query once for all concurrent callers with the same cache key.
+    
+    Callers that arrive while the query is running (e.g. dashboard tiles of a
+    batch asking for the same data) await the same execution instead of
+    starting their own. The execution caches its result itself and is
+    shielded, so one caller going away does not cancel it for the others.
+    
+    A caller only joins an execution running at its own priority or a higher
+    one: an interactive chat never waits behind a background (prewarm) query.
+    """
+    priority = current_priority()
+    joinable = PRIORITIES[:PRIORITIES.index(priority) + 1]
+    task = next((_inflight[(cache_key, p)] for p in joinable if (cache_key, p) in _inflight), None)
+    if task is None:
+        async def run():
+            result = await athena_client.aexecute_query(sql, tenant_id)
+            cache.set(cache_key, result)
+            return result
+        
+        task = asyncio.ensure_future(run())
+        _inflight[(cache_key, priority)] = task
+        task.add_done_callback(lambda _: _inflight.pop((cache_key, priority), None))
+    else:
+        metrics.incr("athena.single_flight_shared")
+    result = await asyncio.shield(task)
+    return {**result}  # Each caller gets its own dict to annotate
+
+
+def merge_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge the results of a query plan into one result for downstream agents.
+    
+    Results with the first result's date column are outer-joined on it (one
+    row per date, clashing metric names get a _2, _3 ... suffix). Results
+    with another date column, or without one, cannot share rows with them
+    (e.g. weekly next to daily data), so they are returned unchanged in
+    additional_results. The merged result carries all SQL statements and a
+    query_count.
+    """
+    if len(results) == 1:
+        return results[0]
+    
+    key = find_date_column(results[0].get('columns', []))
+    if key:
+        joined = [r for r in results if find_date_column(r.get('columns', [])) == key]
+    else:
+        joined = results[:1]
+    additional = [r for r in results if not any(r is j for j in joined)]
+    
+    columns: List[str] = []
+    if key:
+        merged: Dict[str, Dict[str, Any]] = {}
+        columns.append(key)
+        for i, result in enumerate(joined):
+            renames = {}
+            for col in result.get('columns', []):
+                if col == key or (col in columns and col in NON_METRIC_COLUMNS):
+                    continue
+                renames[col] = col if col not in columns else f"{col}_{i + 1}"
+                columns.append(renames[col])
+            for row in result.get('rows', []):
+                target = merged.setdefault(str(row.get(key)), {key: row.get(key)})
+                target.update({renames[col]: value for col, value in row.items() if col in renames})
+        rows = list(merged.values())
+    else:
+        columns = list(joined[0].get('columns', []))
+        rows = list(joined[0].get('rows', []))
+    
+    merged_result = {
+        'columns': columns,
+        'rows': rows,
+        'sql': ';\n\n'.join(r.get('sql', '') for r in results),
+        'query_count': len(results),
+        'cached': all(r.get('cached') for r in results)
+    }
+    if additional:
+        merged_result['additional_results'] = [
+            {'columns': r.get('columns', []), 'rows': r.get('rows', []), 'sql': r.get('sql', '')}
+            for r in additional
+        ]
+    return merged_result
+
+
+def _plan_results(plan: List[str], outcomes: List[Any]) -> Dict[str, Any]:
+    """Merge successful plan queries; raise the first error if none succeeded."""
+    results = []
+    for sql, outcome in zip(plan, outcomes):
+        if isinstance(outcome, Exception):
+            logger.warning(f"Planned query failed, continuing with the others: {outcome}\n{sql}")
+        else:
+            results.append(outcome)
+    if not results:
+        raise outcomes[0]
+    return merge_results(results)
+
+
+async def aexecute_plan(plan: List[str], tenant_id: str, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Execute a query plan and merge the results: the queries run
+    concurrently, at most sql_plan_parallelism at a time for this request.
+    """
+    if len(plan) == 1:
+        return await aexecute_query(plan[0], tenant_id, use_cache)
+    
+    semaphore = asyncio.Semaphore(settings.sql_plan_parallelism)
+    
+    async def run(sql):
+        async with semaphore:
+            return await aexecute_query(sql, tenant_id, use_cache)
+    
+    outcomes = await asyncio.gather(*(run(sql) for sql in plan), return_exceptions=True)
+    return _plan_results(plan, outcomes)
+
+
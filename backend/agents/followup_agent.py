@@ -0,0 +1,175 @@
+"""Follow-up planner: answer refinements from the previous turn's result."""
+import re
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+import numpy as np
+from result_profiler import find_date_column, parse_dates, to_numeric_matrix, NON_METRIC_COLUMNS
+from .anomaly_agent import METRIC_KEYWORDS
+
+
+# Words that refer back to the previous answer
+_REFERENCE = re.compile(r"\b(that|this|it|those|these|them|same|just|only|instead|now|what about|how about)\b")
+
+# Re-chart or explain the previous data as it is
+_CHART = re.compile(r"\b(chart|graph|plot|visuali[sz]e|bars?|lines?|pie|table)\b")
+_EXPLAIN = re.compile(r"\b(why|explain|mean|means|meaning)\b")
+
+# Refinements that can be applied in-process
+_WEEKENDS = re.compile(r"\bweekends?\b")
+_WEEKDAYS = re.compile(r"\b(weekdays?|workdays?|week days)\b")
+_LAST_N = re.compile(r"\b(?:last|past|recent)\s+(\d+\s+)?(day|week|month)s?\b")
+_GROUP = re.compile(r"\b(weekly|by week|per week|each week|monthly|by month|per month|each month)\b")
+
+# Any other time reference means the question needs a different period
+_PERIOD = re.compile(r"\b(today|yesterday|day|days|week|weeks|month|months|quarter|year|years|since|between|\d{4})\b")
+
+PERIOD_UNIT_DAYS = {'day': 1, 'week': 7, 'month': 30}
+
+
+def _dimension_columns(rows: List[Dict], columns: List[str]) -> List[str]:
+    """Non-numeric columns other than dates and partition keys (e.g. data_type, period)."""
+    metric_columns, _ = to_numeric_matrix(rows, columns)
+    return [c for c in columns if c not in metric_columns and c not in NON_METRIC_COLUMNS]
+
+
+def plan_followup(user_question: str, previous: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Decide whether a question can be answered from the previous result.
+    
+    Returns a plan (weekday filter, trailing-days filter, metric columns,
+    weekly/monthly re-aggregation) or None when the question needs new data:
+    it does not refer back to the previous answer, asks for a metric the
+    result lacks, or asks for a period the result does not cover.
+    """
+    if not previous or not previous.get('rows'):
+        return None
+    question = user_question.lower()
+    if not _REFERENCE.search(question):
+        return None
+    
+    rows = previous['rows']
+    columns = previous.get('columns', [])
+    date_column = find_date_column(columns)
+    dates = parse_dates(rows, date_column) if date_column else None
+    
+    mentioned = {m for word, names in METRIC_KEYWORDS.items() if re.search(rf'\b{word}', question) for m in names}
+    selected = [c for c in columns if c in mentioned]
+    if mentioned and not selected:
+        return None
+    
+    plan: Dict[str, Any] = {'weekday': None, 'last_days': None, 'columns': selected or None, 'group_by': None}
+    remaining = question
+    
+    if _WEEKENDS.search(question) or _WEEKDAYS.search(question):
+        if dates is None:
+            return None
+        plan['weekday'] = 'weekend' if _WEEKENDS.search(question) else 'weekday'
+        remaining = _WEEKDAYS.sub(' ', _WEEKENDS.sub(' ', remaining))
+    
+    match = _LAST_N.search(question)
+    if match:
+        days = int(match.group(1) or 1) * PERIOD_UNIT_DAYS[match.group(2)]
+        today = np.datetime64(datetime.utcnow().date(), 'D')
+        # The previous result must reach back far enough
+        if dates is None or dates.min() > today - days:
+            return None
+        plan['last_days'] = days
+        remaining = _LAST_N.sub(' ', remaining)
+    
+    match = _GROUP.search(question)
+    if match:
+        if dates is None or _dimension_columns(rows, columns):
+            return None
+        group_by = 'month' if 'month' in match.group(1) else 'week'
+        if not (group_by == 'week' and date_column == 'week_start'):
+            plan['group_by'] = group_by
+        remaining = _GROUP.sub(' ', remaining)
+    
+    if _PERIOD.search(remaining):
+        return None
+    
+    refines = plan['weekday'] or plan['last_days'] or plan['columns'] or plan['group_by']
+    if not refines and not _CHART.search(question) and not _EXPLAIN.search(question):
+        return None
+    return plan
+
+
+def _aggregate(rows: List[Dict], columns: List[str], dates: np.ndarray, group_by: str) -> Dict[str, Any]:
+    """Re-aggregate dated rows by week (Monday start) or month in one vectorized pass."""
+    if group_by == 'week':
+        bucket_column = 'week_start'
+        buckets = (dates - (dates.astype(int) + 3) % 7).astype(str)
+    else:
+        bucket_column = 'month'
+        buckets = dates.astype('datetime64[M]').astype(str)
+    
+    metric_columns, matrix = to_numeric_matrix(rows, columns)
+    keys, inverse = np.unique(buckets, return_inverse=True)
+    shape = (len(keys), len(metric_columns))
+    valid = ~np.isnan(matrix)
+    counts = np.zeros(shape)
+    sums = np.zeros(shape)
+    maxs = np.full(shape, np.nan)
+    mins = np.full(shape, np.nan)
+    np.add.at(counts, inverse, valid)
+    np.add.at(sums, inverse, np.where(valid, matrix, 0.0))
+    np.fmax.at(maxs, inverse, matrix)
+    np.fmin.at(mins, inverse, matrix)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    
+    values = {}
+    for j, col in enumerate(metric_columns):
+        if 'max' in col:
+            values[col] = maxs[:, j]
+        elif 'min' in col:
+            values[col] = mins[:, j]
+        elif 'avg' in col or 'mean' in col:
+            values[col] = means[:, j]
+        else:
+            values[col] = np.where(counts[:, j] > 0, sums[:, j], np.nan)
+    
+    days = np.bincount(inverse, minlength=len(keys))
+    out_rows = []
+    for i, key in enumerate(keys):
+        row = {bucket_column: str(key), 'days': int(days[i])}
+        for col in metric_columns:
+            value = float(values[col][i])
+            row[col] = None if np.isnan(value) else round(value, 2)
+        out_rows.append(row)
+    return {'columns': [bucket_column, 'days'] + metric_columns, 'rows': out_rows}
+
+
+def apply_followup(plan: Dict[str, Any], previous: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply a follow-up plan to the previous result; the previous result is not modified."""
+    rows = list(previous.get('rows', []))
+    columns = list(previous.get('columns', []))
+    date_column = find_date_column(columns)
+    
+    if plan['weekday'] or plan['last_days'] or plan['group_by']:
+        dates = parse_dates(rows, date_column)
+        keep = np.ones(len(rows), dtype=bool)
+        if plan['weekday']:
+            weekend = (dates.astype(int) + 3) % 7 >= 5
+            keep &= weekend if plan['weekday'] == 'weekend' else ~weekend
+        if plan['last_days']:
+            keep &= dates >= np.datetime64(datetime.utcnow().date(), 'D') - plan['last_days']
+        rows = [row for row, k in zip(rows, keep) if k]
+        dates = dates[keep]
+    
+    if plan['columns']:
+        metric_columns, _ = to_numeric_matrix(rows or previous.get('rows', []), columns)
+        columns = [c for c in columns if c not in metric_columns or c in plan['columns']]
+        rows = [{c: row.get(c) for c in columns} for row in rows]
+    
+    if plan['group_by']:
+        derived = _aggregate(rows, columns, dates, plan['group_by']) if rows else {'columns': columns, 'rows': []}
+    else:
+        derived = {'columns': columns, 'rows': rows}
+    
+    return {
+        **derived,
+        'sql': previous.get('sql'),
+        'cached': True,
+        'followup': {k: v for k, v in plan.items() if v}
+    }
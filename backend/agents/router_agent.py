@@ -1,7 +1,9 @@
 """Router agent for intent classification."""
-from typing import Literal
-from langchain.schema import HumanMessage, SystemMessage
+import re
+from typing import List, Literal
+from langchain_core.messages import BaseMessage
 from llm_client import llm_client
+from prompt_budget import build_messages
 
 
 INTENT_TYPES = Literal[
@@ -11,16 +13,23 @@ INTENT_TYPES = Literal[
     "dashboard",
     "anomaly",
     "coach",
-    "general"
+    "general",
+    "knowledge"
 ]
 
+# Intents answered without querying the tenant's data
+DATA_FREE_INTENTS = {"knowledge"}
 
-def classify_intent(user_question: str, conversation_history: list = None) -> str:
-    """
-    Classify user intent from question.
-    
-    Returns one of: summary, trend, comparison, dashboard, anomaly, coach, general
-    """
+# References to the user's own data or a time period; such questions always query data
+_PERSONAL_DATA = re.compile(
+    r"\b(my|me|mine|myself|i'm|i've|i was|did i|have i|am i|"
+    r"today|yesterday|last|past|recent|recently|this (?:week|month|year))\b",
+    re.IGNORECASE
+)
+
+
+def build_router_messages(user_question: str, conversation_history: list = None) -> List[BaseMessage]:
+    """Build intent classification messages."""
     system_prompt = """You are an intent classifier for a health data analytics system.
 Classify the user's question into one of these intents:
 
@@ -31,30 +40,54 @@ Classify the user's question into one of these intents:
 - anomaly: Questions about anomalies, outliers, or unusual patterns
 - coach: Questions asking for advice, explanations, or health coaching
 - general: General questions that don't fit other categories
+- knowledge: General health or fitness questions that can be answered without the user's own data (e.g. "What is a good resting heart rate?")
 
 Respond with ONLY the intent name, nothing else."""
-
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=f"Question: {user_question}")
-    ]
-    
-    if conversation_history:
-        context = "\n".join([f"User: {h.get('user', '')}" for h in conversation_history[-3:]])
-        messages.insert(1, HumanMessage(content=f"Recent conversation:\n{context}"))
     
-    intent = llm_client.invoke(messages).strip().lower()
+    history_lines = [f"User: {h.get('user', '')}" for h in (conversation_history or [])[-3:]]
+    return build_messages(
+        system_prompt,
+        user_question,
+        template="Question: {question}",
+        history_lines=history_lines,
+        agent="router"
+    )
+
+
+def _parse_intent(response: str, user_question: str) -> str:
+    """Normalize the model's answer to a known intent."""
+    intent = response.strip().lower()
     
     # Validate intent
-    valid_intents = ["summary", "trend", "comparison", "dashboard", "anomaly", "coach", "general"]
+    valid_intents = ["summary", "trend", "comparison", "dashboard", "anomaly", "coach", "general", "knowledge"]
     if intent not in valid_intents:
         # Default to general if invalid
         return "general"
     
+    # Only skip the data lookup when the question clearly isn't about the user's own data
+    if intent in DATA_FREE_INTENTS and _PERSONAL_DATA.search(user_question):
+        return "coach"
+    
     return intent
 
 
+def needs_data(intent: str) -> bool:
+    """Whether questions with this intent need the tenant's data."""
+    return intent not in DATA_FREE_INTENTS
 
 
+def classify_intent(user_question: str, conversation_history: list = None) -> str:
+    """
+    Classify user intent from question.
+    
+    Returns one of: summary, trend, comparison, dashboard, anomaly, coach, general, knowledge
+    (knowledge questions need no tenant data, see needs_data)
+    """
+    messages = build_router_messages(user_question, conversation_history)
+    return _parse_intent(llm_client.invoke(messages, agent="router"), user_question)
 
 
+async def aclassify_intent(user_question: str, conversation_history: list = None) -> str:
+    """Async classify_intent."""
+    messages = build_router_messages(user_question, conversation_history)
+    return _parse_intent(await llm_client.ainvoke(messages, agent="router"), user_question)
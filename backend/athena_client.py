@@ -1,19 +1,39 @@
 """AWS Athena client for querying health data."""
+import asyncio
 import time
 import hashlib
 import json
+import random
+from functools import cached_property
 from typing import Dict, List, Optional, Any
-import boto3
 from botocore.exceptions import ClientError
 from config import settings
+from metrics import metrics
+from query_scheduler import query_scheduler
+from tracing import span
+
+# Seconds between query status checks
+POLL_INTERVAL_SECONDS = 2
+
+# StartQueryExecution errors worth retrying after a backoff
+THROTTLE_ERRORS = ('TooManyRequestsException', 'ThrottlingException')
 
 
 class AthenaClient:
     """Client for executing Athena queries with tenant isolation."""
     
-    def __init__(self):
-        self.athena = boto3.client('athena', region_name=settings.aws_region)
-        self.s3 = boto3.client('s3', region_name=settings.aws_region)
+    # boto3 clients are created on first use (or by the startup warm-up):
+    # importing boto3 and building a client takes a noticeable part of startup
+    
+    @cached_property
+    def athena(self):
+        import boto3
+        return boto3.client('athena', region_name=settings.aws_region)
+    
+    @cached_property
+    def s3(self):
+        import boto3
+        return boto3.client('s3', region_name=settings.aws_region)
     
     def _ensure_tenant_filter(self, sql: str, tenant_id: str) -> str:
         """Ensure SQL includes tenant_id filter."""
@@ -39,101 +59,170 @@ class AthenaClient:
         
         return sql
     
+    def _prepare_sql(self, sql: str, tenant_id: str) -> str:
+        """Apply the tenant filter and substitute the ${tenant_id} placeholder."""
+        # Ensure tenant_id filter
+        sql = self._ensure_tenant_filter(sql, tenant_id)
+        
+        # Replace ${tenant_id} placeholder if present
+        return sql.replace("${tenant_id}", tenant_id)
+    
+    def _start_query(self, sql: str) -> str:
+        """Start query execution, retrying with backoff if Athena throttles; returns the query ID."""
+        for attempt in range(settings.athena_throttle_retries + 1):
+            try:
+                response = self.athena.start_query_execution(
+                    QueryString=sql,
+                    QueryExecutionContext={
+                        'Database': settings.athena_database
+                    },
+                    ResultConfiguration={
+                        'OutputLocation': f's3://{settings.s3_results_bucket}/{settings.s3_results_prefix}'
+                    },
+                    WorkGroup=settings.athena_workgroup
+                )
+                return response['QueryExecutionId']
+            except ClientError as e:
+                code = e.response.get('Error', {}).get('Code')
+                if code not in THROTTLE_ERRORS or attempt == settings.athena_throttle_retries:
+                    raise
+                metrics.incr("athena.throttled")
+                time.sleep(random.uniform(0, 2 ** attempt))
+    
+    def _query_finished(self, query_id: str) -> bool:
+        """True once the query succeeded; raises if it failed or was cancelled."""
+        execution = self.athena.get_query_execution(QueryExecutionId=query_id)
+        status = execution['QueryExecution']['Status']['State']
+                
+        if status == 'SUCCEEDED':
+            return True
+        elif status in ['FAILED', 'CANCELLED']:
+            reason = execution['QueryExecution']['Status'].get('StateChangeReason', 'Unknown error')
+            raise Exception(f"Query failed: {reason}")
+        return False
+    
+    def _fetch_results(self, query_id: str) -> Dict[str, Any]:
+        """Fetch and parse the results of a finished query."""
+        results = self.athena.get_query_results(QueryExecutionId=query_id)
+            
+        # Parse results
+        columns = [col['Name'] for col in results['ResultSet']['ResultSetMetadata']['ColumnInfo']]
+        rows = []
+            
+        for row in results['ResultSet']['Rows'][1:]:  # Skip header
+            values = []
+            for i, col in enumerate(row['Data']):
+                value = col.get('VarCharValue', '')
+                # Try to parse as number if possible
+                try:
+                    if '.' in value:
+                        values.append(float(value))
+                    else:
+                        values.append(int(value))
+                except (ValueError, TypeError):
+                    values.append(value)
+            rows.append(dict(zip(columns, values)))
+        
+        return {'columns': columns, 'rows': rows, 'query_id': query_id}
+    
     def execute_query(
         self,
         sql: str,
         tenant_id: str,
-        timeout: int = None
+        timeout: int = None,
+        priority: str = None
     ) -> Dict[str, Any]:
         """
         Execute Athena query with tenant isolation.
         
+        The query waits for a slot from query_scheduler before it is started
+        and holds it until it finishes.
+        
         Args:
             sql: SQL query (will be modified to include tenant_id filter)
             tenant_id: Tenant ID for data isolation
             timeout: Query timeout in seconds
-            
+            priority: Scheduling class (defaults to the query_priority in effect)
+        
         Returns:
             Dictionary with 'columns', 'rows', 'query_id', 'execution_time'
         """
         timeout = timeout or settings.max_query_timeout
+        sql = self._prepare_sql(sql, tenant_id)
         
-        # Ensure tenant_id filter
-        sql = self._ensure_tenant_filter(sql, tenant_id)
-        
-        # Replace ${tenant_id} placeholder if present
-        sql = sql.replace("${tenant_id}", tenant_id)
-        
-        # Start query execution
         try:
-            response = self.athena.start_query_execution(
-                QueryString=sql,
-                QueryExecutionContext={
-                    'Database': settings.athena_database
-                },
-                ResultConfiguration={
-                    'OutputLocation': f's3://{settings.s3_results_bucket}/{settings.s3_results_prefix}'
-                },
-                WorkGroup=settings.athena_workgroup
-            )
+            with query_scheduler.slot(tenant_id, priority):
+                with span("athena.start"):
+                    query_id = self._start_query(sql)
             
-            query_id = response['QueryExecutionId']
-            
-            # Poll for completion
-            start_time = time.time()
-            while True:
-                execution = self.athena.get_query_execution(QueryExecutionId=query_id)
-                status = execution['QueryExecution']['Status']['State']
-                
-                if status == 'SUCCEEDED':
-                    break
-                elif status in ['FAILED', 'CANCELLED']:
-                    reason = execution['QueryExecution']['Status'].get('StateChangeReason', 'Unknown error')
-                    raise Exception(f"Query failed: {reason}")
-                
-                if time.time() - start_time > timeout:
-                    self.athena.stop_query_execution(QueryExecutionId=query_id)
-                    raise Exception(f"Query timeout after {timeout} seconds")
+                # Poll for completion
+                start_time = time.time()
+                with span("athena.wait", query_id=query_id):
+                    while not self._query_finished(query_id):
+                        if time.time() - start_time > timeout:
+                            self.athena.stop_query_execution(QueryExecutionId=query_id)
+                            raise Exception(f"Query timeout after {timeout} seconds")
                 
-                time.sleep(2)
+                        time.sleep(POLL_INTERVAL_SECONDS)
             
-            execution_time = time.time() - start_time
+                execution_time = time.time() - start_time
             
             # Get results
-            results = self.athena.get_query_results(QueryExecutionId=query_id)
-            
-            # Parse results
-            columns = [col['Name'] for col in results['ResultSet']['ResultSetMetadata']['ColumnInfo']]
-            rows = []
+            with span("athena.fetch", query_id=query_id):
+                result = self._fetch_results(query_id)
+        
+        except ClientError as e:
+            raise Exception(f"AWS error: {str(e)}")
+        
+        return {**result, 'execution_time': execution_time, 'sql': sql}
+    
+    async def aexecute_query(
+        self,
+        sql: str,
+        tenant_id: str,
+        timeout: int = None,
+        priority: str = None
+    ) -> Dict[str, Any]:
+        """
+        Async execute_query.
+        
+        Each boto3 call runs in a worker thread only for the duration of the
+        API request; the wait between polls is an asyncio sleep, so a query
+        that runs for seconds does not hold a thread.
+        """
+        timeout = timeout or settings.max_query_timeout
+        sql = self._prepare_sql(sql, tenant_id)
+        
+        try:
+            async with query_scheduler.aslot(tenant_id, priority):
+                with span("athena.start"):
+                    query_id = await asyncio.to_thread(self._start_query, sql)
             
-            for row in results['ResultSet']['Rows'][1:]:  # Skip header
-                values = []
-                for i, col in enumerate(row['Data']):
-                    value = col.get('VarCharValue', '')
-                    # Try to parse as number if possible
-                    try:
-                        if '.' in value:
-                            values.append(float(value))
-                        else:
-                            values.append(int(value))
-                    except (ValueError, TypeError):
-                        values.append(value)
-                rows.append(dict(zip(columns, values)))
+                # Poll for completion
+                start_time = time.time()
+                with span("athena.wait", query_id=query_id):
+                    while not await asyncio.to_thread(self._query_finished, query_id):
+                        if time.time() - start_time > timeout:
+                            await asyncio.to_thread(self.athena.stop_query_execution, QueryExecutionId=query_id)
+                            raise Exception(f"Query timeout after {timeout} seconds")
+                
+                        await asyncio.sleep(POLL_INTERVAL_SECONDS)
             
-            return {
-                'columns': columns,
-                'rows': rows,
-                'query_id': query_id,
-                'execution_time': execution_time,
-                'sql': sql
-            }
+                execution_time = time.time() - start_time
             
+            # Get results
+            with span("athena.fetch", query_id=query_id):
+                result = await asyncio.to_thread(self._fetch_results, query_id)
+        
         except ClientError as e:
             raise Exception(f"AWS error: {str(e)}")
+        
+        return {**result, 'execution_time': execution_time, 'sql': sql}
     
     def get_query_cache_key(self, sql: str, tenant_id: str) -> str:
-        """Generate cache key for query."""
-        cache_string = f"{sql}:{tenant_id}"
+        """Generate cache key for query (insensitive to whitespace and a trailing semicolon)."""
+        normalized = " ".join(sql.split()).rstrip(";").rstrip()
+        cache_string = f"{normalized}:{tenant_id}"
         return hashlib.md5(cache_string.encode()).hexdigest()
 
 
@@ -1,6 +1,10 @@
 """Authentication and authorization."""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict
+from typing import Optional, Dict, Any
 try:
     from jose import JWTError, jwt
 except ImportError:
@@ -9,6 +13,7 @@ except ImportError:
     import jose.jwt as jwt
 from fastapi import HTTPException, status
 from config import settings
+from metrics import metrics
 
 
 def create_access_token(data: Dict[str, str], expires_delta: Optional[timedelta] = None) -> str:
@@ -32,8 +37,58 @@ def create_access_token(data: Dict[str, str], expires_delta: Optional[timedelta]
     return encoded_jwt
 
 
+class VerifiedTokenCache:
+    """
+    Claims of recently verified tokens, keyed by token digest.
+    
+    A cached token skips signature verification until its `exp` claim
+    (tokens without one are not cached). At most token_cache_max_entries
+    tokens are kept; the least recently used is evicted first. Only tokens
+    that verified are cached, so a bad token is re-checked every time.
+    """
+    
+    def __init__(self):
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _key(self, token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+    
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            payload, expiry = entry
+            if time.time() >= expiry:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return payload
+    
+    def put(self, token: str, payload: Dict[str, Any]) -> None:
+        expiry = payload.get("exp")
+        if not isinstance(expiry, (int, float)) or settings.token_cache_max_entries <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (payload, expiry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.token_cache_max_entries:
+                self._entries.popitem(last=False)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
 def verify_token(token: str) -> Dict[str, str]:
-    """Verify and decode JWT token."""
+    """Verify and decode JWT token (claims of tokens verified before come from verified_tokens)."""
+    payload = verified_tokens.get(token)
+    if payload is not None:
+        metrics.incr("auth.token_cache.hit")
+        return payload
+    metrics.incr("auth.token_cache.miss")
     try:
         payload = jwt.decode(
             token,
@@ -41,17 +96,22 @@ def verify_token(token: str) -> Dict[str, str]:
             algorithms=[settings.jwt_algorithm],
             options={"verify_signature": True, "verify_exp": True, "leeway": 60}
         )
-        return payload
     except JWTError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Invalid token: {str(e)}"
         )
+    verified_tokens.put(token, payload)
+    return payload
 
 
 def get_tenant_id_from_token(token: str) -> str:
     """Extract tenant_id from JWT token."""
-    payload = verify_token(token)
+    return get_tenant_id_from_claims(verify_token(token))
+
+
+def get_tenant_id_from_claims(payload: Dict[str, Any]) -> str:
+    """Extract tenant_id from verified token claims."""
     tenant_id = payload.get("tenant_id")
     
     if not tenant_id:
@@ -91,3 +151,6 @@ def dev_login(username: str) -> Dict[str, str]:
         "username": username
     }
 
+
+# Singleton instance
+verified_tokens = VerifiedTokenCache()
@@ -0,0 +1,220 @@
+"""Incremental per-tenant, per-metric anomaly baselines."""
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+import numpy as np
+from athena_client import athena_client
+from cache import cache
+from config import settings
+from result_profiler import to_numeric_matrix
+
+logger = logging.getLogger(__name__)
+
+# gold_daily_features metrics tracked per tenant
+BASELINE_METRICS = [
+    'steps_total', 'distance_km_total', 'active_kcal_total', 'basal_kcal_total',
+    'flights_total', 'hr_avg', 'hr_max', 'hr_min'
+]
+
+
+class MetricBaseline:
+    """
+    Running moments of one metric.
+    
+    Welford's algorithm keeps the exact long-run mean and variance; the
+    exponentially weighted mean and variance follow recent behaviour so a
+    slow drift (e.g. a new training plan) does not look anomalous forever.
+    Both are updated in O(1) per new value.
+    """
+    
+    __slots__ = ('count', 'mean', 'm2', 'ewm_mean', 'ewm_var')
+    
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0, ewm_mean: float = 0.0, ewm_var: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.ewm_mean = ewm_mean
+        self.ewm_var = ewm_var
+    
+    def update(self, value: float, alpha: float) -> None:
+        """Add one value."""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        
+        if self.count == 1:
+            self.ewm_mean = value
+            self.ewm_var = 0.0
+        else:
+            diff = value - self.ewm_mean
+            increment = alpha * diff
+            self.ewm_mean += increment
+            self.ewm_var = (1 - alpha) * (self.ewm_var + diff * increment)
+    
+    @property
+    def std(self) -> float:
+        """Long-run sample standard deviation."""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+    
+    @property
+    def ewm_std(self) -> float:
+        """Exponentially weighted standard deviation."""
+        return math.sqrt(max(self.ewm_var, 0.0))
+    
+    def to_list(self) -> List[float]:
+        """Compact serializable form."""
+        return [self.count, self.mean, self.m2, self.ewm_mean, self.ewm_var]
+    
+    @classmethod
+    def from_list(cls, values: List[float]) -> "MetricBaseline":
+        return cls(*values)
+
+
+def _alpha() -> float:
+    """EWMA smoothing factor for the configured half-life in days."""
+    return 1 - 0.5 ** (1 / settings.anomaly_baseline_halflife_days)
+
+
+class BaselineStore:
+    """
+    Per-tenant metric baselines kept in the cache backend.
+    
+    Each tenant has one entry holding the moments of every metric, the last
+    day ingested and the day of the last successful refresh. Only complete
+    days (before today) after the last ingested day are ingested, so
+    refreshing is idempotent and each day is counted once. A tenant is read
+    from Athena at most once per day, also when it has no new days (a new
+    tenant, or one whose data stopped).
+    """
+    
+    def _key(self, tenant_id: str) -> str:
+        return f"baseline:{tenant_id}"
+    
+    def _parse(self, entry: Optional[Dict[str, Any]]) -> Tuple[Optional[str], Dict[str, MetricBaseline]]:
+        if not entry:
+            return None, {}
+        baselines = {name: MetricBaseline.from_list(values) for name, values in entry['metrics'].items()}
+        return entry['last_day'], baselines
+    
+    def load(self, tenant_id: str) -> Tuple[Optional[str], Dict[str, MetricBaseline]]:
+        """Last ingested day and baselines of a tenant."""
+        return self._parse(cache.get(self._key(tenant_id)))
+    
+    def save(
+        self,
+        tenant_id: str,
+        last_day: Optional[str],
+        baselines: Dict[str, MetricBaseline],
+        refreshed_on: str = None
+    ) -> None:
+        cache.set(
+            self._key(tenant_id),
+            {
+                'last_day': last_day,
+                'refreshed_on': refreshed_on,
+                'metrics': {name: b.to_list() for name, b in baselines.items()}
+            },
+            ttl=settings.anomaly_baseline_ttl
+        )
+    
+    def ingest(self, tenant_id: str, rows: List[Dict[str, Any]], date_column: str = 'day', refreshed_on: str = None) -> int:
+        """
+        Fold new daily rows into a tenant's baselines.
+        
+        Rows already ingested or for today (still incomplete) are skipped.
+        With refreshed_on (the refresh that read the rows) the entry is saved
+        even when no day was added, so the refresh is not repeated that day.
+        Returns the number of days added.
+        """
+        last_day, baselines = self.load(tenant_id)
+        today = datetime.utcnow().strftime('%Y-%m-%d')
+        new_rows = sorted(
+            (row for row in rows if last_day is None or str(row.get(date_column, ''))[:10] > last_day),
+            key=lambda row: str(row.get(date_column, ''))
+        )
+        new_rows = [row for row in new_rows if str(row.get(date_column, ''))[:10] < today]
+        if not new_rows:
+            if refreshed_on:
+                self.save(tenant_id, last_day, baselines, refreshed_on)
+            return 0
+        
+        metric_columns, matrix = to_numeric_matrix(new_rows, [c for c in BASELINE_METRICS if c in new_rows[0]])
+        alpha = _alpha()
+        for j, name in enumerate(metric_columns):
+            baseline = baselines.setdefault(name, MetricBaseline())
+            for value in matrix[:, j]:
+                if not np.isnan(value):
+                    baseline.update(float(value), alpha)
+        
+        self.save(tenant_id, str(new_rows[-1][date_column])[:10], baselines, refreshed_on)
+        return len(new_rows)
+    
+    def _refresh_query(self, last_day: Optional[str], refreshed_on: Optional[str]) -> Optional[Tuple[str, str]]:
+        """(since, SQL) reading the days a baseline is missing, or None when it is current."""
+        today = datetime.utcnow().date()
+        yesterday = (today - timedelta(days=1)).strftime('%Y-%m-%d')
+        if last_day and last_day >= yesterday or refreshed_on == today.strftime('%Y-%m-%d'):
+            return None
+        
+        since = last_day or (today - timedelta(days=settings.anomaly_baseline_days + 1)).strftime('%Y-%m-%d')
+        sql = f"""SELECT day, {', '.join(BASELINE_METRICS)}
+FROM health_data_lake.gold_daily_features
+WHERE tenant_id = '${{tenant_id}}'
+  AND dt > '{since}'
+  AND dt < '{today.strftime('%Y-%m-%d')}'
+ORDER BY day"""
+        return since, sql
+    
+    async def arefresh(self, tenant_id: str) -> Dict[str, MetricBaseline]:
+        """
+        Ingest any complete days newer than the baseline, then return it.
+        
+        The first refresh reads anomaly_baseline_days of history; later ones
+        only read the days since the last refresh, and none at all when the
+        baseline already covers yesterday or was refreshed today.
+        """
+        entry = cache.get(self._key(tenant_id))
+        last_day, baselines = self._parse(entry)
+        query = self._refresh_query(last_day, (entry or {}).get('refreshed_on'))
+        if query is None:
+            return baselines
+        
+        since, sql = query
+        try:
+            results = await athena_client.aexecute_query(sql.replace("${tenant_id}", tenant_id), tenant_id)
+        except Exception as e:
+            logger.warning(f"Baseline refresh failed for tenant {tenant_id}: {e}")
+            return baselines
+        
+        added = self.ingest(tenant_id, results.get('rows', []), refreshed_on=datetime.utcnow().strftime('%Y-%m-%d'))
+        logger.info(f"Baseline for tenant {tenant_id}: ingested {added} days since {since}")
+        return self.load(tenant_id)[1]
+
+
+def baseline_scores(
+    baselines: Dict[str, MetricBaseline],
+    metric_columns: List[str],
+    matrix: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score a result matrix against stored baselines in O(1) per value.
+    
+    Uses the exponentially weighted moments. Columns without a baseline of at
+    least anomaly_baseline_min_days values get NaN scores.
+    """
+    means = np.full(len(metric_columns), np.nan)
+    stds = np.full(len(metric_columns), np.nan)
+    for j, name in enumerate(metric_columns):
+        baseline = baselines.get(name)
+        if baseline and baseline.count >= settings.anomaly_baseline_min_days and baseline.ewm_std > 0:
+            means[j] = baseline.ewm_mean
+            stds[j] = baseline.ewm_std
+    with np.errstate(invalid='ignore'):
+        scores = (matrix - means) / stds
+    return scores, np.broadcast_to(means, matrix.shape)
+
+
+# Singleton instance
+baseline_store = BaselineStore()
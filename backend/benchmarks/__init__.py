@@ -0,0 +1 @@
+"""Benchmarks and local stand-ins for exercising the backend without AWS or a real LLM."""
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+In-process LLM backend with deterministic answers and configurable latency.
+
+FakeLLMBackend is an LLMBackend, so it plugs into LLMClient's routing,
+per-backend concurrency limit and metrics like a real provider; only the
+HTTP call is replaced by a sleep. Each agent is recognized by its system
+prompt and gets an answer its parser accepts:
+
+  router     an intent from keywords in the question
+  sql        a gold_daily_features / gold_weekly_features query for the
+             question's metrics and period ("last 14 days", "weekly", ...)
+  dashboard  a Vega-Lite line chart of the first two result columns
+  anomaly    a fixed explanation
+  coach      a fixed answer (streamed word by word)
+
+The same question always gets the same answer.
+
+Usage (from backend/):
+    python -m benchmarks.fake_llm "Show my heart rate for the last 14 days"
+"""
+import argparse
+import ast
+import asyncio
+import random
+import re
+import time
+from typing import List, Iterator, AsyncIterator
+from langchain_core.messages import AIMessageChunk, BaseMessage, HumanMessage
+from config import settings
+from llm_client import LLMBackend, llm_client, _get_semaphore
+from prompt_budget import count_tokens
+
+# Agent by the start of its system prompt
+_AGENTS = {
+    "You are an intent classifier": "router",
+    "You are a SQL query generator": "sql",
+    "You are a chart generator": "dashboard",
+    "You are a data analyst explaining anomalies": "anomaly",
+    "You are a health and fitness coach": "coach",
+}
+
+_INTENT_KEYWORDS = [
+    ("dashboard", r"\b(chart|plot|graph|dashboard|visuali[sz]e|show)\b"),
+    ("anomaly", r"\b(anomal\w*|unusual|outliers?|spikes?)\b"),
+    ("comparison", r"\b(compare|vs|versus)\b"),
+    ("trend", r"\b(trends?|over time)\b"),
+    ("knowledge", r"^(what is|what's|how much .* should)\b"),
+]
+
+_DAILY_COLUMNS = {
+    "heart": ["hr_avg", "hr_max", "hr_min"],
+    "calorie": ["active_kcal_total", "basal_kcal_total"],
+    "distance": ["distance_km_total"],
+    "flight": ["flights_total"],
+    "step": ["steps_total"],
+}
+
+ANSWER = (
+    "Over this period you averaged about 8,000 steps a day with a steady resting heart rate. "
+    "Your most active days were midweek, and activity dipped on weekends. Keeping a short walk "
+    "on lighter days would even out your week."
+)
+
+EXPLANATION = "These days stand out against your previous four weeks, most likely from unusually long workouts."
+
+
+def _agent(messages: List[BaseMessage]) -> str:
+    system = messages[0].content if messages else ""
+    for prefix, agent in _AGENTS.items():
+        if system.startswith(prefix):
+            return agent
+    return "coach"
+
+
+def _question(agent: str, request: str) -> str:
+    """The user question inside an agent's request message."""
+    pattern = {
+        "router": r"Question: (.*)",
+        "sql": r"Generate SQL for: (.*)\nIntent:",
+        "dashboard": r"User question: (.*)\n",
+    }.get(agent)
+    match = re.search(pattern, request, re.DOTALL) if pattern else None
+    return (match.group(1) if match else request).strip().lower()
+
+
+def _intent(question: str) -> str:
+    for intent, pattern in _INTENT_KEYWORDS:
+        if re.search(pattern, question):
+            return intent
+    return "summary"
+
+
+def _sql(question: str) -> str:
+    match = re.search(r"(\d+)\s*(day|week)s?", question)
+    days = int(match.group(1)) * (7 if match.group(2) == "week" else 1) if match else settings.default_lookback_days
+    if "week" in question and not match or "weekly" in question:
+        return f"""SELECT week_start, steps_week, hr_avg_week
+FROM health_data_lake.gold_weekly_features
+WHERE tenant_id = '${{tenant_id}}'
+  AND week_start >= DATE_FORMAT(DATE_ADD('day', -{max(days, 84)}, CURRENT_DATE), '%Y-%m-%d')
+ORDER BY week_start"""
+    columns = [col for word, cols in _DAILY_COLUMNS.items() if word in question for col in cols] or ["steps_total"]
+    return f"""SELECT day, {', '.join(columns)}
+FROM health_data_lake.gold_daily_features
+WHERE tenant_id = '${{tenant_id}}'
+  AND dt >= DATE_FORMAT(DATE_ADD('day', -{days}, CURRENT_DATE), '%Y-%m-%d')
+ORDER BY day"""
+
+
+def _chart(request: str) -> str:
+    match = re.search(r"Columns: (\[.*?\])", request)
+    columns = ast.literal_eval(match.group(1)) if match else ["day", "value"]
+    x, y = (columns + ["value"])[:2]
+    return (
+        '{"spec_type": "vega-lite", "spec": {"mark": "line", "width": "container", '
+        f'"encoding": {{"x": {{"field": "{x}", "type": "temporal"}}, '
+        f'"y": {{"field": "{y}", "type": "quantitative"}}}}}}}}'
+    )
+
+
+def reply(messages: List[BaseMessage]) -> str:
+    """Deterministic answer for an agent's messages."""
+    agent = _agent(messages)
+    request = messages[-1].content if messages else ""
+    if agent == "router":
+        return _intent(_question(agent, request))
+    if agent == "sql":
+        return _sql(_question(agent, request))
+    if agent == "dashboard":
+        return _chart(request)
+    if agent == "anomaly":
+        return EXPLANATION
+    return ANSWER
+
+
+class FakeLLMBackend(LLMBackend):
+    """LLMBackend answering with reply() after latency_ms (plus uniform jitter)."""
+    
+    def __init__(self, name: str = "fake", latency_ms: float = 50, jitter_ms: float = 0, seed: int = 0):
+        super().__init__(name, "fake", "deterministic", base_url="in-process")
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+    
+    def _delay(self) -> float:
+        return (self.latency_ms + self._random.uniform(0, self.jitter_ms)) / 1000
+    
+    def invoke(self, messages: List[BaseMessage], **kwargs) -> str:
+        time.sleep(self._delay())
+        return reply(messages)
+    
+    def stream(self, messages: List[BaseMessage]) -> Iterator[AIMessageChunk]:
+        time.sleep(self._delay())
+        for word in reply(messages).split(" "):
+            yield AIMessageChunk(content=word + " ")
+    
+    async def ainvoke(self, messages: List[BaseMessage], timeout: float = None) -> str:
+        queue_ms = await self._acquire(timeout or settings.llm_timeout_seconds)
+        start = time.perf_counter()
+        try:
+            await asyncio.sleep(self._delay())
+        finally:
+            _get_semaphore(self.name).release()
+        self._record(queue_ms, (time.perf_counter() - start) * 1000, 1, self._prompt_usage(messages))
+        return reply(messages)
+    
+    async def astream(self, messages: List[BaseMessage], timeout: float = None) -> AsyncIterator[str]:
+        queue_ms = await self._acquire(timeout or settings.llm_timeout_seconds)
+        start = time.perf_counter()
+        try:
+            await asyncio.sleep(self._delay())
+            ttft_ms = (time.perf_counter() - start) * 1000
+            for word in reply(messages).split(" "):
+                yield word + " "
+        finally:
+            _get_semaphore(self.name).release()
+        self._record(queue_ms, (time.perf_counter() - start) * 1000, 1, self._prompt_usage(messages), ttft_ms)
+    
+    def _prompt_usage(self, messages: List[BaseMessage]):
+        return {"prompt_tokens": sum(count_tokens(m.content) for m in messages)}
+
+
+def install_fake_llm(latency_ms: float = 50, jitter_ms: float = 0, seed: int = 0) -> FakeLLMBackend:
+    """Route every llm_client call to a FakeLLMBackend (replacing the configured backends)."""
+    backend = FakeLLMBackend(latency_ms=latency_ms, jitter_ms=jitter_ms, seed=seed)
+    llm_client.backends = [backend]
+    llm_client.provider = backend.provider
+    return backend
+
+
+if __name__ == "__main__":
+    from agents.router_agent import build_router_messages
+    from agents.data_agent import build_sql_messages
+    
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("question")
+    args = parser.parse_args()
+    intent = reply(build_router_messages(args.question))
+    print(f"intent: {intent}")
+    print(reply(build_sql_messages(args.question, intent)))
+    print(reply([HumanMessage(content=args.question)]))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Exercise LLM routing, fallback and hedging against local stub servers.
+
+Starts two stub Ollama servers ("fast" and "slow"), routes calls through
+LLMClient, then slows the fast one down mid-run to show traffic shifting.
+Finally both servers get occasional 1s stalls to compare tail latency with
+and without hedging.
+
+Usage (from backend/):
+    python -m benchmarks.llm_routing --calls 200
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+
+FAST_PORT = 11511
+SLOW_PORT = 11512
+
+os.environ["LLM_PROVIDER"] = "ollama"
+os.environ["LLM_BACKENDS"] = (
+    f"fast=ollama:stub@http://127.0.0.1:{FAST_PORT},"
+    f"slow=ollama:stub@http://127.0.0.1:{SLOW_PORT}"
+)
+
+import uvicorn
+from langchain.schema import HumanMessage
+from benchmarks.stub_llm_server import create_stub_app
+from config import settings
+from llm_client import LLMClient, _percentile
+
+
+def start_stub(port: int, latency_ms: float):
+    """Run a stub server in a background thread; returns its app."""
+    app = create_stub_app(latency_ms=latency_ms, jitter_ms=20, tail_ms=1000)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return app
+
+
+async def run_calls(client: LLMClient, calls: int, concurrency: int):
+    """Fire calls with bounded concurrency; returns latencies in ms."""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await client.ainvoke([HumanMessage(content="ping")], agent="bench")
+            latencies.append((time.perf_counter() - start) * 1000)
+    
+    await asyncio.gather(*[one() for _ in range(calls)])
+    return latencies
+
+
+def report(label: str, latencies, fast_app, slow_app):
+    print(
+        f"{label:<28} p50={_percentile(latencies, 50):7.1f}ms p95={_percentile(latencies, 95):7.1f}ms "
+        f"fast={fast_app.state.requests:4d} slow={slow_app.state.requests:4d}"
+    )
+    fast_app.state.requests = slow_app.state.requests = 0
+
+
+async def main(calls: int, concurrency: int):
+    fast_app = start_stub(FAST_PORT, latency_ms=50)
+    slow_app = start_stub(SLOW_PORT, latency_ms=150)
+    
+    client = LLMClient()
+    report("fast healthy", await run_calls(client, calls, concurrency), fast_app, slow_app)
+    
+    fast_app.state.latency_ms = 400  # Fast backend degrades
+    report("fast degraded", await run_calls(client, calls, concurrency), fast_app, slow_app)
+    
+    fast_app.state.latency_ms = slow_app.state.latency_ms = 50
+    fast_app.state.tail_rate = slow_app.state.tail_rate = 0.1  # 10% of calls stall for 1s
+    client = LLMClient()
+    report("stalls, no hedge", await run_calls(client, calls, concurrency), fast_app, slow_app)
+    
+    settings.llm_hedge_after_ms = 120
+    client = LLMClient()
+    report("stalls, hedge after 120ms", await run_calls(client, calls, concurrency), fast_app, slow_app)
+    await client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.concurrency))
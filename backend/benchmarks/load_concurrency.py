@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Load test the chat endpoint's concurrency ceiling.
+
+Runs the real FastAPI app in one uvicorn worker against a stub Ollama server
+(--llm-ms per call) and a stubbed Athena (--athena-ms per query), fires
+bursts of concurrent chats and reports throughput, latency and the peak
+number of chats waiting on Athena at the same time.
+
+Two handlers are compared:
+  sync   a `def` endpoint that blocks its threadpool thread until the graph
+         finishes, like the previous graph.invoke handler; concurrency is
+         capped by the threadpool (40 threads by default)
+  async  the `async def` /api/chat endpoint running graph.ainvoke
+
+Usage (from backend/):
+    python -m benchmarks.load_concurrency --concurrency 50 200 400
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import threading
+import time
+
+LLM_PORT = 11521
+APP_PORT = 11522
+
+os.environ["LLM_PROVIDER"] = "ollama"
+os.environ["LLM_BACKENDS"] = f"stub=ollama:stub@http://127.0.0.1:{LLM_PORT}"
+# Measure the app, not the per-provider limit on concurrent LLM calls
+os.environ.setdefault("LLM_MAX_CONCURRENCY", "10000")
+os.environ.setdefault("LLM_MAX_CONNECTIONS", "1000")
+
+import anyio.from_thread
+import httpx
+import uvicorn
+from benchmarks.stub_llm_server import create_stub_app
+from athena_client import athena_client
+from graph import get_graph
+from llm_client import _percentile
+import main
+
+
+class FakeAthena:
+    """Async stand-in for AthenaClient.aexecute_query that tracks concurrent queries."""
+    
+    def __init__(self, latency_ms: float):
+        self.latency_ms = latency_ms
+        self.in_flight = 0
+        self.peak = 0
+    
+    async def aexecute_query(self, sql: str, tenant_id: str, timeout: int = None):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency_ms / 1000)
+        finally:
+            self.in_flight -= 1
+        return {'columns': ['day', 'steps_total'], 'rows': [{'day': '2024-01-01', 'steps_total': 1}], 'sql': sql}
+
+
+def chat_sync(request: main.ChatRequest, tenant_id: str = main.Depends(main.get_tenant_id)):
+    """The previous handler shape: one threadpool thread held for the whole chat."""
+    state = main._initial_state(request.message, tenant_id, [])
+    final_state = anyio.from_thread.run(get_graph().ainvoke, state)
+    return {"answer": final_state.get("final_answer", "")}
+
+
+def start_server(app, port: int) -> None:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+
+async def burst(path: str, concurrency: int):
+    """Send `concurrency` chats at once; returns (wall seconds, latencies ms, errors)."""
+    latencies = []
+    errors = 0
+    
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{APP_PORT}",
+        timeout=300,
+        limits=httpx.Limits(max_connections=concurrency)
+    ) as client:
+        async def one():
+            nonlocal errors
+            start = time.perf_counter()
+            response = await client.post(path, json={"message": "How many steps?"}, headers={"Authorization": "Bearer x"})
+            if response.status_code != 200:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+        
+        start = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(concurrency)])
+        return time.perf_counter() - start, latencies, errors
+
+
+def main_(levels, llm_ms: float, athena_ms: float) -> None:
+    start_server(create_stub_app(latency_ms=llm_ms, reply="SELECT steps_total FROM gold_daily_features"), LLM_PORT)
+    
+    fake = FakeAthena(athena_ms)
+    athena_client.aexecute_query = fake.aexecute_query
+    # A fresh tenant per request so every chat misses the query cache
+    tenants = itertools.count()
+    main.app.dependency_overrides[main.get_tenant_id] = lambda: f"load-{next(tenants)}"
+    main.app.post("/bench/chat-sync")(chat_sync)
+    start_server(main.app, APP_PORT)
+    
+    ideal = (3 * llm_ms + athena_ms) / 1000
+    print(f"Each chat: 3 LLM calls x {llm_ms:.0f}ms + 1 Athena query x {athena_ms:.0f}ms (~{ideal:.2f}s alone)")
+    for label, path in (("sync", "/bench/chat-sync"), ("async", "/api/chat")):
+        for concurrency in levels:
+            fake.peak = 0
+            wall, latencies, errors = asyncio.run(burst(path, concurrency))
+            print(
+                f"  {label:<5} concurrency={concurrency:4d}  wall={wall:6.2f}s  "
+                f"throughput={concurrency / wall:6.1f}/s  p50={_percentile(latencies, 50):7.0f}ms  "
+                f"p95={_percentile(latencies, 95):7.0f}ms  peak in-flight={fake.peak:4d}  errors={errors}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 400])
+    parser.add_argument("--llm-ms", type=float, default=200)
+    parser.add_argument("--athena-ms", type=float, default=1000)
+    args = parser.parse_args()
+    main_(args.concurrency, args.llm_ms, args.athena_ms)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+End-to-end load and latency benchmark of /api/chat.
+
+Runs the real FastAPI app in one uvicorn worker with the two external
+services replaced in-process:
+
+  LLM     FakeLLMBackend (benchmarks/fake_llm.py): deterministic answers
+          after --llm-ms (+ up to --llm-jitter-ms) per call
+  Athena  LocalAthena (benchmarks/local_athena.py): DuckDB over generated
+          Parquet, each query reported finished after --athena-ms
+
+Everything else is the production path: auth, query scheduler, caches,
+graph, serialization. For each concurrency level the query cache is
+cleared and `concurrency` clients send --requests chats back to back
+(closed loop), rotating through QUESTIONS and --tenants tenants. Reported
+per level:
+
+  - throughput and end-to-end latency p50/p95/p99 (client side)
+  - p50/p95/p99 per graph node and per LLM / Athena / cache span, from
+    each response's Server-Timing header (a span name's total per request)
+  - process RSS after the level and peak RSS (client and server share the
+    process, the client's share is small)
+
+--save-baseline writes the results as JSON; --compare reads a saved file
+and exits 1 if throughput or end-to-end p95 regressed by more than
+--tolerance at any level. Baselines depend on the machine: save one on the
+machine you compare on. benchmarks/baselines/load_suite.json is a
+reference run with the defaults.
+
+Needs duckdb (`pip install duckdb`), which is not a backend requirement.
+
+Usage (from backend/):
+    python -m benchmarks.load_suite --concurrency 1 4 16 64 --requests 200
+    python -m benchmarks.load_suite --save-baseline benchmarks/baselines/load_suite.json
+    python -m benchmarks.load_suite --compare benchmarks/baselines/load_suite.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Any
+
+APP_PORT = 11523
+
+# Measure the app, not the per-provider limit on concurrent LLM calls
+os.environ.setdefault("LLM_MAX_CONCURRENCY", "10000")
+# Logins below would otherwise start prewarming queries the benchmark then hits
+os.environ.setdefault("PREWARM_ENABLED", "false")
+
+import httpx
+import uvicorn
+from benchmarks.fake_llm import install_fake_llm
+from benchmarks.local_athena import install_local_athena, DEFAULT_DATA_DIR
+from cache import cache
+from llm_client import _percentile
+import main
+
+# One question per graph path
+QUESTIONS = [
+    "Give me a summary of my activity for the last 7 days",
+    "Show my heart rate for the last 14 days",
+    "Were there any unusual spikes in my steps?",
+    "Compare my steps this week versus last week",
+    "What is the trend of my calories over time?",
+    "What is a good resting heart rate?",
+]
+
+_SERVER_TIMING = re.compile(r"([\w.\-]+);dur=([\d.]+)")
+
+PERCENTILES = (50, 95, 99)
+
+
+def start_server(app, port: int) -> None:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {f"p{q}": round(_percentile(values, q), 1) for q in PERCENTILES}
+
+
+async def login(client: httpx.AsyncClient, tenants: int) -> List[str]:
+    """A bearer token per benchmark tenant (tenant-0 .. tenant-{n-1}, as LocalAthena generates)."""
+    tokens = []
+    for i in range(tenants):
+        response = await client.post("/api/auth/login", json={"username": f"tenant-{i}"})
+        response.raise_for_status()
+        tokens.append(response.json()["access_token"])
+    return tokens
+
+
+async def run_level(concurrency: int, requests: int, tenants: int) -> Dict[str, Any]:
+    """Send `requests` chats from `concurrency` clients; returns the level's results."""
+    cache.clear()
+    latencies = []
+    spans = defaultdict(list)
+    errors = defaultdict(int)
+    sent = iter(range(requests))
+    
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{APP_PORT}",
+        timeout=300,
+        limits=httpx.Limits(max_connections=concurrency)
+    ) as client:
+        tokens = await login(client, tenants)
+        
+        async def worker():
+            for i in sent:
+                start = time.perf_counter()
+                response = await client.post(
+                    "/api/chat",
+                    json={"message": QUESTIONS[i % len(QUESTIONS)]},
+                    headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    errors[str(response.status_code)] += 1
+                    continue
+                for name, duration in _SERVER_TIMING.findall(response.headers.get("Server-Timing", "")):
+                    spans[name].append(float(duration))
+        
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        wall = time.perf_counter() - start
+    
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': dict(errors),
+        'throughput_rps': round(requests / wall, 2),
+        'latency_ms': _summary(latencies),
+        'spans_ms': {name: {**_summary(values), 'count': len(values)} for name, values in sorted(spans.items())},
+        'rss_mb': round(rss_mb(), 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+
+def print_level(level: Dict[str, Any]) -> None:
+    latency = level['latency_ms']
+    errors = sum(level['errors'].values())
+    print(
+        f"\nconcurrency={level['concurrency']}  requests={level['requests']}  errors={errors}  "
+        f"throughput={level['throughput_rps']:.1f}/s  "
+        f"p50={latency['p50']:.0f}ms  p95={latency['p95']:.0f}ms  p99={latency['p99']:.0f}ms  "
+        f"rss={level['rss_mb']:.0f}MB  peak rss={level['peak_rss_mb']:.0f}MB"
+    )
+    print(f"  {'span':<28}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in level['spans_ms'].items():
+        print(f"  {name:<28}{stats['count']:>7}{stats['p50']:>10.1f}{stats['p95']:>10.1f}{stats['p99']:>10.1f}")
+
+
+def compare(levels: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions against a baseline: lower throughput or higher end-to-end p95 beyond tolerance."""
+    regressions = []
+    previous = {level['concurrency']: level for level in baseline['levels']}
+    print(f"\nvs. baseline from {baseline['meta']['saved_at']} (tolerance {tolerance:.0%})")
+    for level in levels:
+        before = previous.get(level['concurrency'])
+        if before is None:
+            continue
+        throughput = level['throughput_rps'] / before['throughput_rps'] - 1
+        p95 = level['latency_ms']['p95'] / before['latency_ms']['p95'] - 1
+        print(f"  concurrency={level['concurrency']:<4d} throughput {throughput:+7.1%}   p95 {p95:+7.1%}")
+        if throughput < -tolerance:
+            regressions.append(f"concurrency={level['concurrency']}: throughput {throughput:+.1%}")
+        if p95 > tolerance:
+            regressions.append(f"concurrency={level['concurrency']}: p95 {p95:+.1%}")
+    return regressions
+
+
+def main_(args) -> int:
+    install_fake_llm(args.llm_ms, args.llm_jitter_ms)
+    install_local_athena(args.data_dir, args.tenants, latency_ms=args.athena_ms)
+    start_server(main.app, APP_PORT)
+    
+    print(
+        f"LLM {args.llm_ms:g}ms (+{args.llm_jitter_ms:g}ms jitter) per call, Athena {args.athena_ms:g}ms per query, "
+        f"{args.tenants} tenants, {len(QUESTIONS)} questions"
+    )
+    levels = []
+    for concurrency in args.concurrency:
+        level = asyncio.run(run_level(concurrency, max(args.requests, concurrency), args.tenants))
+        print_level(level)
+        levels.append(level)
+    
+    if args.save_baseline:
+        meta = {
+            'saved_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'llm_ms': args.llm_ms,
+            'llm_jitter_ms': args.llm_jitter_ms,
+            'athena_ms': args.athena_ms,
+            'tenants': args.tenants
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump({'meta': meta, 'levels': levels}, f, indent=2)
+            f.write("\n")
+        print(f"\nbaseline saved to {args.save_baseline}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(levels, json.load(f), args.tolerance)
+        if regressions:
+            print("\nregressions:\n  " + "\n  ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=200, help="Chats per concurrency level")
+    parser.add_argument("--llm-ms", type=float, default=50)
+    parser.add_argument("--llm-jitter-ms", type=float, default=20)
+    parser.add_argument("--athena-ms", type=float, default=100)
+    parser.add_argument("--tenants", type=int, default=8)
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression (0.2 = 20%%)")
+    sys.exit(main_(parser.parse_args()))
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Athena: DuckDB over generated Parquet files.
+
+LocalAthena implements the four boto3 Athena calls AthenaClient makes
+(start_query_execution, get_query_execution, get_query_results,
+stop_query_execution), so queries go through the real client code: tenant
+filter, query scheduler, polling and result parsing. A query runs when it
+is started and reports RUNNING until latency_ms has passed.
+
+Tables (health_data_lake.gold_daily_features, gold_weekly_features and
+gold_daily_anomalies) are written once per data directory with
+deterministic values for `tenants` tenants over the last `days` days.
+Only the Presto functions the app's queries use are translated:
+DATE_ADD(unit, n, date) and DATE_FORMAT.
+
+Needs duckdb (`pip install duckdb`), which is not a backend requirement.
+
+Usage (from backend/):
+    python -m benchmarks.local_athena "SELECT COUNT(*) AS n FROM health_data_lake.gold_daily_features"
+"""
+import argparse
+import itertools
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Dict, Any
+import athena_client as athena_module
+from athena_client import athena_client
+
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), "health-intelligence-bench")
+
+_DATE_ADD = re.compile(r"DATE_ADD\(\s*'(\w+)'\s*,\s*(-?\d+)\s*,\s*(\w+(?:\([^()]*\))?)\s*\)", re.IGNORECASE)
+_DATE_FORMAT = re.compile(r"\bDATE_FORMAT\(", re.IGNORECASE)
+
+# Deterministic pseudo-random value in [0, 1) per (tenant, day, salt)
+_NOISE = "(hash(tenant_id || dt || '{salt}') % 1000000) / 1000000.0"
+
+DAILY_SQL = f"""
+SELECT tenant_id, strftime(day, '%Y-%m-%d') AS dt, day,
+  CAST(4000 + 8000 * {_NOISE.format(salt='steps')} AS BIGINT) AS steps_total,
+  ROUND(3 + 6 * {_NOISE.format(salt='distance')}, 2) AS distance_km_total,
+  ROUND(200 + 500 * {_NOISE.format(salt='active')}, 1) AS active_kcal_total,
+  ROUND(1500 + 200 * {_NOISE.format(salt='basal')}, 1) AS basal_kcal_total,
+  CAST(20 * {_NOISE.format(salt='flights')} AS BIGINT) AS flights_total,
+  ROUND(62 + 12 * {_NOISE.format(salt='hr')}, 1) AS hr_avg,
+  ROUND(120 + 50 * {_NOISE.format(salt='hrmax')}, 1) AS hr_max,
+  ROUND(45 + 10 * {_NOISE.format(salt='hrmin')}, 1) AS hr_min
+FROM (
+  SELECT 'tenant-' || t AS tenant_id, CAST(d AS DATE) AS day, strftime(d, '%Y-%m-%d') AS dt
+  FROM range({{tenants}}) r(t), range(CURRENT_DATE - {{days}}, CURRENT_DATE + 1, INTERVAL 1 DAY) s(d)
+)
+"""
+
+WEEKLY_SQL = """
+SELECT tenant_id, strftime(date_trunc('week', day), '%Y-%m-%d') AS week_start,
+  SUM(steps_total) AS steps_week, ROUND(SUM(distance_km_total), 2) AS distance_km_week,
+  ROUND(SUM(active_kcal_total), 1) AS active_kcal_week, ROUND(SUM(basal_kcal_total), 1) AS basal_kcal_week,
+  SUM(flights_total) AS flights_week, ROUND(AVG(hr_avg), 1) AS hr_avg_week,
+  MAX(hr_max) AS hr_max_week, MIN(hr_min) AS hr_min_week
+FROM read_parquet('{daily}')
+GROUP BY 1, 2
+"""
+
+# z-score of each day's metric against the previous 28 days, as the gold job computes it
+ANOMALIES_SQL = """
+WITH long AS (
+  UNPIVOT read_parquet('{daily}')
+  ON steps_total, distance_km_total, active_kcal_total, basal_kcal_total, flights_total, hr_avg, hr_max, hr_min
+  INTO NAME metric VALUE value
+),
+scored AS (
+  SELECT tenant_id, dt, day, metric, value,
+    AVG(value) OVER w AS baseline_mean, STDDEV_SAMP(value) OVER w AS baseline_std
+  FROM long
+  WINDOW w AS (PARTITION BY tenant_id, metric ORDER BY day ROWS BETWEEN 28 PRECEDING AND 1 PRECEDING)
+)
+SELECT tenant_id, dt, day, metric, value, ROUND(baseline_mean, 2) AS baseline_mean,
+  ROUND(baseline_std, 2) AS baseline_std, ROUND((value - baseline_mean) / baseline_std, 2) AS z_score
+FROM scored
+WHERE baseline_std > 0
+"""
+
+TABLES = ("gold_daily_features", "gold_weekly_features", "gold_daily_anomalies")
+
+
+def translate(sql: str) -> str:
+    """Presto SQL as the app writes it -> DuckDB."""
+    sql = _DATE_ADD.sub(lambda m: f"({m.group(3)} + INTERVAL ({m.group(2)}) {m.group(1).upper()})", sql)
+    return _DATE_FORMAT.sub("strftime(", sql)
+
+
+def generate_data(data_dir: str, tenants: int, days: int) -> None:
+    """Write the gold tables as Parquet under data_dir (skipped if they exist for today)."""
+    import duckdb
+    
+    marker = os.path.join(data_dir, f"{time.strftime('%Y-%m-%d')}-{tenants}x{days}")
+    if os.path.exists(marker):
+        return
+    os.makedirs(data_dir, exist_ok=True)
+    paths = {table: os.path.join(data_dir, f"{table}.parquet") for table in TABLES}
+    # With several tenants the anomaly table gets a few spikes to find
+    daily = f"""
+SELECT * REPLACE (CASE WHEN hash(tenant_id || dt) % 23 = 0 THEN steps_total * 3 ELSE steps_total END AS steps_total)
+FROM ({DAILY_SQL.format(tenants=tenants, days=days)})
+"""
+    with duckdb.connect() as db:
+        db.execute(f"COPY ({daily}) TO '{paths['gold_daily_features']}' (FORMAT PARQUET)")
+        db.execute(f"COPY ({WEEKLY_SQL.format(daily=paths['gold_daily_features'])}) TO '{paths['gold_weekly_features']}' (FORMAT PARQUET)")
+        db.execute(f"COPY ({ANOMALIES_SQL.format(daily=paths['gold_daily_features'])}) TO '{paths['gold_daily_anomalies']}' (FORMAT PARQUET)")
+    open(marker, "w").close()
+
+
+class LocalAthena:
+    """boto3 Athena client subset backed by an in-memory DuckDB database."""
+    
+    def __init__(self, data_dir: str = DEFAULT_DATA_DIR, tenants: int = 8, days: int = 180, latency_ms: float = 0):
+        import duckdb
+        
+        generate_data(data_dir, tenants, days)
+        self.latency_ms = latency_ms
+        self._db = duckdb.connect()
+        self._db.execute("CREATE SCHEMA health_data_lake")
+        for table in TABLES:
+            path = os.path.join(data_dir, f"{table}.parquet")
+            self._db.execute(f"CREATE VIEW health_data_lake.{table} AS SELECT * FROM read_parquet('{path}')")
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._executions: Dict[str, Dict[str, Any]] = {}
+    
+    def start_query_execution(self, QueryString: str, **kwargs) -> Dict[str, Any]:
+        query_id = f"local-{next(self._ids)}"
+        execution = {'ready_at': time.monotonic() + self.latency_ms / 1000, 'state': 'SUCCEEDED'}
+        try:
+            # A cursor is a separate connection to the same database, safe to use from this thread
+            with self._db.cursor() as cursor:
+                cursor.execute(translate(QueryString))
+                execution['columns'] = [d[0] for d in cursor.description]
+                execution['rows'] = cursor.fetchall()
+        except Exception as e:
+            execution.update(state='FAILED', reason=str(e))
+        with self._lock:
+            self._executions[query_id] = execution
+        return {'QueryExecutionId': query_id}
+    
+    def get_query_execution(self, QueryExecutionId: str) -> Dict[str, Any]:
+        execution = self._executions[QueryExecutionId]
+        state = execution['state'] if time.monotonic() >= execution['ready_at'] else 'RUNNING'
+        status = {'State': state}
+        if state == 'FAILED':
+            status['StateChangeReason'] = execution['reason']
+        return {'QueryExecution': {'QueryExecutionId': QueryExecutionId, 'Status': status}}
+    
+    def get_query_results(self, QueryExecutionId: str) -> Dict[str, Any]:
+        with self._lock:
+            execution = self._executions.pop(QueryExecutionId)
+        columns = execution['columns']
+        header = {'Data': [{'VarCharValue': name} for name in columns]}
+        rows = [
+            {'Data': [{} if value is None else {'VarCharValue': str(value)} for value in row]}
+            for row in execution['rows']
+        ]
+        return {
+            'ResultSet': {
+                'ResultSetMetadata': {'ColumnInfo': [{'Name': name} for name in columns]},
+                'Rows': [header] + rows
+            }
+        }
+    
+    def stop_query_execution(self, QueryExecutionId: str) -> Dict[str, Any]:
+        with self._lock:
+            self._executions.pop(QueryExecutionId, None)
+        return {}
+
+
+def install_local_athena(
+    data_dir: str = DEFAULT_DATA_DIR,
+    tenants: int = 8,
+    days: int = 180,
+    latency_ms: float = 0,
+    poll_interval: float = 0.02
+) -> LocalAthena:
+    """Point athena_client at a LocalAthena and poll it every poll_interval seconds."""
+    local = LocalAthena(data_dir, tenants, days, latency_ms)
+    athena_client.athena = local
+    athena_module.POLL_INTERVAL_SECONDS = poll_interval
+    return local
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sql")
+    parser.add_argument("--tenant", default="tenant-0")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    args = parser.parse_args()
+    install_local_athena(args.data_dir)
+    result = athena_client.execute_query(args.sql, args.tenant)
+    print(result['columns'])
+    for row in result['rows'][:20]:
+        print(row)
+    print(f"{len(result['rows'])} rows")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for an OpenTelemetry collector (OTLP/HTTP, JSON encoding).
+
+Accepts POST /v1/traces, keeps the received spans in memory, prints one line
+per trace and serves them back on GET /v1/traces for inspection.
+
+Usage (from backend/):
+    python -m benchmarks.otlp_collector_stub --port 4318
+    OTLP_ENDPOINT=http://127.0.0.1:4318 uvicorn main:app
+"""
+import argparse
+from typing import Any, Dict, List
+from fastapi import FastAPI, Request
+
+
+def _attribute(value: Dict[str, Any]) -> Any:
+    return next(iter(value.values()), None)
+
+
+def create_collector_app(quiet: bool = False, max_traces: int = 1000) -> FastAPI:
+    """Create a collector app storing the last max_traces traces on app.state.traces."""
+    app = FastAPI(title="Stub OTLP collector")
+    app.state.traces: List[Dict[str, Any]] = []
+    
+    @app.post("/v1/traces")
+    async def receive(request: Request):
+        body = await request.json()
+        for resource_spans in body.get("resourceSpans", []):
+            resource = {a["key"]: _attribute(a["value"]) for a in resource_spans.get("resource", {}).get("attributes", [])}
+            for scope_spans in resource_spans.get("scopeSpans", []):
+                spans = [
+                    {
+                        "trace_id": s["traceId"],
+                        "span_id": s["spanId"],
+                        "parent_id": s.get("parentSpanId") or None,
+                        "name": s["name"],
+                        "duration_ms": (int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"])) / 1e6,
+                        "attributes": {a["key"]: _attribute(a["value"]) for a in s.get("attributes", [])}
+                    }
+                    for s in scope_spans.get("spans", [])
+                ]
+                if not spans:
+                    continue
+                app.state.traces.append({"resource": resource, "spans": spans})
+                del app.state.traces[:-max_traces]
+                if not quiet:
+                    summary = " ".join(f"{s['name']}={s['duration_ms']:.0f}ms" for s in spans)
+                    print(f"[{resource.get('service.name')}] trace {spans[0]['trace_id'][:8]}: {summary}")
+        return {"partialSuccess": {}}
+    
+    @app.get("/v1/traces")
+    def traces():
+        return {"traces": app.state.traces}
+    
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+    uvicorn.run(create_collector_app(args.quiet), host="127.0.0.1", port=args.port, log_level="warning")
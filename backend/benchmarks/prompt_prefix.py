@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Measure how much of the SQL-generation prompt is shareable across tenants.
+
+Compares the legacy prompt layout (tenant id and lookback interpolated into the
+system prompt) with the current static prefix + per-request suffix layout.
+
+Static analysis (always): longest common prompt prefix across tenants, in
+characters and approximate tokens.
+
+Live mode (--live): sends each prompt through the configured LLM backend in
+streaming mode and reports prompt tokens, provider-cached prompt tokens (when
+reported) and time-to-first-token. Run it against Ollama/vLLM/OpenAI with
+prefix caching enabled.
+
+Usage (from backend/):
+    python -m benchmarks.prompt_prefix --tenants 5
+    python -m benchmarks.prompt_prefix --tenants 5 --live
+"""
+import argparse
+import asyncio
+import os
+from typing import List
+from langchain.schema import BaseMessage, HumanMessage, SystemMessage
+from agents.data_agent import SQL_SYSTEM_PROMPT, build_sql_messages
+from config import settings
+from llm_client import llm_client
+from metrics import metrics
+
+QUESTION = "How many steps did I take each day last week?"
+
+
+def legacy_messages(tenant_id: str) -> List[BaseMessage]:
+    """Prompt as built before the static-prefix change: tenant and lookback inside the system prompt."""
+    system_prompt = SQL_SYSTEM_PROMPT.replace("${tenant_id}", tenant_id).replace(
+        "DATE_ADD('day', -N, CURRENT_DATE)",
+        f"DATE_ADD('day', -{settings.default_lookback_days}, CURRENT_DATE)"
+    )
+    return [
+        SystemMessage(content=system_prompt),
+        HumanMessage(content=f"Generate SQL for: {QUESTION}\nIntent: trend")
+    ]
+
+
+def static_messages(tenant_id: str) -> List[BaseMessage]:
+    """Prompt as built now; the tenant never enters the prompt."""
+    return build_sql_messages(QUESTION, "trend")
+
+
+def flatten(messages: List[BaseMessage]) -> str:
+    return "\n".join(f"{m.type}: {m.content}" for m in messages)
+
+
+def shared_prefix(prompts: List[str]) -> int:
+    return len(os.path.commonprefix(prompts))
+
+
+async def live(builder, tenants: List[str]) -> None:
+    backend = llm_client.backends[0]
+    metrics.reset()
+    for tenant_id in tenants:
+        async for _ in backend.astream(builder(tenant_id)):
+            pass
+    snapshot = metrics.snapshot()["histograms"]
+    for key in ("prompt_tokens", "cached_prompt_tokens", "ttft_ms"):
+        hist = snapshot.get(f"llm.{backend.name}.{key}")
+        if hist:
+            print(f"    {key:<22} mean={hist['sum'] / hist['count']:8.1f} p50={hist['p50']:8.1f} p95={hist['p95']:8.1f}")
+    await llm_client.aclose()
+
+
+def main(tenant_count: int, run_live: bool) -> None:
+    tenants = [f"tenant-{i:03d}" for i in range(tenant_count)]
+    for label, builder in (("legacy (tenant in system)", legacy_messages), ("static prefix", static_messages)):
+        prompts = [flatten(builder(t)) for t in tenants]
+        prefix = shared_prefix(prompts)
+        print(f"{label}")
+        print(f"    prompt chars         {len(prompts[0]):8d}")
+        print(f"    shared prefix chars  {prefix:8d} (~{prefix // 4} tokens, {prefix / len(prompts[0]):.0%})")
+        if run_live:
+            asyncio.run(live(builder, tenants))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, default=5)
+    parser.add_argument("--live", action="store_true", help="Send prompts to the configured LLM backend")
+    args = parser.parse_args()
+    main(args.tenants, args.live)
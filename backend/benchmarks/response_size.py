@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Compare /api/chat response sizes across the response-format options.
+
+Builds a chat response for a synthetic daily result (one row per day, the
+gold_daily_features metrics) with a bar chart over the same rows, then
+encodes it the way main.chat does for each option. Sizes are reported raw
+and gzip-compressed (what nginx sends when gzip is on).
+
+Usage (from backend/):
+    python -m benchmarks.response_size --days 365 --page-size 50
+"""
+import argparse
+import gzip
+from datetime import date, timedelta
+import numpy as np
+from response_format import paginate, compact_result, reference_chart_data, encode_response, ARROW_TYPE, MSGPACK_TYPES
+
+METRICS = ['steps_total', 'distance_km_total', 'active_kcal_total', 'basal_kcal_total', 'flights_total', 'hr_avg', 'hr_max', 'hr_min']
+
+
+def make_result(days: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    start = date(2024, 1, 1)
+    values = rng.normal([8000, 6, 450, 1600, 10, 65, 150, 48], [2000, 1.5, 100, 50, 4, 5, 10, 4], (days, len(METRICS)))
+    rows = []
+    for i in range(days):
+        row = {'day': str(start + timedelta(days=i))}
+        for j, col in enumerate(METRICS):
+            row[col] = int(values[i, j]) if col.endswith('total') else round(float(values[i, j]), 2)
+        rows.append(row)
+    return {'columns': ['day'] + METRICS, 'rows': rows, 'sql': 'SELECT day, ... FROM gold_daily_features', 'cached': False}
+
+
+def chat_payload(result, result_format='rows', chart_data='inline', page_size=None):
+    """The ChatResponse dict main.chat builds for these options."""
+    chart = {
+        'spec_type': 'vega-lite',
+        'spec': {
+            'mark': 'bar',
+            'encoding': {'x': {'field': 'day', 'type': 'temporal'}, 'y': {'field': 'steps_total', 'type': 'quantitative'}},
+            'data': {'values': result['rows']}
+        }
+    }
+    charts = [chart]
+    page, next_cursor = paginate(result, None, page_size)
+    if chart_data == 'reference' and result_format == 'rows' and next_cursor is None:
+        charts = reference_chart_data(charts, result)
+    return {
+        'answer': 'You averaged about 8,000 steps a day. ' * 5,
+        'charts': charts,
+        'sql_used': result['sql'],
+        'query_results': compact_result(page, result_format),
+        'result_handle': '0' * 32,
+        'next_cursor': next_cursor
+    }, page
+
+
+def run(days: int, page_size: int) -> None:
+    result = make_result(days)
+    cases = [
+        ("rows + inline chart data (before)", {}, None),
+        ("columnar", {'result_format': 'columnar'}, None),
+        ("chart data by reference", {'chart_data': 'reference'}, None),
+        (f"columnar + page of {page_size}", {'result_format': 'columnar', 'page_size': page_size}, None),
+        ("reference, msgpack", {'chart_data': 'reference'}, MSGPACK_TYPES[0]),
+        ("reference, Arrow IPC", {'chart_data': 'reference'}, ARROW_TYPE),
+    ]
+    print(f"{days} daily rows x {len(METRICS)} metrics, one chart")
+    print(f"  {'format':<42}{'bytes':>10}{'gzip':>10}{'vs before':>11}")
+    baseline = None
+    for label, options, accept in cases:
+        payload, page = chat_payload(result, **options)
+        body = encode_response(payload, accept, table=page, table_key='query_results').body
+        baseline = baseline or len(body)
+        print(f"  {label:<42}{len(body):>10}{len(gzip.compress(body)):>10}{len(body) / baseline:>10.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+    run(args.days, args.page_size)
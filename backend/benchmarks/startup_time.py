@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Measure backend startup: import time per module, then the warm-up steps.
+
+Each run imports `main` in a fresh interpreter with `python -X importtime`,
+so nothing is imported yet (bytecode caches are warm after the first run).
+Reported times are medians over the runs:
+
+  - the modules `main` imports directly, with their cumulative import time
+    (what /health waits for before the app can answer);
+  - the modules with the most self time anywhere in the import tree;
+  - warmup.run() steps (graph compile, LLM models, boto3 clients, Redis),
+    which the startup hook runs in the background.
+
+Usage (from backend/):
+    python -m benchmarks.startup_time --runs 5 --top 15
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+WARMUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import main
+import_ms = (time.perf_counter() - start) * 1000
+from warmup import warmup
+warmup.run()
+print(json.dumps({'import_ms': import_ms, 'warmup_ms': warmup.timings_ms, 'errors': warmup.errors}))
+"""
+
+
+def import_profile():
+    """(module, depth, self_us, cumulative_us) for one fresh `import main`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if proc.returncode:
+        raise RuntimeError(f"import main failed:\n{proc.stderr[-2000:]}")
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, (len(indent) - 1) // 2, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def run(runs: int, top: int, warmup: bool) -> None:
+    direct = defaultdict(list)
+    self_time = defaultdict(list)
+    totals = []
+    for _ in range(runs):
+        children = []  # importtime prints a module's imports before the module itself
+        for module, depth, self_us, cumulative_us in import_profile():
+            self_time[module].append(self_us)
+            if depth == 1:
+                children.append((module, cumulative_us))
+            elif depth == 0:
+                if module == "main":
+                    totals.append(cumulative_us)
+                    for child, child_us in children:
+                        direct[child].append(child_us)
+                children = []
+    
+    print(f"import main: {statistics.median(totals) / 1000:.0f} ms (median of {runs})")
+    print(f"\n  {'imported by main':<32}{'cumulative ms':>14}")
+    for module, values in sorted(direct.items(), key=lambda item: -statistics.median(item[1])):
+        print(f"  {module:<32}{statistics.median(values) / 1000:>14.1f}")
+    
+    print(f"\n  {'top self time':<48}{'self ms':>10}")
+    ranked = sorted(self_time.items(), key=lambda item: -statistics.median(item[1]))[:top]
+    for module, values in ranked:
+        print(f"  {module:<48}{statistics.median(values) / 1000:>10.1f}")
+    
+    if warmup:
+        proc = subprocess.run([sys.executable, "-c", WARMUP_SCRIPT], cwd=BACKEND_DIR, capture_output=True, text=True)
+        if proc.returncode:
+            print(f"\nwarm-up failed:\n{proc.stderr[-2000:]}")
+            return
+        report = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"\n  {'warm-up step':<32}{'ms':>14}")
+        for name, elapsed_ms in report['warmup_ms'].items():
+            error = f"  ({report['errors'][name]})" if name in report['errors'] else ""
+            print(f"  {name:<32}{elapsed_ms:>14.1f}{error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false", help="Skip timing the warm-up steps")
+    args = parser.parse_args()
+    run(args.runs, args.top, args.warmup)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Ollama-compatible stub LLM server with configurable latency and error rate.
+
+Usage (from backend/):
+    python -m benchmarks.stub_llm_server --port 11501 --latency-ms 200 --error-rate 0.1
+"""
+import argparse
+import asyncio
+import json
+import random
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def create_stub_app(
+    latency_ms: float = 100,
+    jitter_ms: float = 0,
+    error_rate: float = 0.0,
+    reply: str = "ok",
+    tail_rate: float = 0.0,
+    tail_ms: float = 0
+) -> FastAPI:
+    """
+    Create a stub app answering POST /api/chat like Ollama.
+    
+    Each request takes latency_ms plus uniform jitter, plus tail_ms with
+    probability tail_rate, and fails with HTTP 503 with probability error_rate.
+    Settings live on app.state so they can be changed while running.
+    """
+    app = FastAPI(title="Stub LLM")
+    app.state.latency_ms = latency_ms
+    app.state.tail_rate = tail_rate
+    app.state.requests = 0
+    
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        delay_ms = app.state.latency_ms + random.uniform(0, jitter_ms)
+        if random.random() < app.state.tail_rate:
+            delay_ms += tail_ms
+        await asyncio.sleep(delay_ms / 1000)
+        if random.random() < error_rate:
+            return JSONResponse({"error": "stub failure"}, status_code=503)
+        
+        prompt_tokens = sum(len(m.get("content", "")) // 4 for m in body.get("messages", []))
+        if body.get("stream"):
+            async def chunks():
+                for token in reply.split(" "):
+                    yield json.dumps({"message": {"role": "assistant", "content": token + " "}, "done": False}) + "\n"
+                yield json.dumps({
+                    "message": {"role": "assistant", "content": ""},
+                    "done": True,
+                    "prompt_eval_count": prompt_tokens
+                }) + "\n"
+            return StreamingResponse(chunks(), media_type="application/x-ndjson")
+        
+        return {
+            "model": body.get("model"),
+            "message": {"role": "assistant", "content": reply},
+            "done": True,
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": len(reply) // 4
+        }
+    
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11501)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tail-rate", type=float, default=0.0)
+    parser.add_argument("--tail-ms", type=float, default=0)
+    parser.add_argument("--reply", default="ok")
+    args = parser.parse_args()
+    uvicorn.run(
+        create_stub_app(args.latency_ms, args.jitter_ms, args.error_rate, args.reply, args.tail_rate, args.tail_ms),
+        host="127.0.0.1",
+        port=args.port,
+        log_level="warning"
+    )
@@ -1,8 +1,10 @@
 """Query result caching."""
 import json
 import pickle
+from functools import cached_property
 from typing import Optional, Any, Dict
 from config import settings
+from tracing import span
 
 # In-memory cache (for dev)
 _cache: Dict[str, tuple] = {}
@@ -13,24 +15,38 @@ class Cache:
     
     def __init__(self):
         self._cache: Dict[str, tuple] = {}
-        self._redis = None
-        
+    
+    @cached_property
+    def _redis(self):
+        """Redis connection, made on first use (None when disabled or unreachable)."""
         if settings.redis_enabled:
             try:
                 import redis
-                self._redis = redis.Redis(
+                client = redis.Redis(
                     host=settings.redis_host,
                     port=settings.redis_port,
                     db=settings.redis_db,
                     decode_responses=False
                 )
-                self._redis.ping()
+                client.ping()
+                return client
             except Exception:
                 # Redis not available, use in-memory
                 pass
+        return None
+    
+    def connect(self) -> bool:
+        """Connect to Redis now rather than on the first cache call; True if Redis is used."""
+        return self._redis is not None
     
     def get(self, key: str) -> Optional[Any]:
         """Get cached value."""
+        with span("cache.get") as attributes:
+            value = self._get(key)
+            attributes['hit'] = value is not None
+            return value
+    
+    def _get(self, key: str) -> Optional[Any]:
         if self._redis:
             try:
                 data = self._redis.get(key)
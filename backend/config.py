@@ -21,11 +21,54 @@ class Settings(BaseSettings):
     ollama_model: str = "llama3"  # or "mistral"
     openai_api_key: Optional[str] = None
     openai_model: str = "gpt-4"
+    openai_base_url: str = "https://api.openai.com/v1"
+    llm_timeout_seconds: float = 120.0  # Per-call timeout (async client)
+    llm_max_concurrency: int = 8  # Concurrent requests per provider; extra calls queue
+    llm_max_connections: int = 32  # Shared HTTP connection pool size
+    llm_max_retries: int = 2
+    llm_retry_base_delay: float = 0.5  # Seconds; exponential backoff with full jitter
+    llm_backends: str = ""  # Optional: "name=provider:model@base_url,..." for routing across backends
+    llm_router_window: int = 100  # Calls per backend kept for rolling p50/p95 and error rate
+    llm_router_error_penalty: float = 4.0  # Score = p95 * (1 + penalty * error_rate)
+    llm_router_max_age_seconds: float = 300.0  # Older calls leave the window, so a backend excluded by errors is tried again
+    llm_hedge_after_ms: int = 0  # Send a hedged duplicate to the next backend after this delay (0 = off)
+    llm_context_tokens: int = 8192  # Context window of the active model
+    llm_max_output_tokens: int = 1024  # Reserved for the response when budgeting prompts
+    prompt_history_share: float = 0.2  # Share of the prompt budget for conversation history
+    prompt_question_share: float = 0.1  # Share of the prompt budget for the user question
+    prompt_estimate_margin: float = 0.25  # Share of the prompt budget left unused when token counts are estimated (no tiktoken, or not OpenAI)
+    coach_raw_rows_max: int = 5  # Larger results reach the coach as a statistical digest
+    
+    # Anomaly Detection
+    anomaly_method: str = "auto"  # "auto", "rolling", "robust" or "seasonal"
+    anomaly_threshold: float = 3.0  # Absolute score above which a value is anomalous (fast path needs >= 2.5, see anomaly_agent.PRECOMPUTED_MIN_Z)
+    anomaly_window: int = 28  # Trailing values used by the rolling z-score
+    anomaly_max_results: int = 50  # Strongest anomalies returned
+    anomaly_baseline_days: int = 365  # History read when a tenant's baseline is first built
+    anomaly_baseline_halflife_days: float = 28.0  # Half-life of the exponentially weighted baseline
+    anomaly_baseline_min_days: int = 28  # Days ingested before a baseline is used for scoring
+    anomaly_baseline_ttl: int = 30 * 86400  # Baselines not refreshed for this long are dropped
+    anomaly_fast_path: bool = True  # Answer anomaly questions from gold_daily_anomalies when available
+    anomaly_fast_path_days: int = 30  # Lookback when the question names no period
+    anomaly_fast_path_retry_seconds: int = 3600  # After gold_daily_anomalies is found missing, skip the fast path this long
+    
+    # Tracing (spans always feed /api/metrics; OTLP export is optional)
+    otlp_endpoint: Optional[str] = None  # e.g. "http://localhost:4318" (OTLP/HTTP collector)
+    otlp_service_name: str = "health-intelligence-backend"
+    otlp_timeout_seconds: float = 2.0
+    
+    # Profiling (opt-in; profiles are kept in memory per worker process)
+    profiling_admin_token: Optional[str] = None  # X-Profile-Token value that profiles a chat and lists/downloads profiles
+    profiling_sample_rate: float = 0.0  # Fraction of chats profiled without the header
+    profiling_mode: str = "cprofile"  # "cprofile" (deterministic, event loop thread) or "sample" (stacks of all threads)
+    profiling_sample_interval_ms: float = 5.0  # Stack sampling interval in "sample" mode
+    profiling_max_profiles: int = 20  # Most recent profiles kept
     
     # JWT Configuration
     jwt_secret: str = "dev-secret-change-in-production"
     jwt_algorithm: str = "HS256"
     jwt_expiration_hours: int = 24
+    token_cache_max_entries: int = 10000  # Verified tokens whose claims are reused until they expire (0 = off)
     
     # Redis Configuration (for caching)
     redis_host: str = "localhost"
@@ -33,15 +76,44 @@ class Settings(BaseSettings):
     redis_db: int = 0
     redis_enabled: bool = False  # Set to True if Redis is available
     
+    # Session Configuration (conversation history; shared through Redis when enabled)
+    session_max_turns: int = 10  # Turns kept per session
+    session_ttl: int = 86400  # Sessions expire 24 hours after their last message
+    session_max_sessions: int = 10000  # In-memory store only: least recently used sessions are evicted
+    session_answer_max_chars: int = 1000  # Stored answers are truncated; prompts only use their start
+    
     # Query Configuration
     query_cache_ttl: int = 3600  # 1 hour
     max_query_timeout: int = 300  # 5 minutes
     default_lookback_days: int = 30
+    chart_spec_cache_ttl: int = 86400  # 24 hours; specs are cached without data
+    sql_plan_max_queries: int = 4  # Independent queries the data agent may plan for one question
+    sql_plan_parallelism: int = 3  # Queries of one plan running on Athena at the same time
+    result_handle_ttl: int = 3600  # How long a turn's result stays available to follow-up questions
+    result_store_max_entries: int = 1000  # Results kept in memory when Redis is not used (least recently used dropped)
+    result_page_size: int = 500  # Default rows per page of /api/results/{handle}
+    job_workers: int = 4  # Background chat jobs (/api/jobs) running at the same time per worker process
+    job_queue_max: int = 100  # Jobs waiting for a job worker; further submissions get 503
+    job_timeout_seconds: float = 600.0  # A job running longer fails
+    job_ttl: int = 3600  # How long job records and results stay available
+    job_poll_interval_seconds: float = 1.0  # WebSocket re-check interval for jobs running in another process
+    batch_max_questions: int = 20  # Questions per /api/chat/batch request
+    batch_parallelism: int = 4  # Graphs of one batch running at the same time
+    prewarm_enabled: bool = True  # Run the standard dashboard queries for a tenant in the background at login
+    prewarm_queries: str = "daily_7,daily_30,weekly_12"  # Names from prewarm.STANDARD_QUERIES (also: anomalies)
+    prewarm_min_interval_seconds: int = 900  # A tenant is prewarmed at most once per interval
+    prewarm_max_tenants: int = 4  # Tenants prewarming at the same time; further logins skip prewarming
+    athena_max_concurrency: int = 20  # Queries running on the workgroup at once (keep under the account quota)
+    athena_tenant_max_concurrency: int = 4  # Running queries per tenant; the rest queue round-robin
+    athena_background_max_concurrency: int = 5  # Slots background work (prewarm, refresh) may take
+    athena_queue_timeout_seconds: float = 60.0  # Longest wait for a slot before the query fails
+    athena_throttle_retries: int = 3  # Retries of StartQueryExecution when Athena throttles
     
     # Server Configuration
     host: str = "0.0.0.0"
     port: int = int(os.getenv("PORT", "8000"))  # Render provides PORT env var
     debug: bool = False
+    warmup_on_startup: bool = True  # Build the graph, LLM models, boto3 clients and Redis connection after startup
     
     # CORS Configuration
     cors_origins: str = os.getenv("CORS_ORIGINS", "*")  # Comma-separated list of allowed origins
@@ -1,15 +1,38 @@
 """LangGraph state and graph definition."""
-from typing import TypedDict, List, Dict, Any, Optional, Literal
-from langgraph.graph import StateGraph, END
+import functools
+import logging
+import re
+import time
+from typing import TypedDict, List, Dict, Any, Optional, Literal, AsyncIterator, Tuple
+from baseline_store import baseline_store
 from agents import (
-    classify_intent,
-    generate_sql,
-    execute_query,
-    generate_chart_spec,
-    generate_coach_response,
+    aclassify_intent,
+    needs_data,
+    agenerate_sql_plan,
+    aexecute_plan,
+    agenerate_chart_spec,
+    agenerate_coach_response,
     detect_anomalies,
-    explain_anomalies
+    aexplain_anomalies,
+    afetch_precomputed_anomalies,
+    precomputed_covers,
+    astream_coach_response,
+    plan_followup,
+    apply_followup
 )
+from cache import cache
+from config import settings
+from metrics import metrics
+from prewarm import standard_query_for
+from result_store import result_store
+from tracing import span, traced, record_span, current_trace
+
+logger = logging.getLogger(__name__)
+
+# Cache key set while gold_daily_anomalies is known to be missing
+PRECOMPUTED_MISSING_KEY = "anomaly:precomputed_missing"
+# Athena (TABLE_NOT_FOUND, "does not exist") and DuckDB wording for a missing table
+_TABLE_MISSING = re.compile(r"TABLE_NOT_FOUND|does not exist", re.IGNORECASE)
 
 
 class GraphState(TypedDict):
@@ -19,76 +42,194 @@ class GraphState(TypedDict):
     conversation_history: List[Dict[str, str]]
     intent: Optional[str]
     sql_queries: List[str]
+    sql_plan: List[str]
     query_results: Optional[Dict[str, Any]]
     chart_specs: List[Dict[str, Any]]
     anomalies: List[Dict[str, Any]]
     final_answer: str
     sql_used: Optional[str]
+    spans: List[Dict[str, Any]]
+
+
+def _spans() -> List[Dict[str, Any]]:
+    """Spans recorded so far in the current request's trace."""
+    trace = current_trace()
+    return trace.to_list() if trace is not None else []
+
+
+def _traced_node(name: str):
+    """Run a node inside a span and copy the request's spans into the state."""
+    def decorator(node):
+        @functools.wraps(node)
+        async def wrapper(state: GraphState) -> GraphState:
+            with span(f"node.{name}"):
+                state = await node(state)
+            state["spans"] = _spans()
+            return state
+        return wrapper
+    return decorator
 
 
-def router_node(state: GraphState) -> GraphState:
+@_traced_node("router")
+async def router_node(state: GraphState) -> GraphState:
     """Route based on intent."""
-    intent = classify_intent(
+    intent = await aclassify_intent(
         state["user_question"],
         state.get("conversation_history", [])
     )
     state["intent"] = intent
+    metrics.incr(f"graph.intent.{intent}")
+    if not needs_data(intent):
+        metrics.incr("graph.short_circuit")
     return state
 
 
-def data_node(state: GraphState) -> GraphState:
-    """Generate and execute SQL query."""
-    sql = None
-    try:
-        sql = generate_sql(
+@traced("data.generate_sql")
+async def _generate_sql_step(state: GraphState) -> GraphState:
+    """
+    Generate the SQL plan (one or more independent queries) and record it in state.
+    
+    Dashboard tile questions use their standard query, which login prewarmed
+    into the query cache, without an LLM call.
+    """
+    standard_sql = standard_query_for(state["user_question"])
+    if standard_sql:
+        plan = [standard_sql.replace("${tenant_id}", state["tenant_id"])]
+        metrics.incr("graph.standard_query")
+    else:
+        plan = await agenerate_sql_plan(
             state["user_question"],
             state["intent"],
             state["tenant_id"],
             state.get("conversation_history", [])
         )
-        
-        state["sql_queries"] = state.get("sql_queries", []) + [sql]
-        state["sql_used"] = sql
+    
+    state["sql_plan"] = plan
+    state["sql_queries"] = state.get("sql_queries", []) + plan
+    state["sql_used"] = ";\n\n".join(plan)
+    return state
+
+
+@traced("data.execute")
+async def _execute_sql_step(state: GraphState) -> GraphState:
+    """Execute the SQL plan concurrently and record the merged results in state."""
+    query_results = await aexecute_plan(state["sql_plan"], state["tenant_id"])
+    state["query_results"] = query_results
+    return state
+
+
+@traced("data.followup")
+async def _followup_step(state: GraphState) -> bool:
+    """
+    Answer a refinement of the previous turn (filter, re-aggregate, re-chart)
+    from its stored result; False if the question needs new data.
+    """
+    history = state.get("conversation_history") or []
+    handle = history[-1].get("result") if history else None
+    if not handle:
+        return False
+    
+    previous = result_store.get(state["tenant_id"], handle)
+    plan = plan_followup(state["user_question"], previous)
+    if plan is None:
+        return False
+    
+    state["query_results"] = apply_followup(plan, previous)
+    state["sql_used"] = previous.get("sql")
+    metrics.incr("graph.followup_reuse")
+    return True
+
+
+def _raise_with_sql(state: GraphState, e: Exception):
+    """Re-raise a data error with the SQL that caused it."""
+    sql = state.get("sql_used")
+    # Attach SQL to exception for better error messages
+    if sql:
+        e.sql_used = sql
+    # Store SQL in state for error display
+    state["sql_used"] = sql if sql else "SQL generation failed"
+    # Re-raise with SQL context
+    raise Exception(f"SQL execution failed: {str(e)}\n\nSQL used:\n{state['sql_used']}") from e
+
+
+@_traced_node("data")
+async def data_node(state: GraphState) -> GraphState:
+    """Generate and execute SQL query, unless a follow-up can reuse the previous result."""
+    if await _followup_step(state):
+        return state
+    
+    try:
+        state = await _generate_sql_step(state)
         
         # Execute query
-        query_results = execute_query(sql, state["tenant_id"])
-        state["query_results"] = query_results
+        state = await _execute_sql_step(state)
     except Exception as e:
-        # Attach SQL to exception for better error messages
-        if sql:
-            e.sql_used = sql
-        # Store SQL in state for error display
-        state["sql_used"] = sql if sql else "SQL generation failed"
-        # Re-raise with SQL context
-        raise Exception(f"SQL execution failed: {str(e)}\n\nSQL used:\n{state['sql_used']}")
+        _raise_with_sql(state, e)
     
     return state
 
 
-def dashboard_node(state: GraphState) -> GraphState:
+@_traced_node("dashboard")
+async def dashboard_node(state: GraphState) -> GraphState:
     """Generate chart specifications."""
     if not state.get("query_results"):
         return state
     
-    chart_spec = generate_chart_spec(
+    chart_spec = await agenerate_chart_spec(
         state["query_results"],
-        state["user_question"]
+        state["user_question"],
+        intent=state.get("intent")
     )
     
     state["chart_specs"] = state.get("chart_specs", []) + [chart_spec]
     return state
 
 
-def anomaly_node(state: GraphState) -> GraphState:
-    """Detect anomalies."""
-    if not state.get("query_results"):
-        return state
+def _use_fast_path(state: GraphState) -> bool:
+    """Whether an anomaly question is answered from gold_daily_anomalies (see precomputed_covers)."""
+    return settings.anomaly_fast_path and precomputed_covers(state["user_question"])
+
+
+async def _precomputed_anomaly_step(state: GraphState) -> bool:
+    """
+    Fill results and anomalies from gold_daily_anomalies; False if the table is unavailable.
     
-    anomalies = detect_anomalies(state["query_results"])
+    A missing table is remembered for anomaly_fast_path_retry_seconds, so
+    deployments without it do not pay a failed Athena query per question.
+    """
+    if cache.get(PRECOMPUTED_MISSING_KEY):
+        metrics.incr("graph.anomaly_fast_path.skipped")
+        return False
+    try:
+        query_results, anomalies = await afetch_precomputed_anomalies(state["user_question"], state["tenant_id"])
+    except Exception as e:
+        logger.warning(f"Precomputed anomalies unavailable, generating SQL instead: {e}")
+        if _TABLE_MISSING.search(str(e)):
+            cache.set(PRECOMPUTED_MISSING_KEY, True, ttl=settings.anomaly_fast_path_retry_seconds)
+        return False
+    
+    state["sql_queries"] = state.get("sql_queries", []) + [query_results["sql"]]
+    state["sql_used"] = query_results["sql"]
+    state["query_results"] = query_results
     state["anomalies"] = anomalies
+    return True
+
+
+@traced("anomaly.detect")
+async def _detect_anomaly_step(state: GraphState) -> GraphState:
+    """Score the query results against the tenant's baselines."""
+    baselines = await baseline_store.arefresh(state["tenant_id"])
+    state["anomalies"] = detect_anomalies(state["query_results"], baselines=baselines)
+    return state
+
+
+@traced("anomaly.explain")
+async def _explain_anomaly_step(state: GraphState) -> GraphState:
+    """Append an explanation of the detected anomalies to the answer."""
+    anomalies = state.get("anomalies", [])
     
     if anomalies:
-        explanation = explain_anomalies(
+        explanation = await aexplain_anomalies(
             anomalies,
             state["user_question"],
             state["query_results"]
@@ -99,9 +240,33 @@ def anomaly_node(state: GraphState) -> GraphState:
     return state
 
 
-def coach_node(state: GraphState) -> GraphState:
+@_traced_node("anomaly")
+async def anomaly_node(state: GraphState) -> GraphState:
+    """
+    Detect anomalies.
+    
+    Reached straight from the router (fast path), it reads the precomputed
+    gold_daily_anomalies table; if that fails it falls back to generated SQL
+    and in-process detection.
+    """
+    precomputed = False
+    if not state.get("query_results") and _use_fast_path(state):
+        precomputed = await _precomputed_anomaly_step(state)
+    
+    if not precomputed:
+        if not state.get("query_results"):
+            state = await data_node(state)
+        if not state.get("query_results"):
+            return state
+        state = await _detect_anomaly_step(state)
+    
+    return await _explain_anomaly_step(state)
+
+
+@_traced_node("coach")
+async def coach_node(state: GraphState) -> GraphState:
     """Generate coach response."""
-    answer = generate_coach_response(
+    answer = await agenerate_coach_response(
         state["user_question"],
         state.get("query_results", {}),
         state.get("chart_specs", [None])[0] if state.get("chart_specs") else None,
@@ -112,14 +277,15 @@ def coach_node(state: GraphState) -> GraphState:
     return state
 
 
-def summary_node(state: GraphState) -> GraphState:
+@_traced_node("summary")
+async def summary_node(state: GraphState) -> GraphState:
     """Generate summary response."""
     if not state.get("query_results"):
         state["final_answer"] = "No data available to summarize."
         return state
     
     # Use coach agent for summary
-    answer = generate_coach_response(
+    answer = await agenerate_coach_response(
         f"Summarize this data: {state['user_question']}",
         state["query_results"],
         conversation_history=state.get("conversation_history", [])
@@ -129,6 +295,18 @@ def summary_node(state: GraphState) -> GraphState:
     return state
 
 
+def decide_after_router(state: GraphState) -> Literal["data", "anomaly", "coach"]:
+    """
+    Questions that need no tenant data go straight to the coach; anomaly
+    questions skip SQL generation when the precomputed table can answer them.
+    """
+    if not needs_data(state.get("intent")):
+        return "coach"
+    if state.get("intent") == "anomaly" and _use_fast_path(state):
+        return "anomaly"
+    return "data"
+
+
 def decide_next(state: GraphState) -> Literal["dashboard", "anomaly", "coach", "summary", "end"]:
     """Decide next step based on intent."""
     intent = state.get("intent")
@@ -143,46 +321,182 @@ def decide_next(state: GraphState) -> Literal["dashboard", "anomaly", "coach", "
         return "coach"
 
 
+# The workflow, shared by create_graph and stream_graph
+ENTRY = "router"
+END_STEP = "end"
+
+NODES = {
+    "router": router_node,
+    "data": data_node,
+    "dashboard": dashboard_node,
+    "anomaly": anomaly_node,
+    "coach": coach_node,
+    "summary": summary_node
+}
+
+# Node -> (function choosing the next step, steps it can choose)
+CONDITIONAL_EDGES = {
+    "router": (decide_after_router, ("data", "anomaly", "coach")),
+    "data": (decide_next, ("dashboard", "anomaly", "coach", "summary", END_STEP))
+}
+
+# Node -> next step; all paths end at coach/summary
+EDGES = {
+    "dashboard": "coach",
+    "anomaly": "coach",
+    "coach": END_STEP,
+    "summary": END_STEP
+}
+
+
+def next_step(step: str, state: GraphState) -> str:
+    """The step after `step` for this state (END_STEP when the workflow is done)."""
+    if step in CONDITIONAL_EDGES:
+        decide, _ = CONDITIONAL_EDGES[step]
+        return decide(state)
+    return EDGES[step]
+
+
 # Build graph
-def create_graph() -> StateGraph:
+def create_graph():
     """Create LangGraph workflow."""
+    # Imported here: langgraph is slow to import and only needed to build the graph
+    from langgraph.graph import StateGraph, END
+    
+    def target(step: str):
+        return END if step == END_STEP else step
+    
     workflow = StateGraph(GraphState)
     
-    # Add nodes
-    workflow.add_node("router", router_node)
-    workflow.add_node("data", data_node)
-    workflow.add_node("dashboard", dashboard_node)
-    workflow.add_node("anomaly", anomaly_node)
-    workflow.add_node("coach", coach_node)
-    workflow.add_node("summary", summary_node)
-    
-    # Set entry point
-    workflow.set_entry_point("router")
-    
-    # Add edges
-    workflow.add_edge("router", "data")
-    workflow.add_conditional_edges(
-        "data",
-        decide_next,
-        {
-            "dashboard": "dashboard",
-            "anomaly": "anomaly",
-            "coach": "coach",
-            "summary": "summary",
-            "end": END
-        }
-    )
+    for name, node in NODES.items():
+        workflow.add_node(name, node)
+    workflow.set_entry_point(ENTRY)
     
-    # All paths end at coach/summary, then END
-    workflow.add_edge("dashboard", "coach")
-    workflow.add_edge("anomaly", "coach")
-    workflow.add_edge("coach", END)
-    workflow.add_edge("summary", END)
+    for source, (decide, steps) in CONDITIONAL_EDGES.items():
+        workflow.add_conditional_edges(source, decide, {step: target(step) for step in steps})
+    for source, step in EDGES.items():
+        workflow.add_edge(source, target(step))
     
     return workflow.compile()
 
 
-# Singleton graph instance
-graph = create_graph()
+# Singleton graph instance, compiled on first use (or by the startup warm-up)
+_graph = None
+
+
+def get_graph():
+    """The compiled workflow."""
+    global _graph
+    if _graph is None:
+        _graph = create_graph()
+    return _graph
+
+
+def __getattr__(name: str):
+    # Module attribute `graph` (the old singleton) still works, compiling on first access
+    if name == "graph":
+        return get_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
+async def _stream_router(state: GraphState) -> AsyncIterator[Tuple[str, Any]]:
+    await router_node(state)
+    yield "intent", {"intent": state["intent"]}
 
+
+async def _stream_data(state: GraphState) -> AsyncIterator[Tuple[str, Any]]:
+    if await _followup_step(state):
+        yield "sql", {"sql": state["sql_used"]}
+    else:
+        try:
+            await _generate_sql_step(state)
+            yield "sql", {"sql": state["sql_used"], "queries": state["sql_plan"]}
+            await _execute_sql_step(state)
+        except Exception as e:
+            _raise_with_sql(state, e)
+    yield "results", state["query_results"]
+
+
+async def _stream_dashboard(state: GraphState) -> AsyncIterator[Tuple[str, Any]]:
+    await dashboard_node(state)
+    for chart_spec in state.get("chart_specs", []):
+        yield "chart", chart_spec
+
+
+async def _stream_anomaly(state: GraphState) -> AsyncIterator[Tuple[str, Any]]:
+    """anomaly_node, emitting the SQL and results of the data it reads first."""
+    precomputed = False
+    if not state.get("query_results") and _use_fast_path(state):
+        precomputed = await _precomputed_anomaly_step(state)
+        if precomputed:
+            yield "sql", {"sql": state["sql_used"]}
+            yield "results", state["query_results"]
+    if not precomputed and not state.get("query_results"):
+        async for event in _stream_data(state):
+            yield event
+    
+    with span("node.anomaly"):
+        if not precomputed:
+            await _detect_anomaly_step(state)
+        await _explain_anomaly_step(state)
+    yield "anomalies", {"anomalies": state.get("anomalies", [])}
+
+
+async def _stream_answer(state: GraphState, step: str) -> AsyncIterator[Tuple[str, Any]]:
+    """coach_node / summary_node, streaming the answer token by token."""
+    if step == "summary":
+        if not state.get("query_results"):
+            state["final_answer"] = "No data available to summarize."
+            yield "token", {"text": state["final_answer"]}
+            return
+        tokens = astream_coach_response(
+            f"Summarize this data: {state['user_question']}",
+            state["query_results"],
+            conversation_history=state.get("conversation_history", [])
+        )
+    else:
+        tokens = astream_coach_response(
+            state["user_question"],
+            state.get("query_results", {}),
+            state.get("chart_specs", [None])[0] if state.get("chart_specs") else None,
+            state.get("conversation_history", [])
+        )
+    
+    # Recorded once streaming ends: a span held open across yields could be closed in another context
+    start = time.perf_counter()
+    answer = ""
+    async for token in tokens:
+        answer += token
+        yield "token", {"text": token}
+    record_span(f"node.{step}", start)
+    state["final_answer"] = answer.strip()
+
+
+# Streaming counterpart of each node in NODES (nodes update the state in place)
+_STREAM_STEPS = {
+    "router": _stream_router,
+    "data": _stream_data,
+    "dashboard": _stream_dashboard,
+    "anomaly": _stream_anomaly,
+    "coach": lambda state: _stream_answer(state, "coach"),
+    "summary": lambda state: _stream_answer(state, "summary")
+}
+
+
+async def stream_graph(state: GraphState) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Run the workflow step by step, yielding (event, payload) as results become ready.
+    
+    Follows the same nodes and edges as the compiled graph (NODES,
+    CONDITIONAL_EDGES, EDGES), but emits intent, SQL, query results, charts
+    and anomalies as soon as each is available and streams the final answer
+    token by token. Ends with a 'done' event carrying the final state.
+    """
+    step = ENTRY
+    while step != END_STEP:
+        async for event in _STREAM_STEPS[step](state):
+            yield event
+        step = next_step(step, state)
+    
+    state["spans"] = _spans()
+    yield "done", state
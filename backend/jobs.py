@@ -0,0 +1,153 @@
+"""Background jobs for chat questions that take too long for one HTTP request."""
+import asyncio
+import logging
+import time
+import uuid
+from typing import Dict, Any, Optional, Callable, Awaitable, List
+from cache import cache
+from config import settings
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+# A job's work: called with a stage callback, returns the result to store
+JobWork = Callable[[Callable[[str], None]], Awaitable[Dict[str, Any]]]
+
+
+class JobQueueFull(Exception):
+    """More than job_queue_max jobs are waiting for a worker."""
+
+
+class JobRunner:
+    """
+    Runs submitted jobs on a fixed pool of job_workers asyncio workers.
+    
+    Job records (status, current stage, result or error) are written to the
+    cache backend on every change and kept for job_ttl seconds, so with Redis
+    any worker process can answer a poll. Without Redis the records live in
+    the submitting process only, so a poll or WebSocket served by another
+    worker gets 404: run a single worker process unless Redis is enabled.
+    Waiting for a change is immediate for jobs running in this process and
+    falls back to re-reading the record every job_poll_interval_seconds for
+    jobs running elsewhere.
+    """
+    
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        # job_id -> event set (and replaced) whenever a local job's record changes
+        self._changed: Dict[str, asyncio.Event] = {}
+    
+    def _key(self, tenant_id: str, job_id: str) -> str:
+        return f"job:{tenant_id}:{job_id}"
+    
+    def _save(self, job: Dict[str, Any]) -> None:
+        job['updated_at'] = time.time()
+        # Store a copy: the in-memory cache keeps the object itself
+        cache.set(self._key(job['tenant_id'], job['job_id']), dict(job), ttl=settings.job_ttl)
+        event = self._changed.pop(job['job_id'], None)
+        if job['status'] not in FINISHED:
+            self._changed[job['job_id']] = asyncio.Event()
+        if event:
+            event.set()
+    
+    def _start_workers(self) -> None:
+        if self._queue is None:
+            if not cache.connect():
+                logger.warning("Redis is not in use: job records are only visible to this worker process")
+            self._queue = asyncio.Queue(maxsize=settings.job_queue_max)
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(settings.job_workers)]
+    
+    def submit(self, tenant_id: str, question: str, work: JobWork) -> Dict[str, Any]:
+        """Queue a job and return its record; raises JobQueueFull if the queue is full."""
+        self._start_workers()
+        if self._queue.full():
+            metrics.incr("jobs.rejected")
+            raise JobQueueFull(f"{settings.job_queue_max} jobs are already waiting")
+        now = time.time()
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'tenant_id': tenant_id,
+            'question': question,
+            'status': QUEUED,
+            'stage': None,
+            'created_at': now,
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None
+        }
+        self._save(job)
+        self._queue.put_nowait((job, work))
+        metrics.set_gauge("jobs.queued", self._queue.qsize())
+        return job
+    
+    def get(self, tenant_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """A job's record, or None if it expired or belongs to another tenant."""
+        return cache.get(self._key(tenant_id, job_id))
+    
+    async def wait_for_change(self, job_id: str) -> None:
+        """Return when a local job changes, or after job_poll_interval_seconds."""
+        event = self._changed.get(job_id)
+        if event is None:
+            await asyncio.sleep(settings.job_poll_interval_seconds)
+            return
+        try:
+            await asyncio.wait_for(event.wait(), settings.job_poll_interval_seconds)
+        except asyncio.TimeoutError:
+            pass
+    
+    async def _worker(self) -> None:
+        while True:
+            job, work = await self._queue.get()
+            metrics.set_gauge("jobs.queued", self._queue.qsize())
+            try:
+                await self._run(job, work)
+            finally:
+                self._queue.task_done()
+    
+    async def _run(self, job: Dict[str, Any], work: JobWork) -> None:
+        job.update(status=RUNNING, started_at=time.time())
+        self._save(job)
+        metrics.observe("jobs.queue_wait_ms", (job['started_at'] - job['created_at']) * 1000)
+        
+        def on_stage(stage: str) -> None:
+            job['stage'] = stage
+            self._save(job)
+        
+        try:
+            result = await asyncio.wait_for(work(on_stage), settings.job_timeout_seconds)
+        except asyncio.CancelledError:
+            job.update(status=FAILED, error="Job cancelled (server shutting down)", finished_at=time.time())
+            self._save(job)
+            raise
+        except asyncio.TimeoutError:
+            job.update(status=FAILED, error=f"Job timed out after {settings.job_timeout_seconds:g} seconds")
+        except Exception as e:
+            logger.warning(f"Job {job['job_id']} failed: {e}")
+            job.update(status=FAILED, error=str(e))
+        else:
+            job.update(status=SUCCEEDED, result=result)
+        job.update(stage=None, finished_at=time.time())
+        self._save(job)
+        metrics.incr(f"jobs.{job['status']}")
+        metrics.observe("jobs.run_ms", (job['finished_at'] - job['started_at']) * 1000)
+    
+    async def aclose(self) -> None:
+        """Stop the workers (shutdown); running jobs are marked failed."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+
+# Singleton instance
+job_runner = JobRunner()
@@ -1,53 +1,554 @@
 """LLM client supporting Ollama and OpenAI."""
-from typing import Optional, List, Dict, Any
-from langchain_openai import ChatOpenAI
-from langchain_community.chat_models import ChatOllama
-from langchain.schema import BaseMessage, HumanMessage, SystemMessage
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import deque
+from functools import cached_property
+from typing import Optional, List, Dict, Any, AsyncIterator, Iterator
+import httpx
+from langchain_core.messages import BaseMessage
 from config import settings
+from metrics import metrics
+from prompt_budget import log_prompt_size
+from tracing import span, record_span
 
+logger = logging.getLogger(__name__)
 
-class LLMClient:
-    """Unified LLM client supporting multiple providers."""
+# Map langchain message types to chat API roles
+_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+# Shared async HTTP connection pool and per-backend concurrency limits
+_http_client: Optional[httpx.AsyncClient] = None
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+_waiting: Dict[str, int] = {}
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Get the shared async HTTP client (connection pool)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_connections
+            ),
+            timeout=settings.llm_timeout_seconds
+        )
+    return _http_client
+
+
+def _get_semaphore(name: str) -> asyncio.Semaphore:
+    """Get the concurrency semaphore for a backend."""
+    if name not in _semaphores:
+        _semaphores[name] = asyncio.Semaphore(settings.llm_max_concurrency)
+        _waiting[name] = 0
+    return _semaphores[name]
+
+
+def _is_retryable(e: Exception) -> bool:
+    """Transport errors, timeouts, throttling and server errors are retried."""
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code == 429 or e.response.status_code >= 500
+    return isinstance(e, (httpx.TransportError, asyncio.TimeoutError))
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """Percentile (0-100) of a list of values."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+class LLMBackend:
+    """A single provider/model endpoint with its own concurrency limit and latency stats."""
     
-    def __init__(self):
-        self.provider = settings.llm_provider
-        self.llm = self._create_llm()
+    def __init__(self, name: str, provider: str, model: str, base_url: str = None):
+        self.name = name
+        self.provider = provider
+        self.model = model
+        self.base_url = base_url or (
+            settings.openai_base_url if provider == "openai" else settings.ollama_base_url
+        )
+        # Rolling windows of (monotonic time, latency_ms, ok), overall and per agent
+        self._window: deque = deque(maxlen=settings.llm_router_window)
+        self._agent_windows: Dict[str, deque] = {}
+    
+    @cached_property
+    def llm(self):
+        """LangChain chat model for the sync path, created on first use."""
+        return self._create_llm()
     
     def _create_llm(self):
         """Create LLM instance based on provider."""
+        # Imported here: the LangChain provider packages are slow to import
         if self.provider == "openai":
+            from langchain_openai import ChatOpenAI
             if not settings.openai_api_key:
                 raise ValueError("OpenAI API key not set")
             return ChatOpenAI(
-                model=settings.openai_model,
+                model=self.model,
                 temperature=0.7,
-                openai_api_key=settings.openai_api_key
+                openai_api_key=settings.openai_api_key,
+                openai_api_base=self.base_url
             )
         else:  # ollama
+            from langchain_community.chat_models import ChatOllama
             return ChatOllama(
-                model=settings.ollama_model,
-                base_url=settings.ollama_base_url,
+                model=self.model,
+                base_url=self.base_url,
                 temperature=0.7
             )
     
-    def invoke(
-        self,
-        messages: List[BaseMessage],
-        **kwargs
-    ) -> str:
+    # Latency / error tracking
+    
+    def observe(self, latency_ms: float, ok: bool, agent: str = None) -> None:
+        """Record the outcome of a call."""
+        sample = (time.monotonic(), latency_ms, ok)
+        self._window.append(sample)
+        if agent:
+            if agent not in self._agent_windows:
+                self._agent_windows[agent] = deque(maxlen=settings.llm_router_window)
+            self._agent_windows[agent].append(sample)
+        metrics.observe(f"llm.{self.name}.latency_ms", latency_ms)
+        if not ok:
+            metrics.incr(f"llm.{self.name}.errors")
+    
+    def _samples(self, agent: str = None) -> deque:
+        """
+        Per-agent window when it has data, otherwise the overall window.
+        
+        Calls older than llm_router_max_age_seconds are dropped first. A
+        backend that only failed scores inf and gets no traffic, so without
+        ageing its window would never change and it would stay excluded.
+        """
+        cutoff = time.monotonic() - settings.llm_router_max_age_seconds
+        for window in (self._window, self._agent_windows.get(agent) if agent else None):
+            while window and window[0][0] < cutoff:
+                window.popleft()
+        window = self._agent_windows.get(agent) if agent else None
+        return window if window else self._window
+    
+    def stats(self, agent: str = None) -> Dict[str, float]:
+        """Rolling p50/p95 latency (successful calls) and error rate."""
+        samples = self._samples(agent)
+        latencies = [latency for _, latency, ok in samples if ok]
+        return {
+            'samples': len(samples),
+            'p50_ms': _percentile(latencies, 50) if latencies else 0.0,
+            'p95_ms': _percentile(latencies, 95) if latencies else 0.0,
+            'error_rate': (sum(1 for _, _, ok in samples if not ok) / len(samples)) if samples else 0.0
+        }
+    
+    def score(self, agent: str = None) -> float:
+        """
+        Lower is better: p95 latency penalized by error rate. Unmeasured backends
+        score 0; backends with only failures in the window score inf until those
+        age out.
+        """
+        stats = self.stats(agent)
+        if stats['error_rate'] >= 1.0:
+            return float('inf')
+        return stats['p95_ms'] * (1 + settings.llm_router_error_penalty * stats['error_rate'])
+    
+    # Sync interface (langchain)
+    
+    def invoke(self, messages: List[BaseMessage], **kwargs) -> str:
         """Invoke LLM with messages."""
         return self.llm.invoke(messages, **kwargs).content
     
     def stream(self, messages: List[BaseMessage]):
         """Stream LLM responses."""
         return self.llm.stream(messages)
+    
+    # Async interface: direct HTTP calls over the shared connection pool
+    
+    def _request(self, messages: List[BaseMessage], stream: bool) -> Dict[str, Any]:
+        """Build the provider HTTP request (url, headers, json body)."""
+        payload_messages = [
+            {"role": _ROLES.get(m.type, "user"), "content": m.content}
+            for m in messages
+        ]
+        if self.provider == "openai":
+            return {
+                "url": f"{self.base_url.rstrip('/')}/chat/completions",
+                "headers": {"Authorization": f"Bearer {settings.openai_api_key}"},
+                "json": {
+                    "model": self.model,
+                    "messages": payload_messages,
+                    "temperature": 0.7,
+                    "stream": stream,
+                    **({"stream_options": {"include_usage": True}} if stream else {})
+                }
+            }
+        return {
+            "url": f"{self.base_url.rstrip('/')}/api/chat",
+            "headers": {},
+            "json": {
+                "model": self.model,
+                "messages": payload_messages,
+                "stream": stream,
+                "options": {"temperature": 0.7}
+            }
+        }
+    
+    def _parse_line(self, line: str) -> Optional[Dict[str, Any]]:
+        """Decode one line of a streaming response (NDJSON for Ollama, SSE for OpenAI)."""
+        line = line.strip()
+        if not line:
+            return None
+        if self.provider == "openai":
+            if not line.startswith("data:"):
+                return None
+            line = line[5:].strip()
+            if line == "[DONE]":
+                return None
+        return json.loads(line)
+    
+    def _content(self, body: Dict[str, Any], stream: bool) -> Optional[str]:
+        """Extract response text (or the streamed text delta) from a response body."""
+        if self.provider == "openai":
+            choices = body.get("choices") or [{}]
+            return choices[0].get("delta" if stream else "message", {}).get("content")
+        return body.get("message", {}).get("content")
+    
+    def _usage(self, body: Dict[str, Any]) -> Optional[Dict[str, int]]:
+        """Extract prompt token usage (and provider prefix-cache hits) if present."""
+        if self.provider == "openai":
+            usage = body.get("usage")
+            if not usage:
+                return None
+            return {
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "cached_prompt_tokens": (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+            }
+        if "prompt_eval_count" not in body:
+            return None
+        return {"prompt_tokens": body["prompt_eval_count"]}
+    
+    async def _acquire(self, timeout: float) -> float:
+        """Wait for a backend slot; returns queue wait in ms."""
+        semaphore = _get_semaphore(self.name)
+        _waiting[self.name] += 1
+        metrics.set_gauge(f"llm.{self.name}.queue_depth", _waiting[self.name])
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout)
+        finally:
+            _waiting[self.name] -= 1
+            metrics.set_gauge(f"llm.{self.name}.queue_depth", _waiting[self.name])
+        queue_ms = (time.perf_counter() - start) * 1000
+        metrics.observe(f"llm.{self.name}.queue_wait_ms", queue_ms)
+        return queue_ms
+    
+    def _record(
+        self,
+        queue_ms: float,
+        generation_ms: float,
+        attempts: int,
+        usage: Dict[str, int] = None,
+        ttft_ms: float = None
+    ) -> None:
+        """Report queue wait, generation time, time-to-first-token and prompt tokens separately."""
+        metrics.observe(f"llm.{self.name}.generation_ms", generation_ms)
+        details = ""
+        if ttft_ms is not None:
+            metrics.observe(f"llm.{self.name}.ttft_ms", ttft_ms)
+            details += f" ttft_ms={ttft_ms:.1f}"
+        for key, value in (usage or {}).items():
+            metrics.observe(f"llm.{self.name}.{key}", value)
+            details += f" {key}={value}"
+        logger.info(
+            f"LLM call backend={self.name} queue_wait_ms={queue_ms:.1f} "
+            f"generation_ms={generation_ms:.1f} attempts={attempts}{details}"
+        )
+    
+    async def _backoff(self, attempt: int, e: Exception) -> None:
+        """Sleep with exponential backoff and full jitter before a retry."""
+        delay = random.uniform(0, settings.llm_retry_base_delay * (2 ** attempt))
+        metrics.incr(f"llm.{self.name}.retries")
+        logger.warning(f"LLM call to {self.name} failed ({e!r}), retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
+    
+    async def ainvoke(self, messages: List[BaseMessage], timeout: float = None) -> str:
+        """
+        Invoke LLM asynchronously.
+        
+        Calls are queued behind a per-backend concurrency limit, bounded by a
+        per-call timeout and retried with jittered backoff on transient errors.
+        """
+        timeout = timeout or settings.llm_timeout_seconds
+        request = self._request(messages, stream=False)
+        client = _get_http_client()
+        
+        attempt = 0
+        while True:
+            queue_ms = await self._acquire(timeout)
+            start = time.perf_counter()
+            error = None
+            try:
+                response = await asyncio.wait_for(
+                    client.post(request["url"], headers=request["headers"], json=request["json"]),
+                    timeout
+                )
+                response.raise_for_status()
+                body = response.json()
+            except Exception as e:
+                if attempt >= settings.llm_max_retries or not _is_retryable(e):
+                    raise
+                error = e
+            finally:
+                _get_semaphore(self.name).release()
+            
+            if error is not None:
+                # Back off without holding a slot other calls could use
+                attempt += 1
+                await self._backoff(attempt, error)
+                continue
+            
+            self._record(queue_ms, (time.perf_counter() - start) * 1000, attempt + 1, self._usage(body))
+            return self._content(body, stream=False)
+    
+    async def astream(self, messages: List[BaseMessage], timeout: float = None) -> AsyncIterator[str]:
+        """
+        Stream LLM response text asynchronously.
+        
+        Retries only happen before the first token has been yielded.
+        """
+        timeout = timeout or settings.llm_timeout_seconds
+        request = self._request(messages, stream=True)
+        client = _get_http_client()
+        
+        attempt = 0
+        while True:
+            queue_ms = await self._acquire(timeout)
+            start = time.perf_counter()
+            yielded = False
+            ttft_ms = None
+            usage = None
+            error = None
+            try:
+                async with client.stream(
+                    "POST",
+                    request["url"],
+                    headers=request["headers"],
+                    json=request["json"],
+                    timeout=timeout
+                ) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        body = self._parse_line(line)
+                        if body is None:
+                            continue
+                        usage = self._usage(body) or usage
+                        text = self._content(body, stream=True)
+                        if text:
+                            if not yielded:
+                                ttft_ms = (time.perf_counter() - start) * 1000
+                            yielded = True
+                            yield text
+            except Exception as e:
+                if yielded or attempt >= settings.llm_max_retries or not _is_retryable(e):
+                    raise
+                error = e
+            finally:
+                _get_semaphore(self.name).release()
+            
+            if error is not None:
+                attempt += 1
+                await self._backoff(attempt, error)
+                continue
+            
+            self._record(queue_ms, (time.perf_counter() - start) * 1000, attempt + 1, usage, ttft_ms)
+            return
 
 
-# Singleton instance
-llm_client = LLMClient()
-
-
+def _parse_backends() -> List[LLMBackend]:
+    """
+    Build backends from settings.
+    
+    `llm_backends` is a comma-separated list of `name=provider:model@base_url`
+    entries (base_url optional), e.g.
+    `local=ollama:llama3@http://localhost:11434,gpu=ollama:llama3@http://gpu-box:11434`.
+    When empty, a single backend is built from `llm_provider`.
+    """
+    if not settings.llm_backends.strip():
+        model = settings.openai_model if settings.llm_provider == "openai" else settings.ollama_model
+        return [LLMBackend(settings.llm_provider, settings.llm_provider, model)]
+    
+    backends = []
+    for entry in settings.llm_backends.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, target = entry.partition("=")
+        target, _, base_url = target.partition("@")
+        provider, _, model = target.partition(":")
+        if not (name and provider and model):
+            raise ValueError(f"Invalid LLM backend '{entry}', expected name=provider:model@base_url")
+        backends.append(LLMBackend(name.strip(), provider.strip(), model.strip(), base_url.strip() or None))
+    return backends
 
 
+class LLMClient:
+    """
+    Unified LLM client supporting multiple providers.
+    
+    Holds one or more backends and routes each call to the backend with the
+    best rolling p95 latency (penalized by error rate) for the calling agent,
+    falling back to the next backend on failure. Async calls can optionally be
+    hedged: if the first backend has not answered within `llm_hedge_after_ms`,
+    a duplicate request goes to the next backend and the first answer wins.
+    """
+    
+    def __init__(self):
+        self.backends = _parse_backends()
+        self.provider = self.backends[0].provider
+    
+    @property
+    def llm(self):
+        """Chat model of the primary backend."""
+        return self.backends[0].llm
+    
+    def warm_up(self) -> None:
+        """Create every backend's chat model now rather than on first use."""
+        for backend in self.backends:
+            backend.llm
+    
+    def _ranked(self, agent: str = None) -> List[LLMBackend]:
+        """Backends ordered best first (stable, so config order breaks ties)."""
+        return sorted(self.backends, key=lambda b: b.score(agent))
+    
+    def invoke(
+        self,
+        messages: List[BaseMessage],
+        agent: str = None,
+        **kwargs
+    ) -> str:
+        """Invoke LLM with messages."""
+        log_prompt_size(messages, agent)
+        last_error = None
+        for backend in self._ranked(agent):
+            start = time.perf_counter()
+            try:
+                with span(f"llm.{agent or 'unknown'}", backend=backend.name):
+                    content = backend.invoke(messages, **kwargs)
+            except Exception as e:
+                backend.observe((time.perf_counter() - start) * 1000, False, agent)
+                last_error = e
+                continue
+            backend.observe((time.perf_counter() - start) * 1000, True, agent)
+            return content
+        raise last_error
+    
+    def stream(self, messages: List[BaseMessage], agent: str = None) -> Iterator:
+        """Stream LLM responses, falling back to the next backend if nothing was received."""
+        log_prompt_size(messages, agent)
+        last_error = None
+        for backend in self._ranked(agent):
+            start = time.perf_counter()
+            received = False
+            try:
+                for chunk in backend.stream(messages):
+                    received = True
+                    yield chunk
+            except Exception as e:
+                backend.observe((time.perf_counter() - start) * 1000, False, agent)
+                record_span(f"llm.{agent or 'unknown'}", start, backend=backend.name, error=type(e).__name__)
+                if received:
+                    raise
+                last_error = e
+                continue
+            backend.observe((time.perf_counter() - start) * 1000, True, agent)
+            record_span(f"llm.{agent or 'unknown'}", start, backend=backend.name)
+            return
+        raise last_error
+    
+    async def _timed(self, backend: LLMBackend, messages: List[BaseMessage], timeout: float, agent: str) -> str:
+        """Call a backend and record its latency and outcome."""
+        start = time.perf_counter()
+        try:
+            with span(f"llm.{agent or 'unknown'}", backend=backend.name):
+                content = await backend.ainvoke(messages, timeout)
+        except asyncio.CancelledError:
+            raise  # Lost a hedge race; not a backend error
+        except Exception:
+            backend.observe((time.perf_counter() - start) * 1000, False, agent)
+            raise
+        backend.observe((time.perf_counter() - start) * 1000, True, agent)
+        return content
+    
+    async def ainvoke(
+        self,
+        messages: List[BaseMessage],
+        timeout: float = None,
+        agent: str = None
+    ) -> str:
+        """Invoke LLM asynchronously with routing, fallback and optional hedging."""
+        log_prompt_size(messages, agent)
+        ranked = self._ranked(agent)
+        hedge_after = settings.llm_hedge_after_ms / 1000
+        last_error = None
+        
+        while ranked:
+            primary = ranked.pop(0)
+            pending = {asyncio.ensure_future(self._timed(primary, messages, timeout, agent))}
+            if hedge_after > 0 and ranked:
+                done, _ = await asyncio.wait(pending, timeout=hedge_after)
+                if not done:
+                    hedge = ranked.pop(0)
+                    metrics.incr(f"llm.{hedge.name}.hedged")
+                    pending.add(asyncio.ensure_future(self._timed(hedge, messages, timeout, agent)))
+            
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        for other in pending:
+                            other.cancel()
+                        return task.result()
+                    last_error = task.exception()
+        raise last_error
+    
+    async def astream(
+        self,
+        messages: List[BaseMessage],
+        timeout: float = None,
+        agent: str = None
+    ) -> AsyncIterator[str]:
+        """Stream LLM response text asynchronously, falling back before the first token."""
+        log_prompt_size(messages, agent)
+        last_error = None
+        for backend in self._ranked(agent):
+            start = time.perf_counter()
+            received = False
+            try:
+                async for text in backend.astream(messages, timeout):
+                    received = True
+                    yield text
+            except Exception as e:
+                backend.observe((time.perf_counter() - start) * 1000, False, agent)
+                record_span(f"llm.{agent or 'unknown'}", start, backend=backend.name, error=type(e).__name__)
+                if received:
+                    raise
+                last_error = e
+                continue
+            backend.observe((time.perf_counter() - start) * 1000, True, agent)
+            record_span(f"llm.{agent or 'unknown'}", start, backend=backend.name)
+            return
+        raise last_error
+    
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Rolling latency and error stats per backend."""
+        return {backend.name: backend.stats() for backend in self.backends}
+    
+    async def aclose(self) -> None:
+        """Close the shared HTTP connection pool."""
+        global _http_client
+        if _http_client is not None:
+            await _http_client.aclose()
+            _http_client = None
 
 
+# Singleton instance
+llm_client = LLMClient()
@@ -1,11 +1,25 @@
 """FastAPI main application."""
-from fastapi import FastAPI, Depends, HTTPException, Header
+from fastapi import FastAPI, Depends, HTTPException, Header, Query, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
-from auth import verify_token, get_tenant_id_from_token, dev_login
-from graph import graph, GraphState
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Literal
+from auth import verify_token, get_tenant_id_from_claims, dev_login
+from graph import get_graph, GraphState, stream_graph
+from jobs import job_runner, JobQueueFull, FINISHED
+from result_store import result_store
+from response_format import paginate, compact_result, reference_chart_data, negotiate, encode_response
+from session_store import session_store, make_session_key
+from llm_client import llm_client
+from metrics import metrics
+from prewarm import prewarmer
+from profiling import profiler
+from query_scheduler import query_scheduler, QueueTimeout
+from tracing import start_trace, span, exporter
+from warmup import warmup
 from config import settings
+import asyncio
+import json
 
 app = FastAPI(title="Health Intelligence Platform", version="1.0.0")
 
@@ -28,6 +42,9 @@ app.add_middleware(
 # Request/Response models
 class ChatRequest(BaseModel):
     message: str
+    result_format: Literal["rows", "columnar"] = "rows"  # "columnar": one value array per column
+    chart_data: Literal["inline", "reference"] = "inline"  # "reference": charts use the named dataset "query_results"
+    page_size: Optional[int] = Field(None, ge=1)  # Rows of query_results to return; fetch the rest from /api/results/{handle}
 
 
 class ChartSpec(BaseModel):
@@ -40,6 +57,36 @@ class ChatResponse(BaseModel):
     charts: Optional[List[ChartSpec]] = None
     sql_used: Optional[str] = None
     query_results: Optional[Dict[str, Any]] = None
+    result_handle: Optional[str] = None  # For /api/results/{handle} and follow-up questions
+    next_cursor: Optional[str] = None  # Set when query_results is paginated and more rows remain
+
+
+class BatchChatRequest(BaseModel):
+    messages: List[str] = Field(..., min_length=1)  # Independent questions, e.g. one per dashboard tile
+    result_format: Literal["rows", "columnar"] = "rows"
+    chart_data: Literal["inline", "reference"] = "inline"
+    page_size: Optional[int] = Field(None, ge=1)
+
+
+class BatchChatItem(BaseModel):
+    index: int  # Position of the question in messages
+    response: Optional[ChatResponse] = None
+    error: Optional[str] = None
+
+
+class BatchChatResponse(BaseModel):
+    results: List[BatchChatItem]
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str  # "queued", "running", "succeeded" or "failed"
+    stage: Optional[str] = None  # Last graph stage reached while running (intent, sql, results, ...)
+    question: str
+    created_at: float
+    updated_at: float
+    result: Optional[ChatResponse] = None  # Set when succeeded
+    error: Optional[str] = None  # Set when failed
 
 
 class LoginRequest(BaseModel):
@@ -58,106 +105,494 @@ class MeResponse(BaseModel):
     username: str
 
 
-# Session storage (in production, use Redis or database)
-sessions: Dict[str, List[Dict[str, str]]] = {}
-
-
-def get_tenant_id(authorization: Optional[str] = Header(None)) -> str:
-    """Extract tenant_id from JWT token."""
+def get_claims(authorization: Optional[str] = Header(None)) -> Dict[str, Any]:
+    """
+    Verified claims of the request's bearer token.
+    
+    FastAPI resolves a dependency once per request, so endpoints and other
+    dependencies that need the claims share this result.
+    """
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing authorization")
     
     token = authorization.replace("Bearer ", "")
-    return get_tenant_id_from_token(token)
+    return verify_token(token)
+
+
+def get_tenant_id(claims: Dict[str, Any] = Depends(get_claims)) -> str:
+    """Extract tenant_id from JWT token."""
+    return get_tenant_id_from_claims(claims)
 
 
 @app.post("/api/auth/login", response_model=LoginResponse)
-def login(request: LoginRequest):
-    """Dev login: username = tenant_id."""
-    return dev_login(request.username)
+async def login(request: LoginRequest):
+    """
+    Dev login: username = tenant_id.
+    
+    Also starts prewarming the tenant's standard dashboard queries in the
+    background, so the first dashboard load finds them cached.
+    """
+    login_response = dev_login(request.username)
+    prewarmer.trigger(login_response["tenant_id"])
+    return login_response
 
 
 @app.get("/api/me", response_model=MeResponse)
-def get_me(tenant_id: str = Depends(get_tenant_id), authorization: Optional[str] = Header(None)):
+def get_me(tenant_id: str = Depends(get_tenant_id), claims: Dict[str, Any] = Depends(get_claims)):
     """Get current user info."""
-    token = authorization.replace("Bearer ", "")
-    payload = verify_token(token)
-    
     return MeResponse(
         tenant_id=tenant_id,
-        username=payload.get("username", "unknown")
+        username=claims.get("username", "unknown")
     )
 
 
-@app.post("/api/chat", response_model=ChatResponse)
-def chat(
-    request: ChatRequest,
-    tenant_id: str = Depends(get_tenant_id),
-    authorization: Optional[str] = Header(None)
-):
-    """
-    Chat endpoint for health data queries.
-    
-    Returns natural language answer, optional charts, and SQL used.
-    """
-    # Get conversation history
-    session_key = f"{tenant_id}:{authorization}"
-    conversation_history = sessions.get(session_key, [])
-    
-    # Limit history to last 10 messages
-    if len(conversation_history) > 10:
-        conversation_history = conversation_history[-10:]
-    
-    # Initialize state
-    initial_state: GraphState = {
-        "user_question": request.message,
+def _load_history(session_key: str) -> List[Dict[str, str]]:
+    """Get conversation history for a session, limited to the last session_max_turns turns."""
+    return session_store.history(session_key)
+
+
+def _initial_state(message: str, tenant_id: str, conversation_history: List[Dict[str, str]]) -> GraphState:
+    """Initialize graph state for a chat message."""
+    return {
+        "user_question": message,
         "tenant_id": tenant_id,
         "conversation_history": conversation_history,
         "intent": None,
         "sql_queries": [],
+        "sql_plan": [],
         "query_results": None,
         "chart_specs": [],
         "anomalies": [],
         "final_answer": "",
-        "sql_used": None
+        "sql_used": None,
+        "spans": []
     }
+
+
+def _save_turn(session_key: str, message: str, final_state: GraphState) -> Optional[str]:
+    """
+    Append a completed turn to the session's conversation history.
     
-    # Run graph
-    try:
-        final_state = graph.invoke(initial_state)
-    except Exception as e:
-        # Include SQL in error for debugging
-        error_detail = str(e)
-        if hasattr(e, 'sql_used'):
-            error_detail += f"\n\nSQL used: {e.sql_used}"
-        elif 'sql_used' in locals():
-            error_detail += f"\n\nSQL used: {sql_used}"
-        raise HTTPException(status_code=500, detail=f"Error processing query: {error_detail}")
-    
-    # Update conversation history
-    conversation_history.append({
-        "user": request.message,
+    The turn keeps its SQL and a handle to its result so follow-up questions
+    can refine the result without querying Athena again. Returns the handle.
+    """
+    turn = {
+        "user": message,
         "assistant": final_state.get("final_answer", "")
-    })
-    sessions[session_key] = conversation_history
+    }
+    if final_state.get("query_results"):
+        turn["sql"] = final_state.get("sql_used")
+        turn["result"] = result_store.put(final_state["tenant_id"], final_state["query_results"])
+    session_store.append(session_key, turn)
+    return turn.get("result")
+
+
+def _chat_response(request, final_state: GraphState, result_handle: Optional[str]):
+    """
+    Build the ChatResponse for a final state with the request's format options; also returns the page of rows.
+    
+    Chart data only references query_results when that field holds every
+    row as row objects; paginated or columnar responses keep it inline.
+    """
+    query_results = final_state.get("query_results")
+    page, next_cursor = paginate(query_results, None, request.page_size) if query_results else (None, None)
     
-    # Build response
     charts = None
     if final_state.get("chart_specs"):
+        chart_specs = final_state["chart_specs"]
+        if request.chart_data == "reference" and request.result_format == "rows" and next_cursor is None:
+            chart_specs = reference_chart_data(chart_specs, query_results)
         charts = [
-            ChartSpec(**spec) for spec in final_state["chart_specs"]
+            ChartSpec(**spec) for spec in chart_specs
         ]
     
-    return ChatResponse(
+    chat_response = ChatResponse(
         answer=final_state.get("final_answer", "No response generated."),
         charts=charts,
         sql_used=final_state.get("sql_used"),
-        query_results=final_state.get("query_results")
+        query_results=compact_result(page, request.result_format) if page else None,
+        result_handle=result_handle,
+        next_cursor=next_cursor
+    )
+    return chat_response, page
+
+
+def _error_detail(e: Exception) -> str:
+    """Format a graph error, including SQL for debugging."""
+    error_detail = str(e)
+    if hasattr(e, 'sql_used'):
+        error_detail += f"\n\nSQL used: {e.sql_used}"
+    return error_detail
+
+
+@app.post("/api/chat", response_model=ChatResponse)
+async def chat(
+    request: ChatRequest,
+    response: Response,
+    tenant_id: str = Depends(get_tenant_id),
+    authorization: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None),
+    x_profile_token: Optional[str] = Header(None)
+):
+    """
+    Chat endpoint for health data queries.
+    
+    Returns natural language answer, optional charts, and SQL used. Per-stage
+    timings (graph nodes, LLM calls, cache, Athena) are returned in the
+    Server-Timing header.
+    
+    Large results can be returned compactly: columnar rows, chart data as a
+    reference to query_results instead of a second copy, the first page_size
+    rows only, and msgpack or Arrow IPC bodies (Accept header).
+    
+    The graph run is profiled when X-Profile-Token carries the profiling
+    admin token (or the request is sampled); X-Profile-Id then names the
+    profile under /api/profiles.
+    """
+    trace = start_trace("chat")
+    
+    # Get conversation history
+    session_key = make_session_key(tenant_id, authorization)
+    conversation_history = _load_history(session_key)
+    
+    # Initialize state
+    initial_state = _initial_state(request.message, tenant_id, conversation_history)
+    
+    # Run graph
+    try:
+        with profiler.profile(trace.trace_id, tenant_id, "/api/chat", x_profile_token) as profile_id:
+            if profile_id:
+                response.headers["X-Profile-Id"] = profile_id
+            with span("graph"):
+                final_state = await get_graph().ainvoke(initial_state)
+    except Exception as e:
+        exporter.export(trace)
+        if isinstance(e, QueueTimeout) or isinstance(e.__cause__, QueueTimeout):
+            raise HTTPException(status_code=503, detail=str(e.__cause__ or e), headers={"Retry-After": "30"})
+        # Include SQL in error for debugging
+        raise HTTPException(status_code=500, detail=f"Error processing query: {_error_detail(e)}")
+    
+    response.headers["Server-Timing"] = trace.server_timing()
+    exporter.export(trace)
+    
+    # Update conversation history
+    result_handle = _save_turn(session_key, request.message, final_state)
+    
+    chat_response, page = _chat_response(request, final_state, result_handle)
+    if negotiate(accept) != "json":
+        return encode_response(
+            chat_response.dict(),
+            accept,
+            table=page,
+            table_key="query_results",
+            headers={name: value for name, value in response.headers.items() if name in ("server-timing", "x-profile-id")}
+        )
+    return chat_response
+
+
+def _batch_tasks(request: BatchChatRequest, tenant_id: str, authorization: Optional[str]) -> List[asyncio.Task]:
+    """
+    One task per batch question, each resolving to a BatchChatItem.
+    
+    The session is loaded once and every question sees the same history.
+    Batch questions are independent (dashboard tiles), so they are not added
+    to the conversation; their results are still stored for /api/results.
+    At most batch_parallelism graphs run at once. The query cache and
+    in-flight Athena executions are shared, so tiles asking for the same
+    data run one query.
+    """
+    conversation_history = _load_history(make_session_key(tenant_id, authorization))
+    semaphore = asyncio.Semaphore(settings.batch_parallelism)
+    
+    async def answer(index: int, message: str) -> BatchChatItem:
+        async with semaphore:
+            try:
+                with span("graph", index=index):
+                    final_state = await get_graph().ainvoke(_initial_state(message, tenant_id, conversation_history))
+            except Exception as e:
+                metrics.incr("chat.batch.errors")
+                return BatchChatItem(index=index, error=f"Error processing query: {_error_detail(e)}")
+        result_handle = None
+        if final_state.get("query_results"):
+            result_handle = result_store.put(tenant_id, final_state["query_results"])
+        chat_response, _ = _chat_response(request, final_state, result_handle)
+        return BatchChatItem(index=index, response=chat_response)
+    
+    return [asyncio.create_task(answer(i, message)) for i, message in enumerate(request.messages)]
+
+
+def _check_batch(request: BatchChatRequest) -> None:
+    if len(request.messages) > settings.batch_max_questions:
+        raise HTTPException(status_code=400, detail=f"At most {settings.batch_max_questions} questions per batch")
+
+
+@app.post("/api/chat/batch", response_model=BatchChatResponse)
+async def chat_batch(
+    request: BatchChatRequest,
+    response: Response,
+    tenant_id: str = Depends(get_tenant_id),
+    authorization: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None)
+):
+    """
+    Answer several independent questions (e.g. dashboard tiles) in one request.
+    
+    The graphs run concurrently; results are returned in question order, with
+    a per-question error instead of failing the whole batch. Use
+    /api/chat/batch/stream to receive each answer as soon as it is ready.
+    """
+    _check_batch(request)
+    trace = start_trace("chat.batch")
+    tasks = _batch_tasks(request, tenant_id, authorization)
+    try:
+        items = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        exporter.export(trace)
+    
+    response.headers["Server-Timing"] = trace.server_timing()
+    batch_response = BatchChatResponse(results=list(items))
+    if negotiate(accept) != "json":
+        return encode_response(batch_response.dict(), accept, headers={"Server-Timing": response.headers["Server-Timing"]})
+    return batch_response
+
+
+@app.post("/api/chat/batch/stream")
+async def chat_batch_stream(
+    request: BatchChatRequest,
+    tenant_id: str = Depends(get_tenant_id),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Streaming batch endpoint (Server-Sent Events).
+    
+    Emits an `answer` event ({index, response} or {index, error}) as each
+    question completes, in completion order, then a `done` event.
+    """
+    _check_batch(request)
+    
+    async def event_stream():
+        trace = start_trace("chat.batch.stream")
+        tasks = _batch_tasks(request, tenant_id, authorization)
+        try:
+            for completed in asyncio.as_completed(tasks):
+                item = await completed
+                yield _sse("answer", item.dict())
+            yield _sse("done", {"count": len(tasks)})
+        finally:
+            # Client went away: stop the questions still running
+            for task in tasks:
+                task.cancel()
+            exporter.export(trace)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+def _job_response(job: Dict[str, Any]) -> JobResponse:
+    return JobResponse(**{k: v for k, v in job.items() if k in JobResponse.model_fields})
+
+
+@app.post("/api/jobs", response_model=JobResponse, status_code=202)
+async def submit_job(
+    request: ChatRequest,
+    tenant_id: str = Depends(get_tenant_id),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Submit a chat question as a background job.
+    
+    Returns the job right away; get the answer by polling /api/jobs/{job_id}
+    or over the /api/jobs/{job_id}/ws WebSocket. The answer is the
+    /api/chat response for the same request, and the turn is added to the
+    conversation like a /api/chat turn.
+    
+    Job records are shared between worker processes through Redis. Without
+    Redis only the process that accepted the job knows it, so run a single
+    worker process then.
+    """
+    session_key = make_session_key(tenant_id, authorization)
+    
+    async def work(on_stage):
+        trace = start_trace("job")
+        initial_state = _initial_state(request.message, tenant_id, _load_history(session_key))
+        final_state = None
+        try:
+            async for event, payload in stream_graph(initial_state):
+                if event == "done":
+                    final_state = payload
+                elif event != "token":
+                    on_stage(event)
+        finally:
+            exporter.export(trace)
+        result_handle = _save_turn(session_key, request.message, final_state)
+        chat_response, _ = _chat_response(request, final_state, result_handle)
+        return chat_response.dict()
+    
+    try:
+        job = job_runner.submit(tenant_id, request.message, work)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Too many jobs waiting: {e}", headers={"Retry-After": "30"})
+    return _job_response(job)
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse)
+def get_job(job_id: str, tenant_id: str = Depends(get_tenant_id)):
+    """Status of a job, with its result once it has succeeded."""
+    job = job_runner.get(tenant_id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return _job_response(job)
+
+
+@app.websocket("/api/jobs/{job_id}/ws")
+async def job_updates(websocket: WebSocket, job_id: str, token: Optional[str] = None):
+    """
+    Push a job's record on every change until it finishes, then close.
+    
+    Browsers cannot set headers on WebSockets, so the bearer token may be
+    passed as the `token` query parameter instead of the Authorization header.
+    """
+    authorization = websocket.headers.get("authorization") or (f"Bearer {token}" if token else None)
+    try:
+        tenant_id = get_tenant_id(get_claims(authorization))
+    except HTTPException:
+        await websocket.close(code=1008)  # Policy violation
+        return
+    
+    await websocket.accept()
+    last_update = None
+    try:
+        while True:
+            job = job_runner.get(tenant_id, job_id)
+            if job is None:
+                await websocket.close(code=4404)
+                return
+            if job["updated_at"] != last_update:
+                last_update = job["updated_at"]
+                await websocket.send_text(json.dumps(_job_response(job).dict(), default=str))
+            if job["status"] in FINISHED:
+                await websocket.close()
+                return
+            await job_runner.wait_for_change(job_id)
+    except WebSocketDisconnect:
+        pass
+
+
+@app.get("/api/results/{handle}")
+def get_result(
+    handle: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.result_page_size, ge=1, le=10000),
+    result_format: Literal["rows", "columnar"] = "rows",
+    tenant_id: str = Depends(get_tenant_id),
+    accept: Optional[str] = Header(None)
+):
+    """
+    Page through a stored chat result (result_handle of /api/chat).
+    
+    Returns up to `limit` rows from `cursor` and the next_cursor (null on the
+    last page), as JSON, msgpack or Arrow IPC depending on the Accept header.
+    """
+    result = result_store.get(tenant_id, handle)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Result not found or expired")
+    
+    try:
+        page, next_cursor = paginate(result, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    return encode_response({**compact_result(page, result_format), "next_cursor": next_cursor}, accept, table=page)
+
+
+def require_profiling_admin(x_profile_token: Optional[str] = Header(None)) -> None:
+    """Allow only requests carrying the profiling admin token."""
+    if not profiler.is_admin(x_profile_token):
+        raise HTTPException(status_code=403, detail="Profiling admin token required")
+
+
+@app.get("/api/profiles", dependencies=[Depends(require_profiling_admin)])
+def list_profiles():
+    """Recent chat profiles of this worker process, newest first."""
+    return {"profiles": profiler.recent()}
+
+
+@app.get("/api/profiles/{profile_id}", dependencies=[Depends(require_profiling_admin)])
+def download_profile(profile_id: str, format: Literal["raw", "text"] = "raw"):
+    """
+    Download a profile.
+    
+    cProfile profiles are pstats files (`python -m pstats`, snakeviz), or a
+    report of the top functions with format=text; sampled profiles are
+    folded stacks for flame graph tools.
+    """
+    artifact = profiler.artifact(profile_id, text=format == "text")
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Profile not found or evicted")
+    body, media_type, filename = artifact
+    return Response(body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+def _sse(event: str, data: Any) -> str:
+    """Format a Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    tenant_id: str = Depends(get_tenant_id),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Streaming chat endpoint (Server-Sent Events).
+    
+    Emits `intent`, `sql`, `results`, `chart`/`anomalies` events as each stage
+    finishes, then the answer as `token` events, and finally a `done` event with
+    the full answer. Failures are reported as an `error` event.
+    """
+    session_key = make_session_key(tenant_id, authorization)
+    conversation_history = _load_history(session_key)
+    initial_state = _initial_state(request.message, tenant_id, conversation_history)
+    
+    async def event_stream():
+        # Streamed responses send headers first, so spans are only exported (no Server-Timing)
+        trace = start_trace("chat.stream")
+        try:
+            async for event, payload in stream_graph(initial_state):
+                if event == "done":
+                    _save_turn(session_key, request.message, payload)
+                    yield _sse("done", {
+                        "answer": payload.get("final_answer") or "No response generated.",
+                        "sql_used": payload.get("sql_used")
+                    })
+                else:
+                    yield _sse(event, payload)
+        except Exception as e:
+            yield _sse("error", {"detail": f"Error processing query: {_error_detail(e)}"})
+        finally:
+            exporter.export(trace)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable proxy buffering (nginx)
+        }
     )
 
 
 @app.post("/api/chat/explain-chart")
-def explain_chart(
+async def explain_chart(
     chart_spec: ChartSpec,
     summary: str,
     tenant_id: str = Depends(get_tenant_id)
@@ -167,9 +602,9 @@ def explain_chart(
     
     Takes chart spec and summary, returns explanation.
     """
-    from agents.coach_agent import generate_coach_response
+    from agents.coach_agent import agenerate_coach_response
     
-    explanation = generate_coach_response(
+    explanation = await agenerate_coach_response(
         f"Explain this chart: {summary}",
         {},  # No query results needed
         chart_spec.dict()
@@ -188,9 +623,43 @@ def health():
         "status": "healthy",
         "service": "health-intelligence-backend",
         "aws_region": settings.aws_region,
-        "athena_database": settings.athena_database
+        "athena_database": settings.athena_database,
+        "warm": warmup.done
     }
 
+@app.get("/api/metrics")
+def get_metrics():
+    """In-process metrics (LLM queue wait and generation time, Athena queue depth, etc.)."""
+    return {
+        **metrics.snapshot(),
+        "llm_backends": llm_client.stats(),
+        "athena_scheduler": query_scheduler.stats(),
+        "prewarm": prewarmer.stats(),
+        "warmup": warmup.status()
+    }
+
+
+@app.on_event("startup")
+async def startup():
+    """
+    Warm up the lazily initialized components in a worker thread.
+    
+    Startup does not wait for it, so /health answers as soon as the app is
+    imported; requests arriving earlier initialize what they need themselves.
+    """
+    if settings.warmup_on_startup:
+        app.state.warmup_task = asyncio.create_task(asyncio.to_thread(warmup.run))
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close shared connection pools."""
+    await llm_client.aclose()
+    await exporter.aclose()
+    await prewarmer.aclose()
+    await job_runner.aclose()
+
+
 @app.get("/")
 def root():
     """Root endpoint."""
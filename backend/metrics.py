@@ -0,0 +1,99 @@
+"""In-process metrics registry (histograms, counters and gauges)."""
+import threading
+from collections import deque
+from typing import Dict, Any
+
+
+# Histogram bucket upper bounds in milliseconds
+DEFAULT_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class Histogram:
+    """Cumulative bucketed histogram that also keeps recent samples for percentiles."""
+    
+    def __init__(self, buckets=DEFAULT_BUCKETS, window: int = 1024):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)  # Last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+    
+    def observe(self, value: float) -> None:
+        """Record a value."""
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                return
+        self.bucket_counts[-1] += 1
+    
+    def percentile(self, q: float) -> float:
+        """Percentile (0-100) over the recent window."""
+        if not self.recent:
+            return 0.0
+        values = sorted(self.recent)
+        index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+        return values[index]
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Serializable view of the histogram."""
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 3),
+            'p50': round(self.percentile(50), 3),
+            'p95': round(self.percentile(95), 3),
+            'p99': round(self.percentile(99), 3),
+            'buckets': {
+                **{str(bound): count for bound, count in zip(self.buckets, self.bucket_counts)},
+                '+Inf': self.bucket_counts[-1]
+            }
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe registry of named histograms, counters and gauges."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+    
+    def observe(self, name: str, value: float) -> None:
+        """Record a value (typically a duration in ms) in a histogram."""
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram()
+            self._histograms[name].observe(value)
+    
+    def incr(self, name: str, value: float = 1) -> None:
+        """Increment a counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+    
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to its current value."""
+        with self._lock:
+            self._gauges[name] = value
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Serializable view of all metrics."""
+        with self._lock:
+            return {
+                'histograms': {name: h.snapshot() for name, h in self._histograms.items()},
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges)
+            }
+    
+    def reset(self) -> None:
+        """Clear all metrics."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+
+# Singleton instance
+metrics = MetricsRegistry()
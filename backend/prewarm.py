@@ -0,0 +1,134 @@
+"""Background prewarming of each tenant's standard dashboard queries."""
+import asyncio
+import logging
+import re
+import time
+from typing import Dict, List, Any, Optional
+from agents.data_agent import aexecute_query
+from agents.anomaly_agent import build_precomputed_anomaly_sql
+from config import settings
+from metrics import metrics
+from query_scheduler import query_priority, BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+DAILY_FEATURES_SQL = """SELECT day, steps_total, distance_km_total, active_kcal_total, basal_kcal_total, flights_total, hr_avg, hr_max, hr_min
+FROM health_data_lake.gold_daily_features
+WHERE tenant_id = '${{tenant_id}}'
+  AND dt >= DATE_FORMAT(DATE_ADD('day', -{days}, CURRENT_DATE), '%Y-%m-%d')
+ORDER BY day DESC"""
+
+WEEKLY_FEATURES_SQL = """SELECT week_start, steps_week, distance_km_week, active_kcal_week, basal_kcal_week, flights_week, hr_avg_week, hr_max_week, hr_min_week
+FROM health_data_lake.gold_weekly_features
+WHERE tenant_id = '${{tenant_id}}'
+  AND week_start >= DATE_FORMAT(DATE_ADD('week', -{weeks}, CURRENT_DATE), '%Y-%m-%d')
+ORDER BY week_start DESC"""
+
+# Standard queries by name (tenant as ${tenant_id}); settings.prewarm_queries picks the ones to run
+STANDARD_QUERIES = {
+    'daily_7': DAILY_FEATURES_SQL.format(days=7),
+    'daily_30': DAILY_FEATURES_SQL.format(days=30),
+    'weekly_12': WEEKLY_FEATURES_SQL.format(weeks=12),
+    'anomalies': build_precomputed_anomaly_sql(""),  # What an anomaly question without a period or metric reads
+}
+
+# Dashboard tile questions answered with a standard query instead of LLM-written SQL, so
+# the tile runs exactly the SQL prewarmed at login (matched after lowercasing, collapsing
+# whitespace and dropping trailing punctuation). Anomaly questions already read the
+# 'anomalies' SQL through the fast path. Keep in step with SUGGESTED_QUESTIONS in
+# frontend/components/ChatPage.tsx.
+TILE_QUESTIONS = {
+    'show my daily activity for the last 7 days': 'daily_7',
+    'show my daily activity for the last 30 days': 'daily_30',
+    'show my weekly activity for the last 12 weeks': 'weekly_12',
+    'summarize my last 30 days': 'daily_30',
+    'give me a weekly health briefing': 'weekly_12',
+}
+
+
+def standard_query_for(user_question: str) -> Optional[str]:
+    """SQL (tenant as ${tenant_id}) of the standard query a tile question asks for, or None."""
+    normalized = re.sub(r'\s+', ' ', user_question.lower()).strip().rstrip('?.!').strip()
+    name = TILE_QUESTIONS.get(normalized)
+    return STANDARD_QUERIES[name] if name else None
+
+
+def prewarm_queries() -> List[str]:
+    """SQL of the configured standard queries; unknown names are skipped."""
+    names = [name.strip() for name in settings.prewarm_queries.split(",") if name.strip()]
+    unknown = [name for name in names if name not in STANDARD_QUERIES]
+    if unknown:
+        logger.warning(f"Unknown prewarm queries ignored: {', '.join(unknown)}")
+    return [STANDARD_QUERIES[name] for name in names if name in STANDARD_QUERIES]
+
+
+class Prewarmer:
+    """
+    Fills the query cache with a tenant's standard queries after login.
+    
+    Prewarming is best effort: a login is skipped if the tenant is already
+    being prewarmed, was prewarmed less than prewarm_min_interval_seconds
+    ago, or prewarm_max_tenants tenants are prewarming. Queries run at
+    background priority, so they never hold back interactive chat, and go
+    through the query cache, so results that are still cached cost nothing.
+    """
+    
+    def __init__(self):
+        self._running: Dict[str, asyncio.Task] = {}
+        self._last_started: Dict[str, float] = {}
+    
+    def trigger(self, tenant_id: str) -> bool:
+        """Start prewarming a tenant in the background (call from the event loop); False if skipped."""
+        queries = prewarm_queries()
+        if not settings.prewarm_enabled or not queries:
+            return False
+        if tenant_id in self._running:
+            metrics.incr("prewarm.deduplicated")
+            return False
+        now = time.monotonic()
+        if now - self._last_started.get(tenant_id, float("-inf")) < settings.prewarm_min_interval_seconds:
+            metrics.incr("prewarm.rate_limited")
+            return False
+        if len(self._running) >= settings.prewarm_max_tenants:
+            metrics.incr("prewarm.busy")
+            return False
+        
+        self._forget_before(now - settings.prewarm_min_interval_seconds)
+        self._last_started[tenant_id] = now
+        task = asyncio.get_running_loop().create_task(self._run(tenant_id, queries))
+        self._running[tenant_id] = task
+        task.add_done_callback(lambda _: self._running.pop(tenant_id, None))
+        return True
+    
+    def _forget_before(self, cutoff: float) -> None:
+        """Drop start times old enough not to rate-limit anymore."""
+        for tenant_id in [t for t, started in self._last_started.items() if started < cutoff]:
+            del self._last_started[tenant_id]
+    
+    async def _run(self, tenant_id: str, queries: List[str]) -> None:
+        start = time.perf_counter()
+        with query_priority(BACKGROUND):
+            outcomes = await asyncio.gather(
+                *(aexecute_query(sql.replace("${tenant_id}", tenant_id), tenant_id) for sql in queries),
+                return_exceptions=True
+            )
+        failures = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+        for failure in failures:
+            logger.warning(f"Prewarm query failed for tenant {tenant_id}: {failure}")
+        metrics.incr("prewarm.queries", len(outcomes) - len(failures))
+        metrics.incr("prewarm.failures", len(failures))
+        metrics.observe("prewarm.duration_ms", (time.perf_counter() - start) * 1000)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {'running': len(self._running), 'queries': len(prewarm_queries())}
+    
+    async def aclose(self) -> None:
+        """Cancel prewarms still running (shutdown)."""
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Singleton instance
+prewarmer = Prewarmer()
@@ -0,0 +1,179 @@
+"""Opt-in CPU profiling of individual chat requests."""
+import cProfile
+import hmac
+import io
+import marshal
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict, Counter
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Tuple
+from config import settings
+from metrics import metrics
+
+# Profiling modes
+CPROFILE = "cprofile"
+SAMPLE = "sample"
+
+
+class StackSampler:
+    """
+    Records every thread's Python stack each interval from a background thread.
+    
+    Unlike cProfile this sees worker threads too (boto3 calls and result
+    parsing run in asyncio.to_thread), at the cost of only statistical counts.
+    """
+    
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+    
+    def start(self) -> None:
+        self._thread.start()
+    
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+    
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.counts[(names.get(ident, str(ident)),) + tuple(reversed(stack))] += 1
+    
+    def folded(self) -> str:
+        """Samples in folded-stack format (flamegraph.pl, speedscope): "thread;outer;...;inner count"."""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.counts.most_common())
+
+
+class Profiler:
+    """
+    Profiles the graph run of selected chat requests and keeps the most recent profiles.
+    
+    A chat is profiled when it sends X-Profile-Token with the configured admin
+    token, or at random with probability profiling_sample_rate. One request
+    is profiled at a time per process; others that would be are skipped
+    (profiling.skipped), since a second cProfile would replace the first.
+    
+    Both modes record the whole process while the request runs, so
+    concurrent requests show up in a profile too; profile on a quiet worker
+    for clean results. In "cprofile" mode only the event loop thread is
+    profiled (graph nodes, SQL cleaning, response building); "sample" mode
+    also covers worker threads.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = False
+        self._profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    
+    def is_admin(self, token: Optional[str]) -> bool:
+        """Whether a X-Profile-Token header value matches the configured admin token."""
+        admin_token = settings.profiling_admin_token
+        return bool(admin_token and token) and hmac.compare_digest(token.encode(), admin_token.encode())
+    
+    def should_profile(self, token: Optional[str]) -> bool:
+        return self.is_admin(token) or random.random() < settings.profiling_sample_rate
+    
+    @contextmanager
+    def profile(self, request_id: str, tenant_id: str, path: str, token: Optional[str] = None):
+        """
+        Profile the enclosed block if this request is selected.
+        
+        Yields the profile id (the request id) if the block is being
+        profiled, otherwise None.
+        """
+        if not self.should_profile(token):
+            yield None
+            return
+        with self._lock:
+            busy = self._active
+            self._active = True
+        if busy:
+            metrics.incr("profiling.skipped")
+            yield None
+            return
+        
+        mode = settings.profiling_mode
+        start = time.perf_counter()
+        if mode == SAMPLE:
+            recorder = StackSampler(settings.profiling_sample_interval_ms / 1000)
+            recorder.start()
+        else:
+            recorder = cProfile.Profile()
+            recorder.enable()
+        try:
+            yield request_id
+        finally:
+            if mode == SAMPLE:
+                recorder.stop()
+            else:
+                recorder.disable()
+            duration_ms = (time.perf_counter() - start) * 1000
+            self._store({
+                'profile_id': request_id,
+                'tenant_id': tenant_id,
+                'path': path,
+                'mode': SAMPLE if mode == SAMPLE else CPROFILE,
+                'created_at': time.time(),
+                'duration_ms': round(duration_ms, 1),
+                'recorder': recorder
+            })
+            with self._lock:
+                self._active = False
+            metrics.incr("profiling.profiles")
+            metrics.observe("profiling.duration_ms", duration_ms)
+    
+    def _store(self, profile: Dict[str, Any]) -> None:
+        with self._lock:
+            self._profiles[profile['profile_id']] = profile
+            while len(self._profiles) > settings.profiling_max_profiles:
+                self._profiles.popitem(last=False)
+    
+    def recent(self) -> List[Dict[str, Any]]:
+        """Kept profiles, newest first (without their data)."""
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return [
+            {key: value for key, value in profile.items() if key != 'recorder'}
+            for profile in reversed(profiles)
+        ]
+    
+    def artifact(self, profile_id: str, text: bool = False) -> Optional[Tuple[bytes, str, str]]:
+        """
+        (body, media type, file name) of a profile, or None if it is not kept.
+        
+        cProfile profiles download in pstats format (`python -m pstats`,
+        snakeviz) or, with text=True, as a report of the top functions by
+        cumulative time. Sampled profiles are folded stacks.
+        """
+        with self._lock:
+            profile = self._profiles.get(profile_id)
+        if profile is None:
+            return None
+        recorder = profile['recorder']
+        if profile['mode'] == SAMPLE:
+            return recorder.folded().encode(), "text/plain", f"{profile_id}.folded"
+        recorder.create_stats()
+        if not text:
+            return marshal.dumps(recorder.stats), "application/octet-stream", f"{profile_id}.prof"
+        report = io.StringIO()
+        pstats.Stats(recorder, stream=report).sort_stats("cumulative").print_stats(50)
+        return report.getvalue().encode(), "text/plain", f"{profile_id}.txt"
+
+
+# Singleton instance
+profiler = Profiler()
@@ -0,0 +1,189 @@
+"""
+Token counting and budgeted prompt assembly for agent prompts.
+
+Counts are exact only for OpenAI models with the optional tiktoken package
+installed (`pip install tiktoken`, not in requirements.txt). Otherwise,
+including every Ollama model, they are estimated at ~4 characters per
+token, and the budget keeps prompt_estimate_margin of the window free to
+absorb the error.
+"""
+import logging
+import re
+from typing import List, Optional
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from config import settings
+from metrics import metrics
+
+try:
+    import tiktoken
+except ImportError:
+    # Optional: exact counts for OpenAI models; otherwise estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Per-message framing overhead used by chat templates (role markers etc.)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Placeholders in a build_messages template
+_PLACEHOLDER = re.compile(r"\{(question|data)\}")
+
+_encoding = None
+
+
+def _get_encoding():
+    """Tokenizer for the active model, or None to fall back to the estimate."""
+    global _encoding
+    if _encoding is None and tiktoken is not None and settings.llm_provider == "openai":
+        try:
+            _encoding = tiktoken.encoding_for_model(settings.openai_model)
+        except KeyError:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the active model's tokenizer (~4 chars/token when unavailable)."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(messages: List[BaseMessage]) -> int:
+    """Count prompt tokens for a list of chat messages."""
+    return sum(count_tokens(m.content) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens, keeping the beginning."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens]) + "..."
+    return text[:max_tokens * 4] + "..."
+
+
+def _take_lines(lines: List[str], max_tokens: int, keep: str) -> List[str]:
+    """Lines that fit in max_tokens, taken from the head or the tail, in original order."""
+    ordered = lines if keep == "head" else list(reversed(lines))
+    kept = []
+    used = 0
+    for line in ordered:
+        tokens = count_tokens(line) + 1  # Newline
+        if used + tokens > max_tokens:
+            break
+        kept.append(line)
+        used += tokens
+    return kept if keep == "head" else list(reversed(kept))
+
+
+def fit_lines(lines: List[str], max_tokens: int, keep: str = "head", noun: str = "lines") -> str:
+    """
+    Join as many lines as fit in max_tokens.
+    
+    keep="head" keeps the first lines (data), keep="tail" keeps the last
+    lines (history, where the newest turns matter most). Omitted lines are
+    replaced with a one-line note so the model knows the section was cut.
+    """
+    kept = _take_lines(lines, max_tokens, keep)
+    omitted = len(lines) - len(kept)
+    if omitted:
+        note = f"... ({omitted} {noun} omitted to fit the prompt budget)"
+        kept = kept + [note] if keep == "head" else [note] + kept
+    return "\n".join(kept)
+
+
+class PromptBudget:
+    """
+    Splits the model's context window into per-section token budgets.
+    
+    The system prompt is never truncated (it is the shared cacheable prefix).
+    The question and history are capped at their shares of what remains after
+    the system prompt and the reserved output tokens; data gets everything
+    the question and history do not use. With estimated token counts only
+    (1 - prompt_estimate_margin) of that is used.
+    """
+    
+    def __init__(
+        self,
+        context_tokens: int = None,
+        output_tokens: int = None,
+        history_share: float = None,
+        question_share: float = None
+    ):
+        self.context_tokens = context_tokens or settings.llm_context_tokens
+        self.output_tokens = output_tokens or settings.llm_max_output_tokens
+        self.history_share = settings.prompt_history_share if history_share is None else history_share
+        self.question_share = settings.prompt_question_share if question_share is None else question_share
+    
+    def available(self, system_tokens: int) -> int:
+        """Tokens left for history, question and data."""
+        available = max(0, self.context_tokens - self.output_tokens - system_tokens)
+        if _get_encoding() is None:
+            # Estimated counts can be well off (code, numbers, non-English text)
+            available = int(available * (1 - settings.prompt_estimate_margin))
+        return available
+
+
+def build_messages(
+    system_prompt: str,
+    question: str,
+    template: str = "{question}\n\n{data}",
+    data_lines: Optional[List[str]] = None,
+    history_lines: Optional[List[str]] = None,
+    history_header: str = "Recent conversation:",
+    data_noun: str = "rows",
+    budget: PromptBudget = None,
+    agent: str = None
+) -> List[BaseMessage]:
+    """
+    Assemble [system, history?, request] messages within the token budget.
+    
+    `template` is the request message; `{question}` and `{data}` are replaced
+    with the fitted question and data sections (everything else in the
+    template counts as fixed overhead). History lines go in their own message
+    right after the static system prompt.
+    """
+    budget = budget or PromptBudget()
+    system_tokens = count_tokens(system_prompt) + MESSAGE_OVERHEAD_TOKENS
+    template_tokens = count_tokens(_PLACEHOLDER.sub("", template)) + MESSAGE_OVERHEAD_TOKENS
+    available = max(0, budget.available(system_tokens) - template_tokens)
+    
+    # Question first (capped), then history (capped), data gets the rest
+    question = truncate_text(question, int(available * budget.question_share))
+    remaining = available - count_tokens(question)
+    
+    history = ""
+    if history_lines:
+        history_budget = min(remaining, int(available * budget.history_share))
+        history_budget -= MESSAGE_OVERHEAD_TOKENS
+        # Skip the history message entirely when not even the latest turn fits
+        if _take_lines(history_lines, history_budget, keep="tail"):
+            history = fit_lines(history_lines, history_budget, keep="tail", noun="earlier messages")
+            remaining -= count_tokens(history) + MESSAGE_OVERHEAD_TOKENS
+    
+    data = fit_lines(data_lines, remaining, keep="head", noun=data_noun) if data_lines else ""
+    
+    messages = [
+        SystemMessage(content=system_prompt),
+        # One pass, so a question containing "{data}" is not filled in itself
+        HumanMessage(content=_PLACEHOLDER.sub(lambda m: {'question': question, 'data': data}[m.group(1)], template))
+    ]
+    if history:
+        messages.insert(1, HumanMessage(content=f"{history_header}\n{history}"))
+    
+    if data_lines and len(data) < len("\n".join(data_lines)):
+        logger.info(f"Prompt for {agent or 'llm'} truncated to fit budget of {budget.context_tokens} tokens")
+    return messages
+
+
+def log_prompt_size(messages: List[BaseMessage], agent: str = None) -> int:
+    """Log and return the prompt size of an LLM call."""
+    tokens = count_message_tokens(messages)
+    metrics.observe(f"llm.prompt_tokens.{agent or 'unknown'}", tokens)
+    logger.info(f"LLM prompt agent={agent or 'unknown'} messages={len(messages)} tokens={tokens}")
+    return tokens
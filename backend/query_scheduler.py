@@ -0,0 +1,222 @@
+"""Admission control and fair scheduling of Athena queries."""
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional
+from config import settings
+from metrics import metrics
+from tracing import record_span
+
+# Priority classes, highest first
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+_current_priority: ContextVar[str] = ContextVar("query_priority", default=INTERACTIVE)
+
+
+class QueueTimeout(Exception):
+    """A query waited longer than athena_queue_timeout_seconds for a slot."""
+
+
+@contextmanager
+def query_priority(priority: str):
+    """Run Athena queries issued in this block (and tasks it spawns) at a priority class."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown query priority: {priority}")
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> str:
+    return _current_priority.get()
+
+
+class _Waiter:
+    """A queued request for a slot, woken by an asyncio future or a threading event."""
+    
+    __slots__ = ('tenant_id', 'priority', 'enqueued', 'granted', 'future', 'loop', 'event')
+    
+    def __init__(self, tenant_id: str, priority: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.tenant_id = tenant_id
+        self.priority = priority
+        self.enqueued = time.perf_counter()
+        self.granted = False
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+    
+    def wake(self) -> None:
+        if self.loop:
+            self.loop.call_soon_threadsafe(self._resolve)
+        else:
+            self.event.set()
+    
+    def _resolve(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class QueryScheduler:
+    """
+    Slots for running Athena queries, shared by sync and async callers.
+    
+    A slot is held from StartQueryExecution until the query finishes, so at
+    most athena_max_concurrency queries run against the workgroup at once.
+    Waiting queries are granted slots by priority class (interactive before
+    background), then round-robin across tenants, each tenant running at
+    most athena_tenant_max_concurrency queries. Background queries never
+    take more than athena_background_max_concurrency slots, so chat always
+    has room.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = 0
+        self._running_by_tenant: Dict[str, int] = {}
+        self._running_by_priority: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        # priority -> tenant -> FIFO of waiters; tenant order is the round-robin order
+        self._queues: Dict[str, "OrderedDict[str, deque]"] = {p: OrderedDict() for p in PRIORITIES}
+    
+    def _has_room(self, tenant_id: str, priority: str) -> bool:
+        if self._running >= settings.athena_max_concurrency:
+            return False
+        if self._running_by_tenant.get(tenant_id, 0) >= settings.athena_tenant_max_concurrency:
+            return False
+        if priority == BACKGROUND and self._running_by_priority[BACKGROUND] >= settings.athena_background_max_concurrency:
+            return False
+        return True
+    
+    def _take(self, tenant_id: str, priority: str) -> None:
+        self._running += 1
+        self._running_by_tenant[tenant_id] = self._running_by_tenant.get(tenant_id, 0) + 1
+        self._running_by_priority[priority] += 1
+    
+    def _release(self, tenant_id: str, priority: str) -> None:
+        self._running -= 1
+        self._running_by_tenant[tenant_id] -= 1
+        if not self._running_by_tenant[tenant_id]:
+            del self._running_by_tenant[tenant_id]
+        self._running_by_priority[priority] -= 1
+    
+    def _dispatch(self) -> None:
+        """Grant free slots to waiting queries (caller holds the lock)."""
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            progress = True
+            while queue and progress:
+                progress = False
+                for tenant_id in list(queue):
+                    if not self._has_room(tenant_id, priority):
+                        continue
+                    waiters = queue.pop(tenant_id)
+                    waiter = waiters.popleft()
+                    if waiters:
+                        queue[tenant_id] = waiters  # Back of the round-robin order
+                    self._take(tenant_id, priority)
+                    waiter.granted = True
+                    waiter.wake()
+                    progress = True
+                    break
+        self._publish()
+    
+    def _enqueue(self, waiter: _Waiter) -> bool:
+        """Queue a waiter and dispatch; True if it was granted a slot right away."""
+        with self._lock:
+            self._queues[waiter.priority].setdefault(waiter.tenant_id, deque()).append(waiter)
+            self._dispatch()
+            return waiter.granted
+    
+    def _withdraw(self, waiter: _Waiter) -> bool:
+        """Stop waiting; True if the slot was granted meanwhile (the caller then holds it)."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            waiters = self._queues[waiter.priority].get(waiter.tenant_id)
+            if waiters and waiter in waiters:
+                waiters.remove(waiter)
+                if not waiters:
+                    del self._queues[waiter.priority][waiter.tenant_id]
+            self._dispatch()
+            return False
+    
+    def _done(self, waiter: _Waiter) -> None:
+        with self._lock:
+            self._release(waiter.tenant_id, waiter.priority)
+            self._dispatch()
+    
+    def _granted(self, waiter: _Waiter) -> None:
+        metrics.observe(f"athena.queue_wait_ms.{waiter.priority}", (time.perf_counter() - waiter.enqueued) * 1000)
+        record_span("athena.queue", waiter.enqueued, priority=waiter.priority)
+    
+    def _timed_out(self, waiter: _Waiter) -> QueueTimeout:
+        metrics.incr(f"athena.queue_timeouts.{waiter.priority}")
+        return QueueTimeout(
+            f"Athena is busy: waited {settings.athena_queue_timeout_seconds:g}s for a query slot"
+        )
+    
+    def _publish(self) -> None:
+        """Queue-depth and running gauges (caller holds the lock)."""
+        metrics.set_gauge("athena.running", self._running)
+        for priority in PRIORITIES:
+            metrics.set_gauge(f"athena.queued.{priority}", sum(len(w) for w in self._queues[priority].values()))
+    
+    @contextmanager
+    def slot(self, tenant_id: str, priority: str = None):
+        """Hold a query slot for the block (blocking the thread while queued)."""
+        waiter = _Waiter(tenant_id, priority or current_priority())
+        if not self._enqueue(waiter):
+            if not waiter.event.wait(settings.athena_queue_timeout_seconds) and not self._withdraw(waiter):
+                raise self._timed_out(waiter)
+        self._granted(waiter)
+        try:
+            yield
+        finally:
+            self._done(waiter)
+    
+    @asynccontextmanager
+    async def aslot(self, tenant_id: str, priority: str = None):
+        """Hold a query slot for the block (awaiting while queued)."""
+        waiter = _Waiter(tenant_id, priority or current_priority(), asyncio.get_running_loop())
+        if not self._enqueue(waiter):
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), settings.athena_queue_timeout_seconds)
+            except asyncio.TimeoutError:
+                if not self._withdraw(waiter):
+                    raise self._timed_out(waiter)
+            except BaseException:
+                # Cancelled while queued: hand a just-granted slot on
+                if self._withdraw(waiter):
+                    self._done(waiter)
+                raise
+        self._granted(waiter)
+        try:
+            yield
+        finally:
+            self._done(waiter)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Running and queued queries as aggregate counts.
+        
+        /api/metrics is unauthenticated, so tenant IDs are not included, only
+        how many tenants have queries running or waiting.
+        """
+        with self._lock:
+            return {
+                'running': self._running,
+                'running_by_priority': dict(self._running_by_priority),
+                'tenants_running': sum(1 for count in self._running_by_tenant.values() if count),
+                'queued': {priority: sum(len(w) for w in queue.values()) for priority, queue in self._queues.items()},
+                'tenants_queued': {priority: sum(1 for w in queue.values() if w) for priority, queue in self._queues.items()}
+            }
+
+
+# Singleton instance
+query_scheduler = QueryScheduler()
@@ -0,0 +1,150 @@
+"""Compact encodings of query results in API responses."""
+import base64
+import json
+from typing import Dict, List, Any, Optional, Tuple
+from fastapi import Response
+
+
+# Vega-Lite named dataset used when chart data references the shared result
+RESULT_DATASET = "query_results"
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def encode_cursor(offset: int) -> str:
+    """Opaque cursor for the row at offset."""
+    return base64.urlsafe_b64encode(f"o:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    """Row offset of a cursor (0 for no cursor); raises ValueError if malformed or negative."""
+    if not cursor:
+        return 0
+    text = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    if not text.startswith("o:"):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    offset = int(text[2:])
+    if offset < 0:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return offset
+
+
+def paginate(result: Dict[str, Any], cursor: Optional[str], limit: Optional[int]) -> Tuple[Dict[str, Any], Optional[str]]:
+    """One page of a result's rows and the cursor of the next page (None on the last page)."""
+    rows = result.get('rows', [])
+    if limit is not None and limit < 1:
+        raise ValueError(f"Invalid page size: {limit}")
+    if not limit and not cursor:
+        return result, None
+    offset = decode_cursor(cursor)
+    end = offset + limit if limit else len(rows)
+    page = {**result, 'rows': rows[offset:end], 'row_count': len(rows), 'offset': offset}
+    return page, encode_cursor(end) if end < len(rows) else None
+
+
+def to_columnar(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Rows as one value array per column (column names are not repeated per row)."""
+    columns = result.get('columns', [])
+    rows = result.get('rows', [])
+    encoded = {k: v for k, v in result.items() if k != 'rows'}
+    encoded['data'] = [[row.get(col) for row in rows] for col in columns]
+    encoded['format'] = 'columnar'
+    return encoded
+
+
+def reference_chart_data(chart_specs: List[Dict[str, Any]], result: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Replace inline chart data that repeats the result's rows with a reference
+    to the Vega-Lite named dataset RESULT_DATASET, bound by the client.
+    
+    Charts with their own (e.g. transformed) data keep it inline.
+    """
+    rows = (result or {}).get('rows')
+    referenced = []
+    for chart_spec in chart_specs:
+        values = chart_spec.get('spec', {}).get('data', {}).get('values')
+        if rows is not None and values is not None and (values is rows or values == rows):
+            chart_spec = {**chart_spec, 'spec': {**chart_spec['spec'], 'data': {'name': RESULT_DATASET}}}
+        referenced.append(chart_spec)
+    return referenced
+
+
+def _arrow_table(result: Dict[str, Any], metadata: Dict[str, Any]):
+    import pyarrow as pa
+    columns = result.get('columns', [])
+    rows = result.get('rows', [])
+    arrays = {}
+    for col in columns:
+        values = [row.get(col) for row in rows]
+        try:
+            arrays[col] = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed types: fall back to strings
+            arrays[col] = pa.array([None if v is None else str(v) for v in values])
+    table = pa.table(arrays) if arrays else pa.table({})
+    return table.replace_schema_metadata({k: json.dumps(v, default=str) for k, v in metadata.items()})
+
+
+def _arrow_bytes(result: Dict[str, Any], metadata: Dict[str, Any]) -> bytes:
+    import pyarrow as pa
+    table = _arrow_table(result, metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _msgpack_bytes(payload: Dict[str, Any]) -> bytes:
+    import msgpack
+    return msgpack.packb(payload, default=str, use_bin_type=True)
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """'arrow', 'msgpack' or 'json' for an Accept header; binary formats need their optional package."""
+    accept = (accept or "").lower()
+    if ARROW_TYPE in accept:
+        try:
+            import pyarrow  # noqa: F401
+            return 'arrow'
+        except ImportError:
+            pass
+    if any(t in accept for t in MSGPACK_TYPES):
+        try:
+            import msgpack  # noqa: F401
+            return 'msgpack'
+        except ImportError:
+            pass
+    return 'json'
+
+
+def encode_response(
+    payload: Dict[str, Any],
+    accept: Optional[str],
+    table: Optional[Dict[str, Any]] = None,
+    table_key: Optional[str] = None,
+    headers: Dict[str, str] = None
+) -> Response:
+    """
+    Encode a response body for the client's Accept header.
+    
+    msgpack encodes the whole payload. Arrow IPC encodes `table` (a result in
+    row format, found in the payload under table_key or as the payload
+    itself) as a record batch stream, with the other fields as JSON in the
+    schema metadata. Anything else, or a missing optional package, gets JSON.
+    """
+    encoding = negotiate(accept)
+    if encoding == 'arrow' and table is not None:
+        metadata = {k: v for k, v in payload.items() if k != table_key and k not in ('rows', 'columns', 'data')}
+        metadata.update({k: v for k, v in table.items() if k not in ('rows', 'columns', 'data')})
+        return Response(_arrow_bytes(table, metadata), media_type=ARROW_TYPE, headers=headers)
+    if encoding == 'arrow':
+        encoding = negotiate((accept or '').lower().replace(ARROW_TYPE, ''))
+    if encoding == 'msgpack':
+        return Response(_msgpack_bytes(payload), media_type=MSGPACK_TYPES[0], headers=headers)
+    return Response(json.dumps(payload, default=str), media_type="application/json", headers=headers)
+
+
+def compact_result(result: Dict[str, Any], result_format: str) -> Dict[str, Any]:
+    """Apply the requested row encoding ("rows" leaves the result as it is)."""
+    return to_columnar(result) if result_format == 'columnar' else result
@@ -0,0 +1,198 @@
+"""Vectorized statistical digest of query results for LLM prompts."""
+from typing import Dict, List, Any, Optional, Tuple
+import numpy as np
+
+
+# Candidate date/time columns, in order of preference
+DATE_COLUMNS = ['day', 'date', 'dt', 'week_start', 'timestamp']
+
+# Columns that are never treated as metrics
+NON_METRIC_COLUMNS = {'tenant_id', 'dt', 'day', 'date', 'week_start', 'timestamp'}
+
+
+def find_date_column(columns: List[str]) -> Optional[str]:
+    """Pick the date column of a result, if any."""
+    for col in DATE_COLUMNS:
+        if col in columns:
+            return col
+    return None
+
+
+def parse_dates(rows: List[Dict], date_column: str) -> Optional[np.ndarray]:
+    """Parse a date column into datetime64[D]; None if any value is missing or not a date."""
+    try:
+        dates = np.array([str(row.get(date_column) or '')[:10] for row in rows], dtype='datetime64[D]')
+    except ValueError:
+        return None
+    # Empty strings parse as NaT, which would break the date range arithmetic
+    return None if np.isnat(dates).any() else dates
+
+
+def to_numeric_matrix(rows: List[Dict], columns: List[str]) -> Tuple[List[str], np.ndarray]:
+    """
+    Convert result rows to a float matrix (rows x numeric columns).
+    
+    Non-numeric values become NaN; columns with no numeric values at all are dropped.
+    """
+    candidates = [col for col in columns if col not in NON_METRIC_COLUMNS]
+    if not rows or not candidates:
+        return [], np.empty((len(rows), 0))
+    
+    def as_float(value):
+        if isinstance(value, bool) or value is None or value == '':
+            return np.nan
+        try:
+            return float(value)
+        except (ValueError, TypeError):
+            return np.nan
+    
+    matrix = np.array([[as_float(row.get(col)) for col in candidates] for row in rows], dtype=float)
+    keep = ~np.all(np.isnan(matrix), axis=0)
+    return [col for col, k in zip(candidates, keep) if k], matrix[:, keep]
+
+
+def _masked_mean(matrix: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Per-column mean of the rows selected by mask, ignoring NaN."""
+    selected = matrix[mask]
+    if selected.shape[0] == 0:
+        return np.full(matrix.shape[1], np.nan)
+    counts = np.sum(~np.isnan(selected), axis=0)
+    sums = np.nansum(selected, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def _slopes(x: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """Least-squares slope of every column against x, ignoring NaN."""
+    valid = ~np.isnan(matrix)
+    n = valid.sum(axis=0)
+    y = np.where(valid, matrix, 0.0)
+    xs = np.where(valid, x[:, None], 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = xs.sum(axis=0) / n
+        y_mean = y.sum(axis=0) / n
+        dx = np.where(valid, x[:, None] - x_mean, 0.0)
+        dy = np.where(valid, matrix - y_mean, 0.0)
+        slope = (dx * dy).sum(axis=0) / (dx * dx).sum(axis=0)
+    return np.where(n >= 2, slope, np.nan)
+
+
+def _value(x) -> Optional[float]:
+    """numpy scalar -> rounded float (None for NaN)."""
+    x = float(x)
+    return None if np.isnan(x) else round(x, 2)
+
+
+def profile_results(query_results: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compute a compact digest of a query result in one vectorized pass.
+    
+    Returns row count, date range and missing periods (when the result has a
+    date column), and per numeric column: min, max, mean, median, trend slope
+    (per day, or per row without dates), latest-vs-previous week means and
+    their delta, and the number of missing values.
+    """
+    columns = query_results.get('columns', [])
+    rows = query_results.get('rows', [])
+    digest: Dict[str, Any] = {'row_count': len(rows), 'columns': {}}
+    if not rows:
+        return digest
+    
+    metric_columns, matrix = to_numeric_matrix(rows, columns)
+    
+    date_column = find_date_column(columns)
+    dates = parse_dates(rows, date_column) if date_column else None
+    if dates is not None:
+        order = np.argsort(dates, kind='stable')
+        dates = dates[order]
+        matrix = matrix[order]
+        x = (dates - dates[0]).astype(float)
+        
+        unique = np.unique(dates)
+        step = int(np.median(np.diff(unique).astype(int))) if len(unique) > 1 else 1
+        step = 7 if step >= 7 else 1  # Weekly or daily data
+        expected = np.arange(unique[0], unique[-1] + 1, step)
+        missing = np.setdiff1d(expected, unique)
+        digest.update({
+            'date_column': date_column,
+            'granularity': 'weekly' if step == 7 else 'daily',
+            'date_range': [str(unique[0]), str(unique[-1])],
+            'missing_periods': int(len(missing)),
+            'missing_dates': [str(d) for d in missing[:10]]
+        })
+        
+        # Week-over-week: last 7 days vs the 7 before (daily), or last row vs previous (weekly)
+        last = dates[-1]
+        if step == 1:
+            current = dates > last - 7
+            previous = (dates <= last - 7) & (dates > last - 14)
+        else:
+            current = dates == last
+            previous = dates == (unique[-2] if len(unique) > 1 else last - 7)
+    else:
+        x = np.arange(len(rows), dtype=float)
+        current = previous = None
+    
+    if not metric_columns:
+        return digest
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mins = np.nanmin(matrix, axis=0)
+        maxs = np.nanmax(matrix, axis=0)
+        means = np.nanmean(matrix, axis=0)
+        medians = np.nanmedian(matrix, axis=0)
+    slopes = _slopes(x, matrix)
+    missing_values = np.isnan(matrix).sum(axis=0)
+    
+    if current is not None:
+        current_means = _masked_mean(matrix, current)
+        previous_means = _masked_mean(matrix, previous)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            deltas = np.where(previous_means != 0, (current_means - previous_means) / np.abs(previous_means) * 100, np.nan)
+    
+    for i, col in enumerate(metric_columns):
+        stats = {
+            'min': _value(mins[i]),
+            'max': _value(maxs[i]),
+            'mean': _value(means[i]),
+            'median': _value(medians[i]),
+            'slope': _value(slopes[i]),
+            'missing_values': int(missing_values[i])
+        }
+        if current is not None:
+            stats.update({
+                'current_week_mean': _value(current_means[i]),
+                'previous_week_mean': _value(previous_means[i]),
+                'week_over_week_pct': _value(deltas[i])
+            })
+        digest['columns'][col] = stats
+    
+    return digest
+
+
+def format_digest(digest: Dict[str, Any]) -> List[str]:
+    """Render a digest as compact prompt lines (one line per metric)."""
+    lines = [f"Records: {digest['row_count']}"]
+    if digest.get('date_range'):
+        first, last = digest['date_range']
+        lines.append(f"Date range ({digest['granularity']}): {first} to {last}")
+        if digest['missing_periods']:
+            shown = ', '.join(digest['missing_dates'])
+            more = '' if digest['missing_periods'] <= len(digest['missing_dates']) else ', ...'
+            lines.append(f"Missing {digest['missing_periods']} periods: {shown}{more}")
+    
+    slope_unit = 'day' if digest.get('date_range') else 'row'
+    for col, s in digest['columns'].items():
+        line = (
+            f"{col}: min={s['min']} max={s['max']} mean={s['mean']} median={s['median']} "
+            f"trend={s['slope']}/{slope_unit}"
+        )
+        if 'week_over_week_pct' in s:
+            line += (
+                f" latest_week_mean={s['current_week_mean']} previous_week_mean={s['previous_week_mean']}"
+                f" change={s['week_over_week_pct']}%"
+            )
+        if s['missing_values']:
+            line += f" missing_values={s['missing_values']}"
+        lines.append(line)
+    return lines
@@ -0,0 +1,68 @@
+"""Handles to the query results of past conversation turns."""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from cache import cache
+from config import settings
+
+
+class ResultStore:
+    """
+    Query results kept in the cache backend under an opaque handle.
+    
+    Each chat turn stores its (possibly merged) result so a follow-up
+    question can refine it without querying Athena again. Handles are
+    scoped to a tenant and expire after result_handle_ttl seconds.
+    
+    With Redis the results live there and expire with their TTL. Without it
+    they are kept in this process in a bounded LRU: at most
+    result_store_max_entries results, with expired ones swept on every put,
+    since most handles are never read again.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> (expires_at, result), least recently used first
+        self._local: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+    
+    def _key(self, tenant_id: str, handle: str) -> str:
+        return f"result:{tenant_id}:{handle}"
+    
+    def put(self, tenant_id: str, result: Dict[str, Any]) -> str:
+        """Store a result and return its handle."""
+        handle = uuid.uuid4().hex
+        key = self._key(tenant_id, handle)
+        if cache.connect():
+            cache.set(key, result, ttl=settings.result_handle_ttl)
+            return handle
+        
+        now = time.time()
+        with self._lock:
+            for expired in [k for k, (expires_at, _) in self._local.items() if expires_at <= now]:
+                del self._local[expired]
+            self._local[key] = (now + settings.result_handle_ttl, result)
+            while len(self._local) > settings.result_store_max_entries:
+                self._local.popitem(last=False)
+        return handle
+    
+    def get(self, tenant_id: str, handle: str) -> Optional[Dict[str, Any]]:
+        """Result stored under a handle, or None if it expired or belongs to another tenant."""
+        key = self._key(tenant_id, handle)
+        if cache.connect():
+            return cache.get(key)
+        
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return entry[1]
+
+
+# Singleton instance
+result_store = ResultStore()
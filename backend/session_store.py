@@ -0,0 +1,153 @@
+"""Conversation history per session, bounded and shareable across workers."""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import cached_property
+from typing import Dict, List, Optional
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Short field names keep encoded turns small
+_FIELDS = {'user': 'u', 'assistant': 'a', 'sql': 's', 'result': 'r'}
+_NAMES = {short: name for name, short in _FIELDS.items()}
+
+
+def _encode(turn: Dict[str, str]) -> str:
+    """Compact JSON for one turn; long answers are truncated (prompts only use their start)."""
+    compact = {_FIELDS.get(k, k): v for k, v in turn.items() if v is not None}
+    if 'a' in compact:
+        compact['a'] = compact['a'][:settings.session_answer_max_chars]
+    return json.dumps(compact, separators=(',', ':'), ensure_ascii=False)
+
+
+def _decode(data) -> Dict[str, str]:
+    return {_NAMES.get(k, k): v for k, v in json.loads(data).items()}
+
+
+def make_session_key(tenant_id: str, authorization: Optional[str]) -> str:
+    """Session key for a tenant and bearer token (the token itself is not stored)."""
+    token_hash = hashlib.sha256((authorization or '').encode()).hexdigest()[:16]
+    return f"session:{tenant_id}:{token_hash}"
+
+
+class MemorySessionStore:
+    """
+    Per-process store: LRU over sessions with an idle TTL.
+    
+    At most session_max_sessions sessions of session_max_turns turns are
+    kept; the least recently used session is evicted first.
+    """
+    
+    def __init__(self):
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def history(self, key: str) -> List[Dict[str, str]]:
+        """Last session_max_turns turns of a session, oldest first."""
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                return []
+            turns, expiry = entry
+            if time.time() >= expiry:
+                del self._sessions[key]
+                return []
+            self._sessions.move_to_end(key)
+            encoded = list(turns)
+        return [_decode(turn) for turn in encoded]
+    
+    def append(self, key: str, turn: Dict[str, str]) -> None:
+        """Add a turn, dropping the oldest beyond session_max_turns."""
+        encoded = _encode(turn)
+        with self._lock:
+            entry = self._sessions.get(key)
+            turns = entry[0] if entry and time.time() < entry[1] else deque(maxlen=settings.session_max_turns)
+            turns.append(encoded)
+            self._sessions[key] = (turns, time.time() + settings.session_ttl)
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > settings.session_max_sessions:
+                self._sessions.popitem(last=False)
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class RedisSessionStore:
+    """
+    Shared store: one Redis list per session.
+    
+    Appending is RPUSH + LTRIM + EXPIRE in one pipeline, so every worker
+    sees the same history and each session keeps at most session_max_turns
+    turns for session_ttl seconds after its last message.
+    """
+    
+    def __init__(self, client):
+        self._redis = client
+    
+    def history(self, key: str) -> List[Dict[str, str]]:
+        try:
+            return [_decode(turn) for turn in self._redis.lrange(key, 0, -1)]
+        except Exception as e:
+            logger.warning(f"Session read failed: {e}")
+            return []
+    
+    def append(self, key: str, turn: Dict[str, str]) -> None:
+        try:
+            pipe = self._redis.pipeline()
+            pipe.rpush(key, _encode(turn))
+            pipe.ltrim(key, -settings.session_max_turns, -1)
+            pipe.expire(key, settings.session_ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Session write failed: {e}")
+
+
+def create_session_store():
+    """Redis-backed store when Redis is enabled and reachable, in-memory otherwise."""
+    if settings.redis_enabled:
+        try:
+            import redis
+            client = redis.Redis(
+                host=settings.redis_host,
+                port=settings.redis_port,
+                db=settings.redis_db
+            )
+            client.ping()
+            return RedisSessionStore(client)
+        except Exception as e:
+            logger.warning(f"Redis unavailable, keeping sessions in memory: {e}")
+    return MemorySessionStore()
+
+
+class SessionStore:
+    """
+    The configured store, created on first use.
+    
+    Connecting to Redis (and waiting for its timeout when it is down) would
+    otherwise happen while main is imported; the startup warm-up connects
+    ahead of the first request instead.
+    """
+    
+    @cached_property
+    def _store(self):
+        return create_session_store()
+    
+    def connect(self) -> bool:
+        """Create the store now rather than on the first session call; True if Redis is used."""
+        return isinstance(self._store, RedisSessionStore)
+    
+    def history(self, key: str) -> List[Dict[str, str]]:
+        """Last session_max_turns turns of a session, oldest first."""
+        return self._store.history(key)
+    
+    def append(self, key: str, turn: Dict[str, str]) -> None:
+        """Add a turn, keeping the last session_max_turns."""
+        self._store.append(key, turn)
+
+
+# Singleton instance
+session_store = SessionStore()
@@ -0,0 +1,35 @@
+"""Tests for choosing between the precomputed anomaly table and the full path."""
+from datetime import date, datetime, timedelta
+from agents.anomaly_agent import build_precomputed_anomaly_sql, named_dates, precomputed_covers
+from config import settings
+
+
+def test_hr_keyword_is_a_whole_word():
+    assert "metric IN" not in build_precomputed_anomaly_sql("unusual days, I slept 3 hrs")
+    assert "'hr_avg'" in build_precomputed_anomaly_sql("unusual hr spikes")
+
+
+def test_named_dates():
+    today = date(2024, 3, 10)
+    
+    assert named_dates("anything odd on 2023-12-25?", today) == [date(2023, 12, 25)]
+    assert named_dates("what happened on March 3rd", today) == [date(2024, 3, 3)]
+    assert named_dates("spikes on 5 April", today) == [date(2023, 4, 5)]
+    assert named_dates("anomalies in january 2023", today) == [date(2023, 1, 1)]
+    assert named_dates("may I see unusual steps for the last 7 days", today) == []
+
+
+def test_fast_path_falls_back_for_dates_outside_the_lookback():
+    recent = (datetime.utcnow().date() - timedelta(days=3)).isoformat()
+    old = (datetime.utcnow().date() - timedelta(days=90)).isoformat()
+    
+    assert precomputed_covers("any spikes in my steps?")
+    assert precomputed_covers(f"anything unusual on {recent}?")
+    assert not precomputed_covers(f"anything unusual on {old}?")
+    assert precomputed_covers(f"anything unusual on {old} in the last 6 months?")
+
+
+def test_fast_path_needs_threshold_at_table_cutoff(monkeypatch):
+    monkeypatch.setattr(settings, 'anomaly_threshold', 2.0)
+    
+    assert not precomputed_covers("any spikes in my steps?")
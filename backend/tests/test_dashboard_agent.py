@@ -0,0 +1,41 @@
+"""Tests for the chart spec cache."""
+import json
+from agents import dashboard_agent
+from cache import cache
+
+LAYERED_RESPONSE = json.dumps({
+    'spec_type': 'vega-lite',
+    'spec': {
+        'title': 'Steps, last 7 days',
+        'datasets': {'sample': [{'day': '2024-01-01', 'steps_total': 1}]},
+        'layer': [
+            {'mark': 'line', 'data': {'values': [{'day': '2024-01-01', 'steps_total': 1}]},
+             'encoding': {'x': {'field': 'day', 'type': 'temporal'}, 'y': {'field': 'steps_total', 'type': 'quantitative'}}},
+            {'mark': 'rule', 'transform': [{'lookup': 'day', 'from': {'data': {'values': [{'day': '2024-01-01'}]}, 'key': 'day'}}],
+             'encoding': {'y': {'aggregate': 'mean', 'field': 'steps_total'}}}
+        ]
+    }
+})
+
+
+def _rows(tenant, days):
+    return [{'day': f"2024-01-{d:02d}", 'steps_total': 1000 * d, 'tenant': tenant} for d in range(1, days + 1)]
+
+
+def test_layered_spec_is_cached_without_any_tenant_data(monkeypatch):
+    calls = []
+    monkeypatch.setattr(dashboard_agent.llm_client, 'invoke', lambda messages, agent=None: calls.append(1) or LAYERED_RESPONSE)
+    cache.clear()
+    columns = ['day', 'steps_total', 'tenant']
+    
+    first = dashboard_agent.generate_chart_spec({'columns': columns, 'rows': _rows('a', 7)}, "Show steps for last 7 days", intent='dashboard')
+    second = dashboard_agent.generate_chart_spec({'columns': columns, 'rows': _rows('b', 30)}, "Show steps for last 30 days", intent='dashboard')
+    
+    assert len(calls) == 1
+    assert first['spec']['data'] == {'values': _rows('a', 7)}
+    assert first['spec']['title'] == 'Steps, last 7 days'
+    assert second['spec']['data'] == {'values': _rows('b', 30)}
+    assert second['spec']['title'] == 'Show steps for last 30 days'
+    assert '"tenant": "a"' not in json.dumps(second)
+    assert 'datasets' not in second['spec']
+    assert all('data' not in layer for layer in second['spec']['layer'])
@@ -0,0 +1,38 @@
+"""Tests for SQL plan splitting and merging."""
+from agents.data_agent import merge_results, split_sql_plan
+
+
+def test_split_sql_plan_drops_prose():
+    plan = split_sql_plan(
+        "SELECT day, steps_total FROM health_data_lake.gold_daily_features WHERE tenant_id = '${tenant_id}';\n"
+        "This query returns your daily steps.",
+        "tenant-1"
+    )
+    
+    assert len(plan) == 1
+    assert plan[0].lstrip().upper().startswith("SELECT")
+
+
+def test_merge_joins_results_on_shared_date_column():
+    steps = {'columns': ['day', 'steps_total'], 'rows': [{'day': '2024-01-01', 'steps_total': 10}], 'sql': 'a'}
+    heart = {'columns': ['day', 'hr_avg'], 'rows': [{'day': '2024-01-01', 'hr_avg': 60}, {'day': '2024-01-02', 'hr_avg': 62}], 'sql': 'b'}
+    
+    merged = merge_results([steps, heart])
+    
+    assert merged['columns'] == ['day', 'steps_total', 'hr_avg']
+    assert merged['rows'] == [
+        {'day': '2024-01-01', 'steps_total': 10, 'hr_avg': 60},
+        {'day': '2024-01-02', 'hr_avg': 62}
+    ]
+    assert merged['query_count'] == 2
+    assert 'additional_results' not in merged
+
+
+def test_merge_keeps_results_without_the_date_column_separate():
+    steps = {'columns': ['day', 'steps_total'], 'rows': [{'day': '2024-01-01', 'steps_total': 10}], 'sql': 'a'}
+    total = {'columns': ['total'], 'rows': [{'total': 10}], 'sql': 'b'}
+    
+    merged = merge_results([steps, total])
+    
+    assert merged['columns'] == ['day', 'steps_total']
+    assert merged['additional_results'] == [total]
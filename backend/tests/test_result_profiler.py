@@ -0,0 +1,44 @@
+"""Tests for the query result digest."""
+from agents.data_agent import merge_results
+from result_profiler import parse_dates, profile_results
+
+
+def _daily(days, column='day'):
+    return [{column: f"2024-01-{d:02d}", 'steps_total': 1000 * d} for d in days]
+
+
+def test_profile_daily_results():
+    digest = profile_results({'columns': ['day', 'steps_total'], 'rows': _daily(range(1, 11))})
+    
+    assert digest['granularity'] == 'daily'
+    assert digest['date_range'] == ['2024-01-01', '2024-01-10']
+    assert digest['missing_periods'] == 0
+    assert digest['columns']['steps_total']['max'] == 10000
+
+
+def test_missing_date_is_not_parsed_as_nat():
+    rows = _daily(range(1, 8)) + [{'day': '', 'steps_total': 500}, {'steps_total': 600}]
+    
+    assert parse_dates(rows, 'day') is None
+    digest = profile_results({'columns': ['day', 'steps_total'], 'rows': rows})
+    assert digest['row_count'] == 9
+    assert 'date_range' not in digest
+    assert digest['columns']['steps_total']['min'] == 500
+
+
+def test_profile_merge_of_daily_and_weekly_results():
+    daily = {'columns': ['day', 'steps_total'], 'rows': _daily(range(1, 8)), 'sql': 'SELECT 1'}
+    weekly = {
+        'columns': ['week_start', 'steps_week'],
+        'rows': [{'week_start': '2024-01-01', 'steps_week': 28000}, {'week_start': '2024-01-08', 'steps_week': 30000}],
+        'sql': 'SELECT 2'
+    }
+    
+    merged = merge_results([daily, weekly])
+    digest = profile_results(merged)
+    
+    assert all('day' in row for row in merged['rows'])
+    assert merged['additional_results'][0]['columns'] == ['week_start', 'steps_week']
+    assert digest['granularity'] == 'daily'
+    assert digest['columns']['steps_total']['max'] == 7000
+    assert profile_results(merged['additional_results'][0])['granularity'] == 'weekly'
@@ -0,0 +1,29 @@
+"""Tests for the in-memory result store used without Redis."""
+from config import settings
+from result_store import ResultStore
+
+
+def test_store_keeps_at_most_max_entries(monkeypatch):
+    monkeypatch.setattr(settings, 'result_store_max_entries', 3)
+    store = ResultStore()
+    handles = [store.put('tenant-1', {'rows': [i]}) for i in range(3)]
+    store.get('tenant-1', handles[0])  # Most recently used now
+    
+    handles.append(store.put('tenant-1', {'rows': [3]}))
+    
+    assert store.get('tenant-1', handles[0]) == {'rows': [0]}
+    assert store.get('tenant-1', handles[1]) is None
+    assert store.get('tenant-1', handles[3]) == {'rows': [3]}
+    assert store.get('tenant-2', handles[3]) is None
+
+
+def test_put_sweeps_expired_results(monkeypatch):
+    store = ResultStore()
+    monkeypatch.setattr(settings, 'result_handle_ttl', -1)
+    store.put('tenant-1', {'rows': []})
+    monkeypatch.setattr(settings, 'result_handle_ttl', 3600)
+    
+    handle = store.put('tenant-1', {'rows': [1]})
+    
+    assert len(store._local) == 1
+    assert store.get('tenant-1', handle) == {'rows': [1]}
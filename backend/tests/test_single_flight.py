@@ -0,0 +1,45 @@
+"""Tests for sharing concurrent Athena executions between callers."""
+import asyncio
+from agents import data_agent
+from cache import cache
+from query_scheduler import query_priority, BACKGROUND, INTERACTIVE
+
+
+def _run_concurrently(monkeypatch, priorities):
+    """Start one aexecute_query per priority (in order) and count the Athena executions."""
+    calls = []
+    
+    async def fake_execute(sql, tenant_id):
+        calls.append(sql)
+        await asyncio.sleep(0.05)
+        return {'columns': ['n'], 'rows': [{'n': 1}]}
+    
+    monkeypatch.setattr(data_agent.athena_client, 'aexecute_query', fake_execute)
+    cache.clear()
+    
+    async def query(priority):
+        with query_priority(priority):
+            return await data_agent.aexecute_query("SELECT 1 AS n", "tenant-1")
+    
+    async def main():
+        tasks = []
+        for priority in priorities:
+            tasks.append(asyncio.ensure_future(query(priority)))
+            await asyncio.sleep(0)
+        return await asyncio.gather(*tasks)
+    
+    results = asyncio.run(main())
+    assert all(result['rows'] == [{'n': 1}] for result in results)
+    return len(calls)
+
+
+def test_same_priority_callers_share_one_execution(monkeypatch):
+    assert _run_concurrently(monkeypatch, [INTERACTIVE, INTERACTIVE]) == 1
+
+
+def test_background_caller_joins_interactive_execution(monkeypatch):
+    assert _run_concurrently(monkeypatch, [INTERACTIVE, BACKGROUND]) == 1
+
+
+def test_interactive_caller_does_not_wait_on_background_execution(monkeypatch):
+    assert _run_concurrently(monkeypatch, [BACKGROUND, INTERACTIVE]) == 2
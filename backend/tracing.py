@@ -0,0 +1,231 @@
+"""Lightweight span tracing for chat requests (Server-Timing, metrics, optional OTLP)."""
+import asyncio
+import functools
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Any, Optional
+import httpx
+from config import settings
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[str]] = ContextVar("current_span", default=None)
+
+
+class Trace:
+    """Spans recorded while handling one request."""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.start_ns = time.time_ns()
+        self.spans: List[Dict[str, Any]] = []
+    
+    def to_list(self) -> List[Dict[str, Any]]:
+        """Spans as dicts with start offsets relative to the trace start, in start order."""
+        return [
+            {
+                'name': s['name'],
+                'span_id': s['span_id'],
+                'parent_id': s['parent_id'],
+                'start_ms': round((s['start_ns'] - self.start_ns) / 1e6, 3),
+                'duration_ms': round(s['duration_ms'], 3),
+                'attributes': s['attributes']
+            }
+            for s in sorted(self.spans, key=lambda s: s['start_ns'])
+        ]
+    
+    def server_timing(self) -> str:
+        """
+        Server-Timing header value: total duration per span name.
+        
+        Names that occur more than once (e.g. several LLM calls) are summed
+        and their count is given in the description.
+        """
+        totals: Dict[str, List[float]] = {}
+        for s in sorted(self.spans, key=lambda s: s['start_ns']):
+            entry = totals.setdefault(s['name'], [0.0, 0])
+            entry[0] += s['duration_ms']
+            entry[1] += 1
+        parts = []
+        for name, (duration, count) in totals.items():
+            desc = f';desc="x{count}"' if count > 1 else ''
+            parts.append(f"{name};dur={duration:.1f}{desc}")
+        return ", ".join(parts)
+
+
+def start_trace(name: str) -> Trace:
+    """Start a trace for the current request; spans in this context (and tasks it spawns) join it."""
+    trace = Trace(name)
+    _current_trace.set(trace)
+    _current_span.set(None)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def _finish(name: str, span_id: str, parent_id: Optional[str], start_ns: int, duration_ms: float, attributes: Dict[str, Any]) -> None:
+    """Record a finished span in the metrics registry and the active trace."""
+    metrics.observe(f"span.{name}", duration_ms)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.spans.append({
+            'name': name,
+            'span_id': span_id,
+            'parent_id': parent_id,
+            'start_ns': start_ns,
+            'duration_ms': duration_ms,
+            'attributes': attributes
+        })
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block as a span.
+    
+    Yields the span's attribute dict so callers can add attributes (e.g. a
+    cache hit) before it ends. Exceptions are recorded and re-raised.
+    """
+    span_id = uuid.uuid4().hex[:16]
+    parent_id = _current_span.get()
+    token = _current_span.set(span_id)
+    start_ns = time.time_ns()
+    start = time.perf_counter()
+    try:
+        yield attributes
+    except BaseException as e:
+        attributes['error'] = type(e).__name__
+        raise
+    finally:
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Finished in another context (e.g. an abandoned async generator)
+            pass
+        _finish(name, span_id, parent_id, start_ns, (time.perf_counter() - start) * 1000, attributes)
+
+
+def record_span(name: str, start: float, **attributes) -> None:
+    """Record a span that started at perf_counter() value `start` and ends now."""
+    duration_ms = (time.perf_counter() - start) * 1000
+    start_ns = time.time_ns() - int(duration_ms * 1e6)
+    _finish(name, uuid.uuid4().hex[:16], _current_span.get(), start_ns, duration_ms, attributes)
+
+
+def traced(name: str):
+    """Decorator running a sync or async function inside a span."""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def to_otlp(trace: Trace) -> Dict[str, Any]:
+    """Encode a trace as an OTLP/HTTP JSON ExportTraceServiceRequest."""
+    return {
+        'resourceSpans': [{
+            'resource': {
+                'attributes': [
+                    {'key': 'service.name', 'value': {'stringValue': settings.otlp_service_name}},
+                    {'key': 'process.pid', 'value': {'intValue': str(os.getpid())}}
+                ]
+            },
+            'scopeSpans': [{
+                'scope': {'name': 'health-intelligence'},
+                'spans': [
+                    {
+                        'traceId': trace.trace_id,
+                        'spanId': s['span_id'],
+                        'parentSpanId': s['parent_id'] or '',
+                        'name': s['name'],
+                        'kind': 1,  # SPAN_KIND_INTERNAL
+                        'startTimeUnixNano': str(s['start_ns']),
+                        'endTimeUnixNano': str(s['start_ns'] + int(s['duration_ms'] * 1e6)),
+                        'attributes': [{'key': k, 'value': _otlp_value(v)} for k, v in s['attributes'].items()],
+                        'status': {'code': 2 if 'error' in s['attributes'] else 1}
+                    }
+                    for s in trace.spans
+                ]
+            }]
+        }]
+    }
+
+
+class OTLPExporter:
+    """
+    Sends finished traces to an OTLP/HTTP collector (JSON encoding).
+    
+    Disabled unless settings.otlp_endpoint is set. Export runs in the
+    background and failures are only logged, so a missing collector never
+    affects requests.
+    """
+    
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._tasks = set()
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.otlp_endpoint)
+    
+    async def _send(self, trace: Trace) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=settings.otlp_timeout_seconds)
+        try:
+            response = await self._client.post(
+                f"{settings.otlp_endpoint.rstrip('/')}/v1/traces",
+                json=to_otlp(trace)
+            )
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"OTLP export failed: {e}")
+    
+    def export(self, trace: Trace) -> None:
+        """Schedule a trace for export (call from the event loop)."""
+        if not self.enabled or not trace.spans:
+            return
+        task = asyncio.ensure_future(self._send(trace))
+        # Keep a reference until done so the task is not garbage collected
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def aclose(self) -> None:
+        """Wait for pending exports and close the HTTP client."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Singleton instance
+exporter = OTLPExporter()
@@ -0,0 +1,63 @@
+"""Startup warm-up of the lazily initialized components."""
+import logging
+import time
+from typing import Dict, Any
+from athena_client import athena_client
+from cache import cache
+from graph import get_graph
+from llm_client import llm_client
+from metrics import metrics
+from session_store import session_store
+
+logger = logging.getLogger(__name__)
+
+
+def _athena_clients() -> None:
+    athena_client.athena
+    athena_client.s3
+
+
+# (name, step) in the order they run; each step builds what its component would build on first use
+STEPS = [
+    ("graph", get_graph),
+    ("llm", llm_client.warm_up),
+    ("athena", _athena_clients),
+    ("cache", cache.connect),
+    ("sessions", session_store.connect),
+]
+
+
+class WarmUp:
+    """
+    Builds the compiled graph, LLM chat models, boto3 clients and the Redis
+    connections (query cache, sessions) ahead of the first request.
+    
+    Everything also initializes on first use, so the warm-up is optional and
+    a failed step only means that component initializes (or fails) later.
+    """
+    
+    def __init__(self):
+        self.done = False
+        self.timings_ms: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+    
+    def run(self) -> None:
+        """Run every step (blocking; call from a worker thread)."""
+        for name, step in STEPS:
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                logger.warning(f"Warm-up step {name} failed: {e}")
+                self.errors[name] = str(e)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.timings_ms[name] = round(elapsed_ms, 1)
+            metrics.observe(f"startup.warmup.{name}_ms", elapsed_ms)
+        self.done = True
+    
+    def status(self) -> Dict[str, Any]:
+        return {'done': self.done, 'timings_ms': dict(self.timings_ms), 'errors': dict(self.errors)}
+
+
+# Singleton instance
+warmup = WarmUp()
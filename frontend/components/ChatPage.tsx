@@ -17,14 +17,16 @@ interface ChatPageProps {
   onLogout: () => void
 }
 
+// The first three are answered from the queries prewarmed at login (backend prewarm.TILE_QUESTIONS)
 const SUGGESTED_QUESTIONS = [
+  "Show my daily activity for the last 7 days",
   "Summarize my last 30 days",
+  "Give me a weekly health briefing",
   "Show steps trend and explain spikes",
   "Compare last 7 days vs previous 7 days",
   "What day had the best activity?",
   "Create a dashboard for cardio fitness",
   "Am I improving this month?",
-  "Give me a weekly health briefing",
   "Detect anomalies in heart rate"
 ]
 